@@ -1,34 +1,172 @@
 """This module takes topic matrix with query article,
    and returns recommended articles' titles
 
+Classes:
+    IVFIndex: approximate nearest neighbour index for high-dimensional
+        topic matrices, searching only the clusters closest to the query
+
 Functions:
-    knn_prediction: performs KDTree on topic matrix and query vector
+    build_index: builds the index (exact KDTree or IVFIndex, see
+        configs.RECOMMENDER_BACKEND) over the topic matrix once, to be
+        pickled with the models and reused for every query
+    knn_prediction: queries the index with the query vector
     join_process: joins the top 5 article index to article corpus
     get_recommended_articles: combines knn_prediction and join_process
+    recall_at_k: compares approximate and exact neighbours
+    model_fingerprint: identifies the topic model an index was built for
+    save_index: pickles an index with the fingerprint of its model
+    load_index: loads a saved index, checking it matches the model
 """
 
 # Standard
+import hashlib
+import os
+import pickle
 import numpy as np
 
 # Scikit-Learn imports
+from sklearn.cluster import MiniBatchKMeans
 from sklearn.neighbors import KDTree
 
+# Internal tools
+import configs
+
 # Set number of articles to return index for
 NUM_ARTICLES = 5
 
+
+class IVFIndex():
+    """Inverted file index over the doc-topic matrix.
+
+       Articles are grouped by a coarse k-means clustering of their topic
+       vectors. A query is only compared exactly against the articles in
+       the n_probe clusters whose centroids are closest to it, so query
+       cost does not grow with the whole corpus the way a KDTree does once
+       there are more than a few dozen topics. Same query() interface as
+       sklearn's KDTree.
+    """
+    def __init__(self, doc_topic_matrix, n_clusters=None, n_probe=None,
+                 random_state=0):
+        """
+        Args:
+            doc_topic_matrix: probability matrix generated by LDA on
+                article corpus
+            n_clusters: int, number of coarse clusters, default
+                sqrt(number of articles)
+            n_probe: int, number of clusters searched per query
+            random_state: int, random seed for the clustering
+        """
+        self.data = np.asarray(doc_topic_matrix, dtype=np.float64)
+        n_articles = self.data.shape[0]
+        if n_clusters is None:
+            n_clusters = configs.IVF_N_CLUSTERS
+        if n_clusters is None:
+            n_clusters = int(np.sqrt(n_articles))
+        n_clusters = max(1, min(n_clusters, n_articles))
+        if n_probe is None:
+            n_probe = configs.IVF_N_PROBE
+        self.n_probe = max(1, min(n_probe, n_clusters))
+
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters,
+                                 random_state=random_state)
+        labels = kmeans.fit_predict(self.data)
+        self.centroids = kmeans.cluster_centers_
+        # article ids grouped by cluster; cluster c is
+        # order[offsets[c]:offsets[c + 1]]
+        self.order = np.argsort(labels, kind='mergesort')
+        self.offsets = np.searchsorted(labels[self.order],
+                                       np.arange(n_clusters + 1))
+
+    def __getstate__(self):
+        """Arrays and settings of the index, as KDTree's, so both can be
+           saved as memory-mapped arrays (see artifacts.py).
+        """
+        return (self.data, self.centroids, self.order, self.offsets,
+                self.n_probe)
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            # pickled before __getstate__ was defined
+            self.__dict__.update(state)
+            return
+        (self.data, self.centroids, self.order, self.offsets,
+         self.n_probe) = state
+
+    def query(self, query_vector, k=NUM_ARTICLES):
+        """Finds the (approximate) k nearest articles to each query.
+
+        Args:
+            query_vector: probability vector(s) generated by LDA on the
+                query article(s)
+            k: int, number of articles to return, at most the number of
+                articles in the index
+        Returns:
+            dist: euclidean distance of the top articles, one row per query
+            ind: index of the top articles, one row per query
+        """
+        queries = np.atleast_2d(np.asarray(query_vector, dtype=np.float64))
+        k = min(k, len(self.data))
+        dist = np.empty((len(queries), k))
+        ind = np.empty((len(queries), k), dtype=np.intp)
+        for i, query in enumerate(queries):
+            centroid_dist = ((self.centroids - query)**2).sum(axis=1)
+            clusters = np.argsort(centroid_dist)
+            n_probe = self.n_probe
+            # widen the search if the probed clusters hold fewer than k
+            while True:
+                probed = clusters[:n_probe]
+                candidates = np.concatenate(
+                    [self.order[self.offsets[c]:self.offsets[c + 1]]
+                     for c in probed])
+                if len(candidates) >= k or n_probe >= len(clusters):
+                    break
+                n_probe += 1
+            cand_dist = ((self.data[candidates] - query)**2).sum(axis=1)
+            top = np.argsort(cand_dist, kind='mergesort')[:k]
+            dist[i] = np.sqrt(cand_dist[top])
+            ind[i] = candidates[top]
+        return dist, ind
+
+
+def build_index(doc_topic_matrix, backend=None):
+    """Builds the nearest neighbour index over the article corpus.
+       Building is O(N log N) in the number of articles, so the index
+       should be built once (see build_resources.py) and reused.
+
+    Args:
+        doc_topic_matrix: probability matrix generated by LDA on article corpus
+        backend: 'kdtree' (exact) or 'ivf' (approximate), default
+            configs.RECOMMENDER_BACKEND
+    Returns:
+        index: KDTree or IVFIndex over the rows of doc_topic_matrix
+    """
+    if backend is None:
+        backend = configs.RECOMMENDER_BACKEND
+    if backend == 'kdtree':
+        return KDTree(np.asarray(doc_topic_matrix))
+    elif backend == 'ivf':
+        return IVFIndex(doc_topic_matrix)
+    raise ValueError("Recommender backend must be 'kdtree' or 'ivf'.")
+
 def knn_prediction(doc_topic_matrix, query_vector):
     """Generate indexes of articles that are close to query article
        based on topic relevance
 
     Args:
-        doc_topic_matrix: probability matrix generated by LDA on article corpus
+        doc_topic_matrix: probability matrix generated by LDA on article
+            corpus, or an index already built from it with build_index
         query_vector: probability vector generated by LDA on query article
     Returns:
         dist: distance of the top articles in terms of topic relevance
         ind: index of top articles based on distance in topic relevance
     """
-    tree = KDTree(doc_topic_matrix)
-    dist, ind = tree.query(np.array(query_vector), k=NUM_ARTICLES)
+    if hasattr(doc_topic_matrix, 'query'):
+        index = doc_topic_matrix
+    else:
+        index = build_index(doc_topic_matrix)
+    # a corpus smaller than NUM_ARTICLES returns all of its articles
+    dist, ind = index.query(np.array(query_vector),
+                            k=min(NUM_ARTICLES, len(index.data)))
     return dist, ind
 
 
@@ -49,7 +187,8 @@ def get_recommended_articles(doc_topic_matrix, query_vector, article_corpus):
     """Links knn_prediction and join_porcess together and output final result
 
     Args:
-        doc_topic_matrix: probability matrix generated by LDA on article corpus
+        doc_topic_matrix: probability matrix generated by LDA on article
+            corpus, or an index already built from it with build_index
         query_vector: probability vector generated by LDA on user query article
         article_corpus: original csv file containing all news articles
     Returns:
@@ -57,3 +196,80 @@ def get_recommended_articles(doc_topic_matrix, query_vector, article_corpus):
     """
     index = knn_prediction(doc_topic_matrix, query_vector)[1]
     return join_process(index, article_corpus)
+
+
+def recall_at_k(approx_ind, exact_ind):
+    """Fraction of the exact nearest neighbours found by an approximate
+       index, averaged over queries.
+
+    Args:
+        approx_ind: index output of an approximate index query
+        exact_ind: index output of an exact (KDTree) query
+    Returns:
+        recall: float in range [0.0, 1.0]
+    """
+    hits = [len(np.intersect1d(approx, exact)) / len(exact)
+            for approx, exact in zip(approx_ind, exact_ind)]
+    return float(np.mean(hits))
+
+
+def model_fingerprint(topic_model):
+    """Identifies a topic model by its topic-word matrix (components_,
+       which purge_extra_matrices keeps). The matrix is hashed in float32,
+       the precision of the memory-mapped models (see artifacts.py), so a
+       pickled model and its artifact match.
+
+    Args:
+        topic_model: fitted topic model
+    Returns:
+        fingerprint: str, sha1 hex digest
+    """
+    topic_word = np.ascontiguousarray(topic_model.components_,
+                                      dtype=np.float32)
+    digest = hashlib.sha1(str(topic_word.shape).encode('utf8'))
+    digest.update(topic_word.tobytes())
+    return digest.hexdigest()
+
+
+def save_index(path, index, topic_model):
+    """Pickles an index together with the fingerprint of the model whose
+       doc-topic matrix it was built from.
+
+    Args:
+        path: str, file to write (configs.RECOMMENDER_INDEX_PATH)
+        index: output of build_index
+        topic_model: the model the index was built from
+    """
+    with open(path, "wb") as file_handle:
+        pickle.dump({'fingerprint': model_fingerprint(topic_model),
+                     'index': index}, file_handle)
+
+
+def load_index(path, topic_model=None):
+    """Loads an index saved by save_index.
+
+    Args:
+        path: str, file written by save_index
+        topic_model: if given, the index must have been built from it
+    Returns:
+        index: KDTree or IVFIndex
+    Raises:
+        FileNotFoundError: if no index has been saved
+        ValueError: if the index was built from another model
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(
+            "Recommender index {} not found, run build_resources.py to "
+            "build it.".format(path))
+    with open(path, "rb") as file_handle:
+        saved = pickle.load(file_handle)
+    if not isinstance(saved, dict) or 'fingerprint' not in saved:
+        raise ValueError(
+            "Recommender index {} has no model fingerprint, run "
+            "build_resources.py to rebuild it.".format(path))
+    if topic_model is not None and \
+            saved['fingerprint'] != model_fingerprint(topic_model):
+        raise ValueError(
+            "Recommender index {} was built for a different topic model, "
+            "run build_resources.py to rebuild it.".format(path))
+    return saved['index']
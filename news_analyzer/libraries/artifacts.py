@@ -0,0 +1,261 @@
+"""
+Module for saving and loading the models used by the Handler as a
+directory of .npy arrays with a small json manifest, instead of pickles.
+
+Loading memory-maps the arrays read-only, so almost nothing is read from
+disk at startup, and server processes on the same machine share the model
+pages through the OS cache. Only what is needed at query time is saved:
+the vocabulary, each topic model's topic-word (and doc-topic) matrices as
+float32, and the arrays of the recommender index (KDTree or IVFIndex, see
+article_recommender.py), whose small remaining state is pickled.
+
+Layout:
+    artifact_path/
+        LATEST                     name of the newest version
+        <version>/
+            manifest.json
+            vocab.npy
+            guided_topic_word.npy
+            guided_doc_topic.npy
+            unguided_topic_word.npy
+            unguided_doc_topic.npy
+            recommender_index.pkl
+            recommender_index_<position>.npy
+
+Example:
+    save_artifacts(configs.ARTIFACT_PATH, processor, guided_model,
+                   unguided_model, recommender_index=index)
+    processor, guided_model, unguided_model = \
+        load_artifacts(configs.ARTIFACT_PATH)
+    index = load_recommender_index(configs.ARTIFACT_PATH, unguided_model)
+"""
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+
+# Internal tools
+import article_recommender
+import text_processing
+import topic_modeling
+
+# Module Constants
+# Bump when the layout changes, older artifacts then fail to load
+FORMAT_VERSION = 1
+LATEST_FILE = "LATEST"
+MANIFEST_FILE = "manifest.json"
+VOCAB_FILE = "vocab.npy"
+INDEX_STATE_FILE = "recommender_index.pkl"
+INDEX_ARRAY_FILE = "recommender_index_{}.npy"
+MODEL_NAMES = ['guided', 'unguided']
+ARRAY_DTYPE = np.float32
+
+
+class TopicModelArtifact():
+    """ Topic model loaded from an artifact directory, with the parts of a
+        fitted guidedlda (or OnlineLDA) model used at query time.
+    """
+    def __init__(self, topic_word, doc_topic=None, alpha=0.01, eta=0.01):
+        """ Constructor
+
+            Args:
+                topic_word = numpy array, (n_topics, n_words)
+                doc_topic = numpy array, (n_documents, n_topics), or None
+                alpha = float, document-topic prior of the model
+                eta = float, topic-word prior of the model
+        """
+        self.components_ = topic_word
+        self.topic_word_ = topic_word
+        self.doc_topic_ = doc_topic
+        self.n_topics = topic_word.shape[0]
+        self.alpha = alpha
+        self.eta = eta
+
+    def transform(self, dtm, max_iter=20, tol=1e-16):
+        """ Infers the topic distributions of documents, as guidedlda's
+            transform() (see topic_modeling.infer_topics).
+        """
+        return topic_modeling.infer_topics(self, dtm, max_iter, tol)
+
+
+def has_artifacts(artifact_path):
+    """ Checks if an artifact directory has been saved at artifact_path.
+    """
+    return os.path.isfile(os.path.join(artifact_path, LATEST_FILE))
+
+
+def save_artifacts(artifact_path, preprocessor, guided_model,
+                   unguided_model, version=None, recommender_index=None):
+    """ Saves a new version of the models and makes it the latest.
+        Call before purge_extra_matrices(), which deletes doc_topic_.
+
+        Args:
+            artifact_path = str, artifact directory (configs.ARTIFACT_PATH)
+            preprocessor = fitted text_processing.ArticlePreprocessor
+            guided_model = fitted guidedlda or OnlineLDA model
+            unguided_model = fitted guidedlda or OnlineLDA model
+            version = str, name of the version, default the current time
+            recommender_index = index built over unguided_model's
+                                doc-topic matrix (see
+                                article_recommender.build_index), or None
+        Returns:
+            version_path = str, directory of the saved version
+    """
+    if version is None:
+        version = time.strftime("%Y%m%d-%H%M%S")
+    version_path = os.path.join(artifact_path, version)
+    os.makedirs(version_path)
+    vocab = preprocessor.get_vocab()
+    np.save(os.path.join(version_path, VOCAB_FILE),
+            np.array(vocab, dtype=str))
+    # preprocessors pickled before TokenPipeline have no pipeline
+    pipeline = getattr(preprocessor, "pipeline", None)
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': version,
+        'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'preprocessor': {
+            'sparse': bool(preprocessor.sparse),
+            'tokenizer': None if pipeline is None else pipeline.tokenizer,
+            'n_words': len(vocab)},
+        'models': {}}
+    for name, model in zip(MODEL_NAMES, [guided_model, unguided_model]):
+        files = {'topic_word': name + "_topic_word.npy"}
+        # purged models have no doc_topic_
+        doc_topic = getattr(model, 'doc_topic_', None)
+        if doc_topic is not None:
+            files['doc_topic'] = name + "_doc_topic.npy"
+            np.save(os.path.join(version_path, files['doc_topic']),
+                    np.asarray(doc_topic, dtype=ARRAY_DTYPE))
+        np.save(os.path.join(version_path, files['topic_word']),
+                np.asarray(model.components_, dtype=ARRAY_DTYPE))
+        manifest['models'][name] = {
+            'n_topics': int(model.components_.shape[0]),
+            'alpha': float(model.alpha),
+            'eta': float(model.eta),
+            'files': files}
+    if recommender_index is not None:
+        manifest['recommender_index'] = _save_index(
+            version_path, recommender_index, unguided_model)
+    with open(os.path.join(version_path, MANIFEST_FILE), "w") as file_handle:
+        json.dump(manifest, file_handle, indent=2)
+    # Written last and renamed into place, so loaders never see a
+    # partially saved version
+    latest_path = os.path.join(artifact_path, LATEST_FILE)
+    with open(latest_path + ".tmp", "w") as file_handle:
+        file_handle.write(version)
+    os.replace(latest_path + ".tmp", latest_path)
+    return version_path
+
+
+def load_artifacts(artifact_path, version=None):
+    """ Loads the models of a saved version, with the arrays memory-mapped
+        read-only.
+
+        Args:
+            artifact_path = str, artifact directory (configs.ARTIFACT_PATH)
+            version = str, version to load, default the latest
+        Returns:
+            preprocessor = text_processing.ArticlePreprocessor
+            guided_model = TopicModelArtifact
+            unguided_model = TopicModelArtifact
+    """
+    version_path, manifest = _read_manifest(artifact_path, version)
+    tokenizer = manifest['preprocessor']['tokenizer']
+    pipeline = None if tokenizer is None else \
+        text_processing.TokenPipeline(tokenizer=tokenizer)
+    vocab = np.load(os.path.join(version_path, VOCAB_FILE), mmap_mode='r')
+    preprocessor = text_processing.ArticlePreprocessor.from_vocabulary(
+        vocab.tolist(), sparse=manifest['preprocessor']['sparse'],
+        pipeline=pipeline)
+    models = []
+    for name in MODEL_NAMES:
+        info = manifest['models'][name]
+        arrays = dict((key, np.load(os.path.join(version_path, fname),
+                                    mmap_mode='r'))
+                      for key, fname in info['files'].items())
+        models.append(TopicModelArtifact(arrays['topic_word'],
+                                         arrays.get('doc_topic'),
+                                         info['alpha'], info['eta']))
+    return preprocessor, models[0], models[1]
+
+
+def load_recommender_index(artifact_path, topic_model=None, version=None):
+    """ Loads the recommender index of a saved version, with its arrays
+        memory-mapped read-only.
+
+        Args:
+            artifact_path = str, artifact directory (configs.ARTIFACT_PATH)
+            topic_model = if given, the index must have been built from it
+            version = str, version to load, default the latest
+        Returns:
+            index = KDTree or IVFIndex
+        Raises:
+            FileNotFoundError: if the version has no recommender index
+            ValueError: if the index was built from another model
+    """
+    version_path, manifest = _read_manifest(artifact_path, version)
+    info = manifest.get('recommender_index')
+    if info is None:
+        raise FileNotFoundError(
+            'Artifacts {} have no recommender index, run build_resources.py '
+            'to build it.'.format(manifest['version']))
+    if topic_model is not None and info['fingerprint'] != \
+            article_recommender.model_fingerprint(topic_model):
+        raise ValueError(
+            'Recommender index of artifacts {} was built for a different '
+            'topic model, run build_resources.py to rebuild it.'.format(
+                manifest['version']))
+    with open(os.path.join(version_path, INDEX_STATE_FILE),
+              "rb") as file_handle:
+        saved = pickle.load(file_handle)
+    state = saved['state']
+    for position, fname in info['files'].items():
+        state[int(position)] = np.load(os.path.join(version_path, fname),
+                                       mmap_mode='r')
+    index = saved['class'].__new__(saved['class'])
+    index.__setstate__(tuple(state))
+    return index
+
+
+def _save_index(version_path, index, topic_model):
+    """ Saves the arrays of a recommender index as .npy files, and the rest
+        of its (pickle) state in INDEX_STATE_FILE.
+
+        Returns:
+            info = dict, manifest entry of the index
+    """
+    state = list(index.__getstate__())
+    files = {}
+    for position, value in enumerate(state):
+        if isinstance(value, np.ndarray):
+            files[str(position)] = INDEX_ARRAY_FILE.format(position)
+            np.save(os.path.join(version_path, files[str(position)]), value)
+            state[position] = None
+    with open(os.path.join(version_path, INDEX_STATE_FILE),
+              "wb") as file_handle:
+        pickle.dump({'class': type(index), 'state': state}, file_handle)
+    return {'fingerprint': article_recommender.model_fingerprint(topic_model),
+            'files': files}
+
+
+def _read_manifest(artifact_path, version=None):
+    """ Reads the manifest of a saved version, checking its format.
+
+        Returns:
+            version_path = str, directory of the version
+            manifest = dict
+    """
+    if version is None:
+        with open(os.path.join(artifact_path, LATEST_FILE)) as file_handle:
+            version = file_handle.read().strip()
+    version_path = os.path.join(artifact_path, version)
+    with open(os.path.join(version_path, MANIFEST_FILE)) as file_handle:
+        manifest = json.load(file_handle)
+    if manifest['format_version'] != FORMAT_VERSION:
+        raise ValueError(
+            'Artifacts {} have format version {}, expected {}.'.format(
+                version, manifest['format_version'], FORMAT_VERSION))
+    return version_path, manifest
@@ -27,9 +27,54 @@ RESOURCE_PATH = DIR_NAME + RESOURCE_FOLDER
 
 # change CORPUS_PATH as needed
 CORPUS_PATH = RESOURCE_PATH + "/" + "articles.csv"
+# Columnar copy of the corpus (see corpus_store.py), used instead of the csv
+# when it exists
+CORPUS_STORE_PATH = RESOURCE_PATH + "/" + "corpus_store"
 GUIDED_MODELER_PATH = RESOURCE_PATH + "/" + "guidedlda_model.pkl"
 UNGUIDED_MODELER_PATH = RESOURCE_PATH + "/" + "unguidedlda_model.pkl"
 PREPROCESSOR_PATH = RESOURCE_PATH + "/" + "preprocessor.pkl"
+DTM_SHARD_PATH = RESOURCE_PATH + "/" + "dtm_shards"
+TOKEN_CACHE_PATH = RESOURCE_PATH + "/" + "token_cache"
+# Memory-mapped models (see artifacts.py), used instead of the pickles when
+# they exist
+ARTIFACT_PATH = RESOURCE_PATH + "/" + "artifacts"
+RECOMMENDER_INDEX_PATH = RESOURCE_PATH + "/" + "recommender_index.pkl"
+# Recommender index: 'kdtree' (exact) or 'ivf' (approximate, for large
+# numbers of unguided topics). IVF_N_CLUSTERS = None uses sqrt(n_articles).
+RECOMMENDER_BACKEND = "kdtree"
+IVF_N_CLUSTERS = None
+IVF_N_PROBE = 8
+# Topic model training: 'gibbs' (guidedlda) or 'online' (online_lda, for
+# corpora that do not fit in memory)
+TOPIC_MODEL_BACKEND = "gibbs"
+# Query topic inference (see topic_modeling.infer_topics)
+INFERENCE_MAX_ITER = 20
+INFERENCE_TOL = 1e-16
+# Per-query analysis results kept by the Handler (see handler.AnalysisCache):
+# number of queries kept, and seconds before a result is recomputed
+# (None to keep results until they are evicted)
+ANALYSIS_CACHE_SIZE = 256
+ANALYSIS_CACHE_TTL = 3600
+# Number of submitted articles the Handler keeps, to restart analyses it
+# has forgotten (see Handler.resume_analysis)
+ANALYSIS_JOB_HISTORY = 4096
+# Word cloud images (see word_cloud_generator): 'png', 'preview' (low
+# resolution png, faster) or 'svg' (smaller)
+WORDCLOUD_MODE = "png"
+# Rendered word clouds kept in memory, and on disk if WORDCLOUD_CACHE_PATH
+# is set (e.g. RESOURCE_PATH + "/wordcloud_cache"), shared by the analysis
+# worker processes
+WORDCLOUD_CACHE_BYTES = 64 * 1024 ** 2
+WORDCLOUD_CACHE_PATH = None
+WORDCLOUD_DISK_CACHE_BYTES = 512 * 1024 ** 2
+# Worker processes running the analyses of Handler.analyze() concurrently,
+# each with its own copy of the models (0 runs them in threads of the
+# calling process)
+ANALYSIS_WORKERS = 3
+# Start method of the analysis worker processes. They are started while
+# the Handler's loading threads may hold locks, which a forked child would
+# inherit held, so they are not forked
+ANALYSIS_START_METHOD = "spawn"
 GUIDED_LDA_TOPICS = ['arts', 'automobiles', 'books', 'business', 'fashion',
                      'food', 'health', 'magazine', 'movies',
                      'politics', 'realestate', 'science', 'sports',
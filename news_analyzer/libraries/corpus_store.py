@@ -0,0 +1,217 @@
+"""
+Module for a compact columnar copy of the articles corpus csv, so the
+Handler can load only the columns it needs (e.g. the titles of the
+recommended articles) without parsing the article bodies.
+
+Each column is saved as its utf8 encoded values, separated by NUL bytes,
+with a .npy array of the byte offset of every value. Metadata columns are
+read whole with a single split, and article bodies are read one at a time
+from a memory-mapped file by their offsets, only when needed. Rows are in
+the order of the corpus csv (and of the document-term-matrix).
+
+Layout:
+    store_path/
+        manifest.json
+        <column>.bin           values, NUL separated
+        <column>.offsets.npy   byte offset of each value (n_articles + 1)
+
+Example:
+    build_corpus_store(configs.CORPUS_PATH, configs.CORPUS_STORE_PATH)
+    store = CorpusStore(configs.CORPUS_STORE_PATH)
+    titles = store.load_columns(['title'])
+    content = store.get_content(0)
+"""
+import json
+import mmap
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Module Constants
+# Bump when the layout changes, older stores then fail to load
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+BLOB_SUFFIX = ".bin"
+OFFSETS_SUFFIX = ".offsets.npy"
+SEPARATOR = "\x00"
+METADATA_COLUMNS = ['title', 'publication', 'author', 'date', 'url']
+CONTENT_COLUMN = "content"
+CHUNKSIZE = 10000
+
+
+def has_corpus_store(store_path):
+    """ Checks if a complete corpus store has been built at store_path.
+    """
+    return os.path.isfile(os.path.join(store_path, MANIFEST_FILE))
+
+
+def build_corpus_store(csv_path, store_path, columns=None,
+                       content_column=CONTENT_COLUMN, chunksize=CHUNKSIZE):
+    """ Writes the corpus store from the corpus csv, reading the csv in
+        chunks. Missing values are saved as empty strings.
+
+        Args:
+            csv_path = str, path of the corpus csv
+            store_path = str, directory of the store
+                         (configs.CORPUS_STORE_PATH)
+            columns = list, metadata columns, default METADATA_COLUMNS
+            content_column = str, column of the article bodies
+            chunksize = int, number of articles read at a time
+        Returns:
+            n_articles = int, number of articles in the store
+    """
+    if columns is None:
+        columns = METADATA_COLUMNS
+    names = columns + [content_column]
+    os.makedirs(store_path, exist_ok=True)
+    # an incomplete store is never loaded
+    manifest_path = os.path.join(store_path, MANIFEST_FILE)
+    if os.path.isfile(manifest_path):
+        os.remove(manifest_path)
+    positions = dict((name, 0) for name in names)
+    offsets = dict((name, [np.zeros(1, dtype=np.int64)]) for name in names)
+    handles = dict((name, open(os.path.join(store_path, name + BLOB_SUFFIX),
+                               "wb"))
+                   for name in names)
+    n_articles = 0
+    try:
+        for chunk in pd.read_csv(csv_path, encoding='utf8', usecols=names,
+                                 dtype=str, keep_default_na=False,
+                                 chunksize=chunksize):
+            n_articles += len(chunk)
+            for name in names:
+                encoded = [(value.replace(SEPARATOR, "") +
+                            SEPARATOR).encode('utf8')
+                           for value in chunk[name]]
+                lengths = np.fromiter(map(len, encoded), dtype=np.int64,
+                                      count=len(encoded))
+                offsets[name].append(positions[name] + np.cumsum(lengths))
+                positions[name] += int(lengths.sum())
+                handles[name].write(b"".join(encoded))
+    finally:
+        for file_handle in handles.values():
+            file_handle.close()
+    for name in names:
+        np.save(os.path.join(store_path, name + OFFSETS_SUFFIX),
+                np.concatenate(offsets[name]))
+    manifest = {'format_version': FORMAT_VERSION,
+                'n_articles': n_articles,
+                'columns': columns,
+                'content_column': content_column}
+    with open(manifest_path + ".tmp", "w") as file_handle:
+        json.dump(manifest, file_handle, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return n_articles
+
+
+class CorpusStore():
+    """ Read access to a corpus store written by build_corpus_store().
+    """
+    def __init__(self, store_path):
+        """ Constructor, only reads the manifest.
+
+            Args:
+                store_path = str, directory of the store
+        """
+        with open(os.path.join(store_path, MANIFEST_FILE)) as file_handle:
+            manifest = json.load(file_handle)
+        if manifest['format_version'] != FORMAT_VERSION:
+            raise ValueError(
+                'Corpus store has format version {}, expected {}.'.format(
+                    manifest['format_version'], FORMAT_VERSION))
+        self.store_path = store_path
+        self.n_articles = manifest['n_articles']
+        self.columns = manifest['columns']
+        self.content_column = manifest['content_column']
+        self._content_file = None
+        self._content = None
+        self._content_offsets = None
+        self._content_lock = threading.Lock()
+
+    def __len__(self):
+        return self.n_articles
+
+    def load_columns(self, columns=None):
+        """ Loads metadata columns into memory.
+
+            Args:
+                columns = list, columns to load, default all metadata
+                          columns
+            Returns:
+                corpus = pandas dataframe, one row per article
+        """
+        if columns is None:
+            columns = self.columns
+        return pd.DataFrame(
+            dict((name, self._load_column(name)) for name in columns),
+            columns=columns)
+
+    def get_content(self, index):
+        """ Reads the body of one article.
+
+            Args:
+                index = int, row of the article
+            Returns:
+                content = str
+        """
+        self._open_content()
+        # end offset includes the separator
+        start, end = self._content_offsets[index:index + 2]
+        return self._content[int(start):int(end) - 1].decode('utf8')
+
+    def get_contents(self, indices):
+        """ Reads the bodies of several articles.
+
+            Args:
+                indices = list of ints, rows of the articles
+            Returns:
+                contents = list of str
+        """
+        return [self.get_content(index) for index in indices]
+
+    def close(self):
+        """ Closes the memory-mapped article bodies, if opened.
+        """
+        with self._content_lock:
+            if self._content is not None:
+                self._content.close()
+                self._content_file.close()
+            self._content_file = None
+            self._content = None
+
+    def _load_column(self, name):
+        """ Reads a whole column, splitting it on the separators.
+        """
+        if name not in self.columns and name != self.content_column:
+            raise KeyError('Column {} is not in the corpus store.'.format(
+                name))
+        with open(os.path.join(self.store_path, name + BLOB_SUFFIX),
+                  "rb") as file_handle:
+            values = file_handle.read().decode('utf8').split(SEPARATOR)
+        # the last value is followed by a separator too
+        return pd.Series(values[:-1], name=name)
+
+    def _open_content(self):
+        """ Memory-maps the article bodies on first use (once, when called
+            from several threads at a time).
+        """
+        if self._content is not None:
+            return
+        with self._content_lock:
+            if self._content is None:
+                self._map_content()
+
+    def _map_content(self):
+        """ Memory-maps the article bodies and their offsets.
+        """
+        self._content_offsets = np.load(
+            os.path.join(self.store_path,
+                         self.content_column + OFFSETS_SUFFIX),
+            mmap_mode='r')
+        self._content_file = open(
+            os.path.join(self.store_path,
+                         self.content_column + BLOB_SUFFIX), "rb")
+        self._content = mmap.mmap(self._content_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
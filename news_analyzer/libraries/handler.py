@@ -6,25 +6,98 @@ and the UI. In particular, this class does all the work to make sure
 that what is returned is ready to be visualized in the UI.
 
 This class also persists the data models and corpus for continual
-access while the UI is running.
+access while the UI is running. They are loaded on first use, or ahead
+of time in background threads with warmup(), so the UI can start serving
+before they are ready (see status()).
+
+Analysis results are cached per query (see AnalysisCache), so the UI
+callbacks of one query, and repeated queries of the same article, share
+the work. analyze() runs all the analyses of a query at once, in worker
+processes that keep their own copy of the models. submit_analysis() starts
+them in the background instead, so each result can be shown as soon as it
+is ready (see AnalysisJob).
 """
+import asyncio
+import hashlib
+import multiprocessing
 import pickle
 import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+from concurrent.futures import (CancelledError, Future,
+                                ProcessPoolExecutor, ThreadPoolExecutor)
 import numpy as np
 import pandas as pd
 # Internal tools
+import artifacts
 import configs
+import corpus_store
 import word_cloud_generator
 import sentiment_analyzer
 import article_recommender
+import text_processing
+import topic_modeling
 sys.path.append('news_analyzer/libraries')
 
+# Module Constants
+# Corpus columns used by the Handler (skips the large content column)
+CORPUS_COLUMNS = ['title']
+# Resources loaded lazily by the Handler, in warmup order
+RESOURCES = ['models', 'corpus', 'recommender_index', 'article_store']
+# Resources used by analyze() (article bodies are not)
+ANALYSIS_RESOURCES = ['models', 'corpus', 'recommender_index']
+# Handler of an analysis worker process
+_WORKER_HANDLER = None
+
+# Stages of an analysis, in order of how soon they usually finish
+ANALYSIS_STAGES = ['sentiment', 'topics', 'recommended_articles',
+                   'wordcloud']
+
+AnalysisResult = namedtuple('AnalysisResult', ['topics',
+                                               'recommended_articles',
+                                               'sentiment', 'wordcloud'])
+AnalysisResult.__doc__ = """
+Results of Handler.analyze(), as returned by get_topics(),
+get_recommended_articles(), get_sentiment() and get_word_cloud().
+"""
+
+
+def get_corpus(columns=None):
+    """
+    This method loads the articles corpus (only the given columns, default
+    all), from the columnar corpus store if build_resources.py has written
+    one (see corpus_store.py), otherwise from the csv.
+    """
+    if corpus_store.has_corpus_store(configs.CORPUS_STORE_PATH):
+        store = corpus_store.CorpusStore(configs.CORPUS_STORE_PATH)
+        if columns is None or all(name in store.columns
+                                  for name in columns):
+            return store.load_columns(columns)
+    return pd.read_csv(configs.CORPUS_PATH, usecols=columns)
+
 
-def get_corpus():
+def get_article_store():
     """
-    This method loads the articles corpus csv.
+    This method opens the corpus store, to read article bodies from, or
+    returns None if build_resources.py has not written one.
     """
-    return pd.read_csv(configs.CORPUS_PATH)
+    if corpus_store.has_corpus_store(configs.CORPUS_STORE_PATH):
+        return corpus_store.CorpusStore(configs.CORPUS_STORE_PATH)
+    return None
+
+
+def get_article_contents(indices, store=None):
+    """
+    This method reads the bodies of corpus articles by row, from the
+    memory-mapped corpus store if there is one (opened once by the
+    Handler, see get_article_store), otherwise from the csv.
+    """
+    if store is not None:
+        return store.get_contents(indices)
+    contents = pd.read_csv(configs.CORPUS_PATH, usecols=['content'])
+    return contents['content'].iloc[list(indices)].tolist()
 
 
 def get_preprocessor():
@@ -51,6 +124,38 @@ def get_unguided_topic_modeler():
     return modeler
 
 
+def get_models():
+    """
+    This method loads the preprocessor and the guided and unguided LDA
+    models, memory-mapped from the artifact directory if build_resources.py
+    has saved one (see artifacts.py), otherwise from the pickles.
+    """
+    if artifacts.has_artifacts(configs.ARTIFACT_PATH):
+        return artifacts.load_artifacts(configs.ARTIFACT_PATH)
+    return (get_preprocessor(), get_guided_topic_modeler(),
+            get_unguided_topic_modeler())
+
+
+def get_recommender_index(unguided_topic_model=None):
+    """
+    This method loads the recommender index built over the unguided LDA
+    model's doc-topic matrix by build_resources.py, memory-mapped from the
+    artifact directory if it has one, otherwise from the pickle. The index
+    is checked against unguided_topic_model, if given, so an index left
+    over from another model is never used (see
+    article_recommender.load_index).
+    """
+    if artifacts.has_artifacts(configs.ARTIFACT_PATH):
+        try:
+            return artifacts.load_recommender_index(configs.ARTIFACT_PATH,
+                                                    unguided_topic_model)
+        except FileNotFoundError:
+            # artifacts saved without an index
+            pass
+    return article_recommender.load_index(configs.RECOMMENDER_INDEX_PATH,
+                                          unguided_topic_model)
+
+
 def load_pickled(filename):
     """
     This function loads pickled files.
@@ -60,19 +165,607 @@ def load_pickled(filename):
     return my_object
 
 
+def _init_analysis_worker():
+    """
+    Process pool initializer, loads the models once per worker process.
+    """
+    global _WORKER_HANDLER
+    _WORKER_HANDLER = Handler(n_workers=0)
+    _WORKER_HANDLER._get('models')  # pylint: disable=protected-access
+
+
+def _worker_ready():
+    """
+    No-op task, used to start the worker processes ahead of time.
+    """
+    return _WORKER_HANDLER is not None
+
+
+def _worker_topics(query_article):
+    """
+    get_topics() in an analysis worker process.
+    """
+    return _WORKER_HANDLER.get_topics(query_article)
+
+
+def _worker_word_cloud(query_article):
+    """
+    get_word_cloud() in an analysis worker process.
+    """
+    return _WORKER_HANDLER.get_word_cloud(query_article)
+
+
+class AnalysisJob():
+    """
+    Background analysis of a query article, started by
+    Handler.submit_analysis(), with one future per stage.
+    """
+    def __init__(self, query_article):
+        """
+        Args:
+            query_article = string, article or words being queried
+        """
+        self.query_article = query_article
+        self.futures = {}
+        self.worker_futures = []
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Cancels the stages not started yet (stages already running in a
+        worker process finish, and are cached).
+        """
+        self.cancelled = True
+        for future in list(self.futures.values()) + self.worker_futures:
+            future.cancel()
+
+    def is_done(self, stage):
+        """
+        Checks if a stage has finished (or failed, or was cancelled).
+        """
+        return self.futures[stage].done()
+
+    def done(self):
+        """
+        Checks if every stage has finished.
+        """
+        return all(future.done() for future in self.futures.values())
+
+    def result(self, stage, wait=False):
+        """
+        Returns the result of a stage, raising its error if it failed.
+
+        Args:
+            stage = string, one of ANALYSIS_STAGES
+            wait = boolean, wait for the stage to finish, instead of
+                   returning None if it has not
+        Returns:
+            value = the result, as returned by the Handler's method
+        """
+        if not wait and not self.is_done(stage):
+            return None
+        return self.futures[stage].result()
+
+
+class AnalysisCache():
+    """
+    Bounded LRU cache of per-query analysis results (query dtm, topics,
+    recommendations, sentiment, word cloud), keyed by a hash of the
+    whitespace-normalized query text. Safe to use from several threads.
+    """
+    def __init__(self, max_size=None, ttl=None):
+        """
+        Args:
+            max_size = int, number of queries kept, default
+                       configs.ANALYSIS_CACHE_SIZE
+            ttl = float, seconds a result is kept, default
+                  configs.ANALYSIS_CACHE_TTL (None never expires)
+        """
+        self.max_size = configs.ANALYSIS_CACHE_SIZE \
+            if max_size is None else max_size
+        self.ttl = configs.ANALYSIS_CACHE_TTL if ttl is None else ttl
+        self._entries = OrderedDict()
+        # (key, field) of results being computed: Future of the result
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(query_article):
+        """
+        Hashes the query text, ignoring differences in whitespace. Case is
+        kept, as it matters to the sentiment analyzer.
+        """
+        normalized = " ".join(str(query_article).split())
+        return hashlib.sha1(normalized.encode('utf8')).hexdigest()
+
+    def get(self, query_article, field, compute):
+        """
+        Returns a cached result of the query, computing and storing it
+        first if it is missing or expired.
+
+        Args:
+            query_article = string, article or words being queried
+            field = string, name of the result (e.g. 'topics')
+            compute = function with no arguments, computes the result
+        Returns:
+            value = the result
+        """
+        return self.get_by_key(self.make_key(query_article), field, compute)
+
+    def get_by_key(self, key, field, compute=None):
+        """
+        get() by the key of the query (see make_key()). A result is
+        computed once at a time: callers missing a result that another
+        thread is computing wait for it, and get its error if it fails
+        (but compute it themselves if it was cancelled).
+
+        Args:
+            key = string, key of the query
+            field = string, name of the result
+            compute = function with no arguments, or None to return None
+                      when the result is not cached
+        Returns:
+            value = the result
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and field in entry:
+                stored_time, value = entry[field]
+                if self.ttl is None or time.time() - stored_time < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del entry[field]
+            self.misses += 1
+            if compute is None:
+                return None
+            # one thread computes a missing result, the others wait for it
+            in_flight = self._in_flight.get((key, field))
+            if in_flight is None:
+                future = self._in_flight[(key, field)] = Future()
+        if in_flight is not None:
+            try:
+                return in_flight.result()
+            except CancelledError:
+                # cancelled by its caller's job, not by this caller
+                return self.get_by_key(key, field, compute)
+        # computed without the lock, so other queries are not held up
+        try:
+            value = compute()
+        except BaseException as error:
+            with self._lock:
+                del self._in_flight[(key, field)]
+            future.set_exception(error)
+            raise
+        with self._lock:
+            entry = self._entries.setdefault(key, {})
+            entry[field] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            del self._in_flight[(key, field)]
+        future.set_result(value)
+        return value
+
+    def stats(self):
+        """
+        Reports the cache counters.
+
+        Returns:
+            stats = dict, hits, misses, evictions and size (queries kept)
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions,
+                    'size': len(self._entries)}
+
+    def clear(self):
+        """
+        Removes all cached results (e.g. after the models change).
+        """
+        with self._lock:
+            self._entries.clear()
+
+
 class Handler():
     """
     Usage: Call the handler
     """
-    def __init__(self):
+    def __init__(self, warmup=False, n_workers=None):
         """
-        Initializer for handler class. This function loads the models and
-        creates all objects needed to do analysis/visualization.
+        Initializer for handler class. The models and corpus needed to do
+        analysis/visualization are loaded on first use.
+
+        Args:
+            warmup = boolean, start loading everything in the background
+                     right away (see warmup())
+            n_workers = int, worker processes used by analyze(), default
+                        configs.ANALYSIS_WORKERS
         """
-        self.guided_topic_model = get_guided_topic_modeler()
-        self.unguided_topic_model = get_unguided_topic_modeler()
-        self.preprocessor = get_preprocessor()
-        self.corpus = get_corpus()
+        self._resources = {}
+        self._locks = dict((name, threading.Lock()) for name in RESOURCES)
+        self._errors = {}
+        self._threads = []
+        self.load_times = {}
+        self.cache = AnalysisCache()
+        self.image_cache = word_cloud_generator.ImageCache(
+            configs.WORDCLOUD_CACHE_BYTES, configs.WORDCLOUD_CACHE_PATH,
+            configs.WORDCLOUD_DISK_CACHE_BYTES)
+        self._vocab = None
+        self.n_workers = configs.ANALYSIS_WORKERS if n_workers is None \
+            else n_workers
+        self._executor = None
+        self._stage_executor = None
+        self._executor_lock = threading.Lock()
+        self._jobs = OrderedDict()
+        # submitted article of each job id, see resume_analysis()
+        self._job_articles = OrderedDict()
+        # ids of the jobs cancelled, see is_cancelled()
+        self._cancelled_jobs = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        if warmup:
+            self.warmup()
+
+    @property
+    def preprocessor(self):
+        """ Fitted ArticlePreprocessor. """
+        return self._get('models')[0]
+
+    @property
+    def guided_topic_model(self):
+        """ Guided LDA model. """
+        return self._get('models')[1]
+
+    @property
+    def unguided_topic_model(self):
+        """ Unguided LDA model. """
+        return self._get('models')[2]
+
+    @property
+    def corpus(self):
+        """ Articles corpus (CORPUS_COLUMNS only). """
+        return self._get('corpus')
+
+    @property
+    def recommender_index(self):
+        """ Recommender index over the unguided model's doc-topic matrix. """
+        return self._get('recommender_index')
+
+    @property
+    def article_store(self):
+        """ Corpus store of the article bodies (None without one). """
+        return self._get('article_store')
+
+    def _get(self, name):
+        """
+        Returns a resource, loading it first if needed. Each resource is
+        loaded once, even when requested from several threads at a time.
+        """
+        if name not in self._resources:
+            with self._locks[name]:
+                if name not in self._resources:
+                    s_time = time.time()
+                    self._resources[name] = self._load(name)
+                    self.load_times[name] = time.time() - s_time
+                    self._errors.pop(name, None)
+        return self._resources[name]
+
+    def _load(self, name):
+        """
+        Loads a resource (see RESOURCES).
+        """
+        if name == 'models':
+            return get_models()
+        if name == 'corpus':
+            return get_corpus(CORPUS_COLUMNS)
+        if name == 'article_store':
+            return get_article_store()
+        # checked against the model, so waits for the models to load
+        return get_recommender_index(self.unguided_topic_model)
+
+    def warmup(self, wait=False, resources=None):
+        """
+        Loads resources in parallel background threads, so the first
+        request does not pay for loading them.
+
+        Args:
+            wait = boolean, block until everything is loaded
+            resources = list, names of the resources to load, default all
+                        RESOURCES
+        Returns:
+            threads = list, the loading threads
+        """
+        if resources is None:
+            resources = RESOURCES
+        def load(name):
+            try:
+                self._get(name)
+            except Exception as error:  # pylint: disable=broad-except
+                # reported by status(), and retried on first use
+                self._errors[name] = error
+        self._threads = [threading.Thread(target=load, args=(name,),
+                                          daemon=True)
+                         for name in resources]
+        for thread in self._threads:
+            thread.start()
+        if self.n_workers > 0:
+            # starts the analysis workers, which load their own models
+            executor = self._get_executor()
+            futures = [executor.submit(_worker_ready)
+                       for _ in range(self.n_workers)]
+            if wait:
+                for future in futures:
+                    future.result()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        return self._threads
+
+    def status(self, resources=None):
+        """
+        Reports the loading state of each resource.
+
+        Args:
+            resources = list, names of the resources, default all RESOURCES
+        Returns:
+            status = dict, resource name to 'loaded', 'loading',
+                     'not loaded' or 'failed: <error>'
+        """
+        if resources is None:
+            resources = RESOURCES
+        status = {}
+        for name in resources:
+            if name in self._resources:
+                status[name] = 'loaded'
+            elif name in self._errors:
+                status[name] = 'failed: {}'.format(self._errors[name])
+            elif self._locks[name].locked():
+                status[name] = 'loading'
+            else:
+                status[name] = 'not loaded'
+        return status
+
+    def is_ready(self, resources=None):
+        """
+        Checks if every resource is loaded.
+
+        Args:
+            resources = list, names of the resources, default all RESOURCES
+        """
+        if resources is None:
+            resources = RESOURCES
+        return all(name in self._resources for name in resources)
+
+    def _get_executor(self):
+        """
+        Returns the analysis process pool, starting it on first use.
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    self.n_workers, initializer=_init_analysis_worker,
+                    mp_context=multiprocessing.get_context(
+                        configs.ANALYSIS_START_METHOD))
+            return self._executor
+
+    def close(self):
+        """
+        Stops the analysis worker processes and threads, if started, and
+        unmaps the article bodies.
+        """
+        with self._executor_lock:
+            for executor in [self._executor, self._stage_executor]:
+                if executor is not None:
+                    executor.shutdown()
+            self._executor = None
+            self._stage_executor = None
+        store = self._resources.get('article_store')
+        if store is not None:
+            store.close()
+
+    def analyze(self, query_article):
+        """
+        Runs all the analyses of a query article at once, and waits for
+        them. Topics, sentiment and word cloud are computed concurrently in
+        the worker processes (unless cached), and the recommendations from
+        the topics. The result is kept under the query's id (see
+        get_analysis()).
+
+        Args:
+            query_article = string, article or words being queried
+        Returns:
+            result = AnalysisResult
+        """
+        return self.cache.get(query_article, 'result',
+                              lambda: self._analyze(query_article))
+
+    @staticmethod
+    def get_query_id(query_article):
+        """
+        Returns the id a query's analyze() result is kept under.
+        """
+        return AnalysisCache.make_key(query_article)
+
+    def get_analysis(self, query_id):
+        """
+        Returns the analyze() result kept under a query id, or None if it
+        has been evicted or has expired from the analysis cache.
+
+        Args:
+            query_id = string, see get_query_id()
+        Returns:
+            result = AnalysisResult or None
+        """
+        return self.cache.get_by_key(query_id, 'result')
+
+    def _analyze(self, query_article):
+        """
+        Computes analyze() of a query article, as a background job.
+        """
+        job = self.get_job(self.submit_analysis(query_article))
+        return AnalysisResult(**dict((stage, job.result(stage, wait=True))
+                                     for stage in ANALYSIS_STAGES))
+
+    def submit_analysis(self, query_article, previous_job_id=None):
+        """
+        Starts analyzing a query article in the background and returns
+        right away. The stages (ANALYSIS_STAGES) run concurrently and can
+        be collected one by one as they finish (see get_job()). Each submit
+        is its own job, but the work is shared through the analysis cache
+        with other jobs (and users) analyzing the same article.
+
+        Args:
+            query_article = string, article or words being queried
+            previous_job_id = string, job this one replaces (e.g. the
+                              user's previous submit), cancelled
+        Returns:
+            job_id = string, unique to this submit
+        """
+        if previous_job_id is not None:
+            self.cancel_analysis(previous_job_id)
+        job_id = uuid.uuid4().hex
+        self._start_job(job_id, query_article)
+        return job_id
+
+    def resume_analysis(self, job_id):
+        """
+        Returns the background analysis of a job id, starting it again
+        from the submitted article if the finished job has been forgotten
+        (see get_job()). The article is kept by the handler, so the
+        analysis is of what was submitted, not of what the user has typed
+        since. Cancelled jobs are not started again.
+
+        Args:
+            job_id = string, as returned by submit_analysis()
+        Returns:
+            job = AnalysisJob, or None if the job was cancelled or its
+                  article is not known either (e.g. submitted to another
+                  server process)
+        """
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+            query_article = self._job_articles.get(job_id)
+        if job is not None or query_article is None:
+            return job
+        return self._start_job(job_id, query_article)
+
+    def _start_job(self, job_id, query_article):
+        """
+        Starts the stages of a background analysis under a job id, unless
+        that job is already running or finished.
+        """
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.cancelled:
+                job = AnalysisJob(query_article)
+                # the pool starts stages in order, so the topics stage
+                # always runs before the recommendations stage waits on it
+                for stage in ANALYSIS_STAGES:
+                    job.futures[stage] = self._get_stage_executor().submit(
+                        self._run_stage, job, stage)
+                self._jobs[job_id] = job
+            self._jobs.move_to_end(job_id)
+            # forget the oldest finished (or failed) jobs
+            for old_job_id in list(self._jobs):
+                if len(self._jobs) <= self.cache.max_size:
+                    break
+                if self._jobs[old_job_id].done():
+                    del self._jobs[old_job_id]
+            # the articles are kept longer, for resume_analysis()
+            self._job_articles[job_id] = query_article
+            self._job_articles.move_to_end(job_id)
+            while len(self._job_articles) > configs.ANALYSIS_JOB_HISTORY:
+                self._job_articles.popitem(last=False)
+        return job
+
+    def get_job(self, job_id):
+        """
+        Returns the background analysis of a job id, or None if it is not
+        known (e.g. forgotten, or started by another server process).
+        """
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def is_cancelled(self, job_id):
+        """
+        Checks if a job has been cancelled (e.g. replaced by a resubmit).
+        """
+        with self._jobs_lock:
+            return job_id in self._cancelled_jobs
+
+    def cancel_analysis(self, job_id):
+        """
+        Cancels the stages of a background analysis that have not finished.
+        Results already cached are kept, and other jobs waiting for a
+        cancelled stage compute it themselves (see AnalysisCache). The job
+        is forgotten, and not started again by resume_analysis().
+        """
+        with self._jobs_lock:
+            job = self._jobs.pop(job_id, None)
+            self._job_articles.pop(job_id, None)
+            self._cancelled_jobs[job_id] = True
+            while len(self._cancelled_jobs) > configs.ANALYSIS_JOB_HISTORY:
+                self._cancelled_jobs.popitem(last=False)
+        if job is not None and not job.done():
+            job.cancel()
+
+    def _get_stage_executor(self):
+        """
+        Returns the thread pool running the stages of background analyses,
+        starting it on first use.
+        """
+        with self._executor_lock:
+            if self._stage_executor is None:
+                self._stage_executor = ThreadPoolExecutor()
+            return self._stage_executor
+
+    def _run_stage(self, job, stage):
+        """
+        Computes one stage of a background analysis, in a worker process if
+        there are any, and caches it.
+        """
+        query_article = job.query_article
+        if stage == 'recommended_articles':
+            # needs the topics, from their own stage
+            job.result('topics', wait=True)
+            return self.get_recommended_articles(query_article)
+        worker_function, compute = {
+            'topics': (_worker_topics,
+                       lambda: self._compute_topics(query_article)),
+            'sentiment': (sentiment_analyzer.get_sentiment,
+                          lambda: sentiment_analyzer.get_sentiment(
+                              query_article)),
+            'wordcloud': (_worker_word_cloud,
+                          lambda: self._compute_word_cloud(
+                              query_article))}[stage]
+
+        def compute_stage():
+            if job.cancelled:
+                raise CancelledError()
+            if self.n_workers > 0:
+                future = self._get_executor().submit(worker_function,
+                                                     query_article)
+                job.worker_futures.append(future)
+                return future.result()
+            return compute()
+        return self.cache.get(query_article, stage, compute_stage)
+
+    async def analyze_async(self, query_article):
+        """
+        analyze() for asyncio code, waits for the result without blocking
+        the event loop.
+
+        Args:
+            query_article = string, article or words being queried
+        Returns:
+            result = AnalysisResult
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.analyze, query_article)
 
     def get_topics(self, query_article):
         """
@@ -85,14 +778,20 @@ class Handler():
             query_topics = list, top guided and all unguided topics
                             distribution
         """
+        return self.cache.get(query_article, 'topics',
+                              lambda: self._compute_topics(query_article))
+
+    def _compute_topics(self, query_article):
+        """
+        Computes get_topics() of a query article, reusing its cached
+        doc-term-matrix.
+        """
         num_topics = 5
-        # convert query article to doc-term-matrix
-        query_dtm = self.preprocessor.transform(query_article)
-        # join the query article doc-term-matrix with models
-        query_guided_topics = self.guided_topic_model.transform(
-            np.array(query_dtm))
-        query_unguided_topics = self.unguided_topic_model.transform(
-            np.array(query_dtm))
+        query_dtm = self.cache.get(
+            query_article, 'dtm',
+            lambda: self.preprocessor.transform(query_article))
+        query_guided_topics, query_unguided_topics = \
+            self._infer_topics(query_dtm)
         # filter and order topics and percentages
         top_guided_topic_index = query_guided_topics.argsort()[0][-num_topics:]
         guided_topics = np.asarray(
@@ -107,6 +806,35 @@ class Handler():
                         query_unguided_topics]
         return query_topics
 
+    def get_topic_distributions(self, query_articles):
+        """
+        Infers the guided and unguided topic distributions of one or many
+        articles at once (e.g. for bulk scoring of article feeds).
+
+        Args:
+            query_articles = string or list of strings, articles
+        Returns:
+            guided_topics = numpy array, (n_articles, n_guided_topics)
+            unguided_topics = numpy array, (n_articles, n_unguided_topics)
+        """
+        # convert query articles to doc-term-matrix
+        query_dtm = self.preprocessor.transform(query_articles)
+        return self._infer_topics(query_dtm)
+
+    def _infer_topics(self, query_dtm):
+        """
+        Infers the guided and unguided topic distributions of a
+        doc-term-matrix.
+        """
+        # join the query doc-term-matrix with models
+        guided_topics = topic_modeling.infer_topics(
+            self.guided_topic_model, query_dtm,
+            configs.INFERENCE_MAX_ITER, configs.INFERENCE_TOL)
+        unguided_topics = topic_modeling.infer_topics(
+            self.unguided_topic_model, query_dtm,
+            configs.INFERENCE_MAX_ITER, configs.INFERENCE_TOL)
+        return guided_topics, unguided_topics
+
     def get_recommended_articles(self, query_article):
         """
         Processes query article to retrieve top recommended articles.
@@ -116,14 +844,34 @@ class Handler():
         Returns:
             recommended_articles = top recommended articles.
         """
+        return self.cache.get(
+            query_article, 'recommendations',
+            lambda: self._compute_recommended_articles(query_article))
+
+    def _compute_recommended_articles(self, query_article):
+        """
+        Computes get_recommended_articles() of a query article, reusing its
+        cached topics.
+        """
         query_vector = self.get_topics(query_article)[1]
-        doc_topic_matrix = self.unguided_topic_model.doc_topic_
         recommended_articles = article_recommender.get_recommended_articles(
-            doc_topic_matrix, query_vector, self.corpus)
+            self.recommender_index, query_vector, self.corpus)
         return recommended_articles
 
-    @staticmethod
-    def get_sentiment(query_article):
+    def get_article_contents(self, indices):
+        """
+        Reads the bodies of corpus articles (e.g. recommended articles),
+        only when they are needed, from the corpus store opened on first
+        use.
+
+        Args:
+            indices = list of ints, corpus rows of the articles
+        Returns:
+            contents = list of strings, the article bodies
+        """
+        return get_article_contents(indices, self.article_store)
+
+    def get_sentiment(self, query_article):
         """
         Processes query article for sentiment information.
 
@@ -133,17 +881,58 @@ class Handler():
             sentiment information = dict, positive, neutral and
                                     negative sentence count.
         """
-        return sentiment_analyzer.get_sentiment(query_article)
+        return self.cache.get(
+            query_article, 'sentiment',
+            lambda: sentiment_analyzer.get_sentiment(query_article))
 
-    @staticmethod
-    def get_word_cloud(query_article):
+    def get_word_cloud(self, query_article, mode=None):
         """
         Processes query article to retrieve word cloud image.
 
         Args:
             query_article = string, article or words being queried
+            mode = string, 'png', 'preview' or 'svg' (see
+                   word_cloud_generator), default configs.WORDCLOUD_MODE
         Returns:
             wordcloud = image, a wordcloud of the provided query_article
         """
-        wordcloud = word_cloud_generator.generate_wordcloud(query_article)
+        if mode is None:
+            mode = configs.WORDCLOUD_MODE
+        field = 'wordcloud' if mode == configs.WORDCLOUD_MODE \
+            else 'wordcloud_' + mode
+        wordcloud = self.cache.get(
+            query_article, field,
+            lambda: self._compute_word_cloud(query_article, mode))
         return wordcloud
+
+    def _compute_word_cloud(self, query_article, mode=None):
+        """
+        Computes get_word_cloud() of a query article, from the word counts
+        of its cached doc-term-matrix (or its text, if none of its words
+        are in the vocabulary).
+        """
+        if mode is None:
+            mode = configs.WORDCLOUD_MODE
+        frequencies = self.get_term_frequencies(query_article)
+        if not frequencies:
+            return word_cloud_generator.generate_wordcloud(
+                query_article, mode=mode, cache=self.image_cache)
+        return word_cloud_generator.generate_wordcloud(
+            frequencies=frequencies, mode=mode, cache=self.image_cache)
+
+    def get_term_frequencies(self, query_article):
+        """
+        Counts the words of a query article, as tokenized by the
+        preprocessor.
+
+        Args:
+            query_article = string, article or words being queried
+        Returns:
+            frequencies = dict, word to count
+        """
+        query_dtm = self.cache.get(
+            query_article, 'dtm',
+            lambda: self.preprocessor.transform(query_article))
+        if self._vocab is None:
+            self._vocab = self.preprocessor.get_vocab()
+        return text_processing.get_term_frequencies(query_dtm, self._vocab)
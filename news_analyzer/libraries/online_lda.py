@@ -0,0 +1,323 @@
+"""
+This module implements online (stochastic variational) LDA, an alternative
+to the guidedlda Gibbs sampler that learns from minibatches of a sparse
+document-term-matrix. The corpus never has to be in memory at once, so it
+can be trained directly on the dtm shards written by
+text_processing.ArticlePreprocessor.fit_stream().
+
+Based on Hoffman, Blei and Bach, "Online Learning for Latent Dirichlet
+Allocation" (2010), with seed words added as an asymmetric topic-word prior.
+
+Example:
+    model = OnlineLDA(n_topics=20)
+    model.fit(dtm)  # numpy array or scipy sparse matrix
+    model.fit(shard_paths)  # list of .npz dtm shards
+    model.fit(dtm, seed_topics, 0.5)  # guided, as in guidedlda
+    doc_topic = model.transform(query_dtm)
+
+    # Or update the model one minibatch at a time:
+    model.partial_fit(batch)
+
+The variational bound of each pass (an approximate log likelihood) is kept
+in loglikelihoods_, as guidedlda does with its log likelihood, so models
+can be compared, e.g. by topic_modeling.TopicModelerGridSearch.
+"""
+import time
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.special import digamma, gammaln
+
+# Module Constants
+BATCH_SIZE = 256
+# Learning rate of the nth update is (TAU0 + n) ** -KAPPA
+TAU0 = 64.
+KAPPA = 0.7
+# Prior pseudo-count of a seed word in its topic, times seed_confidence
+SEED_PRIOR = 100.
+# Stopping condition of the per-document variational updates
+MAX_E_ITER = 100
+E_TOL = 1e-3
+
+
+def get_shard_shape(shard_paths):
+    """ Gets the shape of the dtm made of the given shards, without loading
+        the shards.
+        Args:
+            shard_paths = list, paths of .npz sparse dtm shards
+        Returns:
+            shape = tuple, (number of documents, number of words)
+    """
+    n_docs = 0
+    n_words = 0
+    for path in shard_paths:
+        with np.load(path) as shard:
+            n_docs += int(shard['shape'][0])
+            n_words = int(shard['shape'][1])
+    return n_docs, n_words
+
+
+def to_csr(dtm):
+    """ Converts a dtm (numpy array, pandas dataframe or scipy sparse
+        matrix) to a scipy CSR matrix.
+    """
+    if sparse.issparse(dtm):
+        return dtm.tocsr()
+    if isinstance(dtm, pd.DataFrame):
+        dtm = dtm.values
+    return sparse.csr_matrix(np.atleast_2d(dtm))
+
+
+def iter_batches(dtm, batch_size=BATCH_SIZE):
+    """ Yields minibatches of rows of a dtm, or of a list of dtm shards
+        (loaded one shard at a time).
+        Args:
+            dtm = numpy array, scipy sparse matrix or list of shard paths
+            batch_size = int, number of documents in a minibatch
+        Returns:
+            generator of scipy CSR matrices
+    """
+    if isinstance(dtm, list):
+        for path in dtm:
+            for batch in iter_batches(sparse.load_npz(path), batch_size):
+                yield batch
+        return
+    dtm = to_csr(dtm)
+    for start in range(0, dtm.shape[0], batch_size):
+        yield dtm[start:start + batch_size]
+
+
+class OnlineLDA():
+    """ Online variational LDA, with the doc_topic_, topic_word_ and
+        transform() of a fitted guidedlda model.
+    """
+    def __init__(self, n_topics, n_iter=10, alpha=None, eta=0.01,
+                 random_state=0, batch_size=BATCH_SIZE, tau0=TAU0,
+                 kappa=KAPPA, tol=None, patience=1):
+        """ Constructor
+
+            Args:
+                n_topics = int, number of topics
+                n_iter = int, maximum number of passes over the corpus
+                alpha = float, document-topic prior, default 1/n_topics
+                eta = float, topic-word prior
+                random_state = int, random seed for replicating results
+                batch_size = int, number of documents per update
+                tau0, kappa = float, learning rate schedule (see TAU0)
+                tol = float, stop once the topic-word distributions change
+                        by less than tol (mean L1 distance) in a pass,
+                        None to always run n_iter passes
+                patience = int, number of converged passes in a row
+                        needed to stop
+        """
+        self.n_topics = n_topics
+        self.n_iter = n_iter
+        self.alpha = 1. / n_topics if alpha is None else alpha
+        self.eta = eta
+        self.random_state = random_state
+        self.batch_size = batch_size
+        self.tau0 = tau0
+        self.kappa = kappa
+        self.tol = tol
+        self.patience = patience
+        self.lambda_ = None
+        self.eta_ = None
+        self.exp_elog_beta_ = None
+        self.components_ = None
+        self.topic_word_ = None
+        self.doc_topic_ = None
+        self.n_docs_ = None
+        self.n_docs_seen_ = 0
+        self.n_updates_ = 0
+        self.n_iter_ = None
+        self.fit_time_ = None
+        self.loglikelihoods_ = []
+
+    def fit(self, dtm, seed_topics=None, seed_confidence=None):
+        """ Fits the model with passes of minibatch updates over the corpus.
+            Args:
+                dtm = numpy array, scipy sparse matrix or list of paths of
+                        .npz dtm shards
+                seed_topics = dict, (key: word ID, value: topic ID)
+                seed_confidence = float, weight of the seed word prior
+            Returns:
+                self
+
+            The variational bound of each pass is appended to
+            loglikelihoods_. Its document terms are computed on each
+            minibatch as it is used for an update, so it costs no extra
+            pass over the corpus.
+        """
+        s_time = time.time()
+        if isinstance(dtm, list):
+            n_docs, n_words = get_shard_shape(dtm)
+        else:
+            n_docs, n_words = dtm.shape
+        self._initialize(n_words, seed_topics, seed_confidence)
+        self.n_docs_ = n_docs
+        n_converged = 0
+        for it in range(self.n_iter):
+            prev_topic_word = self.topic_word_
+            doc_bound = 0.
+            for batch in iter_batches(dtm, self.batch_size):
+                doc_bound += self._update(batch)
+            self.loglikelihoods_.append(doc_bound + self._topic_bound())
+            self.n_iter_ = it + 1
+            if self.tol is not None:
+                change = np.abs(self.topic_word_ - prev_topic_word).sum(
+                    axis=1).mean()
+                n_converged = n_converged + 1 if change <= self.tol else 0
+                if n_converged >= self.patience:
+                    break
+        self.doc_topic_ = np.vstack([
+            self.transform(batch)
+            for batch in iter_batches(dtm, self.batch_size)])
+        self.fit_time_ = time.time() - s_time
+        return self
+
+    def partial_fit(self, dtm, seed_topics=None, seed_confidence=None):
+        """ Updates the model with one minibatch. The seed topics are only
+            used on the first call (or after fit()).
+            Args:
+                dtm = numpy array or scipy sparse matrix, minibatch
+                seed_topics = dict, (key: word ID, value: topic ID)
+                seed_confidence = float, weight of the seed word prior
+            Returns:
+                self
+        """
+        dtm = to_csr(dtm)
+        # an empty minibatch would divide by zero when scaled up
+        if dtm.shape[0] == 0:
+            return self
+        if self.lambda_ is None:
+            self._initialize(dtm.shape[1], seed_topics, seed_confidence)
+        self._update(dtm)
+        return self
+
+    def transform(self, dtm):
+        """ Infers the topic distributions of new documents.
+            Args:
+                dtm = numpy array or scipy sparse matrix
+            Returns:
+                doc_topic = numpy array, shape (n_documents, n_topics)
+        """
+        gamma, _, _ = self._e_step(to_csr(dtm), collect_sstats=False)
+        return gamma / gamma.sum(axis=1)[:, np.newaxis]
+
+    def purge_extra_matrices(self):
+        """ Deletes the matrices only needed for training, as for guidedlda.
+            Don't fit the model again after this, just use it to transform.
+        """
+        self.doc_topic_ = None
+        self.lambda_ = None
+        self.eta_ = None
+
+    def _initialize(self, n_words, seed_topics, seed_confidence):
+        """ Sets up the topic-word prior and random initial topics.
+        """
+        random_state = np.random.RandomState(self.random_state)
+        self.eta_ = np.full((self.n_topics, n_words), self.eta)
+        if seed_topics:
+            if seed_confidence is None:
+                seed_confidence = 1.
+            for word_id, topic_id in seed_topics.items():
+                self.eta_[topic_id, word_id] += seed_confidence * SEED_PRIOR
+        # seed words start out in their topics
+        self.lambda_ = random_state.gamma(
+            100., 1. / 100., (self.n_topics, n_words)) + self.eta_ - self.eta
+        self.n_docs_ = None
+        self.n_docs_seen_ = 0
+        self.n_updates_ = 0
+        self.loglikelihoods_ = []
+        self._update_topics()
+
+    def _update(self, dtm):
+        """ Updates lambda_ with one (non-empty) minibatch, a CSR matrix.
+            Returns:
+                doc_bound = float, document terms of the variational bound
+                        on the minibatch (see _doc_bound)
+        """
+        self.n_docs_seen_ += dtm.shape[0]
+        # scale the minibatch up to the corpus (or to all documents seen,
+        # if the corpus size is not known)
+        n_docs = self.n_docs_ if self.n_docs_ is not None \
+            else self.n_docs_seen_
+        gamma, sstats, word_bound = self._e_step(dtm, collect_sstats=True)
+        doc_bound = self._doc_bound(dtm, gamma, word_bound)
+        rho = (self.tau0 + self.n_updates_) ** -self.kappa
+        self.lambda_ = (1 - rho) * self.lambda_ + \
+            rho * (self.eta_ + n_docs / dtm.shape[0] * sstats)
+        self.n_updates_ += 1
+        self._update_topics()
+        return doc_bound
+
+    def _doc_bound(self, dtm, gamma, word_bound):
+        """ Document terms of the variational bound (Hoffman et al., 2010,
+            eq. 3) of a minibatch, for the topics it was inferred with.
+            Empty documents are left out.
+        """
+        known = np.diff(dtm.indptr) > 0
+        gamma = gamma[known]
+        gamma_sum = gamma.sum(axis=1)
+        elog_theta = digamma(gamma) - digamma(gamma_sum)[:, np.newaxis]
+        return float(word_bound +
+                     np.sum((self.alpha - gamma) * elog_theta) +
+                     np.sum(gammaln(gamma) - gammaln(self.alpha)) +
+                     np.sum(gammaln(self.alpha * self.n_topics) -
+                            gammaln(gamma_sum)))
+
+    def _topic_bound(self):
+        """ Topic terms of the variational bound, for the current lambda_.
+        """
+        lambda_sum = self.lambda_.sum(axis=1)
+        elog_beta = digamma(self.lambda_) - digamma(lambda_sum)[:, np.newaxis]
+        return float(np.sum((self.eta_ - self.lambda_) * elog_beta) +
+                     np.sum(gammaln(self.lambda_) - gammaln(self.eta_)) +
+                     np.sum(gammaln(self.eta_.sum(axis=1)) -
+                            gammaln(lambda_sum)))
+
+    def _update_topics(self):
+        """ Recomputes the topic-word distributions from lambda_.
+        """
+        lambda_sum = self.lambda_.sum(axis=1)[:, np.newaxis]
+        self.exp_elog_beta_ = np.exp(digamma(self.lambda_) -
+                                     digamma(lambda_sum))
+        self.components_ = self.lambda_ / lambda_sum
+        self.topic_word_ = self.components_
+
+    def _e_step(self, dtm, collect_sstats):
+        """ Variational updates of the document-topic weights (gamma) of
+            every document, the sufficient statistics for lambda_, and the
+            word terms of the variational bound.
+        """
+        exp_elog_beta = self.exp_elog_beta_
+        gamma = np.ones((dtm.shape[0], self.n_topics))
+        sstats = np.zeros_like(exp_elog_beta) if collect_sstats else None
+        word_bound = 0.
+        for d in range(dtm.shape[0]):
+            start, end = dtm.indptr[d], dtm.indptr[d + 1]
+            if start == end:
+                continue
+            ids = dtm.indices[start:end]
+            cts = dtm.data[start:end].astype(float)
+            gamma_d = gamma[d]
+            exp_elog_theta_d = np.exp(digamma(gamma_d) -
+                                      digamma(gamma_d.sum()))
+            exp_elog_beta_d = exp_elog_beta[:, ids]
+            phinorm = exp_elog_theta_d.dot(exp_elog_beta_d) + 1e-100
+            for _ in range(MAX_E_ITER):
+                last_gamma_d = gamma_d
+                gamma_d = self.alpha + exp_elog_theta_d * \
+                    (cts / phinorm).dot(exp_elog_beta_d.T)
+                exp_elog_theta_d = np.exp(digamma(gamma_d) -
+                                          digamma(gamma_d.sum()))
+                phinorm = exp_elog_theta_d.dot(exp_elog_beta_d) + 1e-100
+                if np.mean(np.abs(gamma_d - last_gamma_d)) < E_TOL:
+                    break
+            gamma[d] = gamma_d
+            word_bound += cts.dot(np.log(phinorm))
+            if collect_sstats:
+                sstats[:, ids] += np.outer(exp_elog_theta_d, cts / phinorm)
+        if collect_sstats:
+            sstats *= exp_elog_beta
+        return gamma, sstats, word_bound
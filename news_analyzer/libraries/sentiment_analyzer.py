@@ -1,43 +1,167 @@
 """
 sentiment_analyzer
 
-This module has 1 function:
+This module has 1 class and 3 functions:
+    SentimentEngine (see more details below)
+    get_engine (see more details below)
+    to_dict (see more details below)
     get_sentiment (see more details below)
+
+The VADER lexicon is loaded once per process (see get_engine), instead of
+on every call. SentimentEngine.score_many scores many articles at once,
+optionally across a pool of worker processes, and returns compact counts.
+
+Example:
+    get_sentiment(article)
+
+    engine = SentimentEngine(n_jobs=-1)
+    counts = engine.score_many(articles)  # (n_articles, 4) array
+    counts[:, COUNT_COLUMNS.index('Positive_Sentences')]
 """
+import multiprocessing
+import numpy as np
 from nltk import tokenize
 from nltk.sentiment.vader import SentimentIntensityAnalyzer as SIA
 
+# Columns of the count arrays of SentimentEngine
+COUNT_COLUMNS = ["Positive_Sentences", "Negative_Sentences",
+                 "Neutral_Sentences", "Total_Sentences"]
+COUNT_DTYPE = np.int32
+# Engine of this process, see get_engine
+_ENGINE = None
 
-def get_sentiment(article):
-    """
-    A function that analyzes the sentiment on the input string.
 
-    Args:
-            input_string (string): string representing the query article.
+def get_engine():
+    """
+    A function that returns the SentimentEngine of this process, created
+    (and its lexicon loaded) on first use.
 
     Returns:
-            Dictionary: A dictionary of sentiment results
+            SentimentEngine: engine shared by the calls of this process
+    """
+    global _ENGINE
+    if _ENGINE is None:
+        _ENGINE = SentimentEngine()
+    return _ENGINE
+
 
+def _count_sentences(article):
+    """
+    SentimentEngine.count_sentences with the engine of a worker process.
     """
-    sid = SIA()
+    return get_engine().count_sentences(article)
+
+
+class SentimentEngine():
+    """
+    Sentence level VADER sentiment, with the lexicon loaded once.
+    """
+    def __init__(self, n_jobs=1, chunksize=None):
+        """
+        Args:
+                n_jobs (int): worker processes used by score_many. -1 (or
+                    None) uses all cores.
+                chunksize (int): articles sent to a worker at a time,
+                    default splits the articles into 4 chunks per worker.
+        """
+        self.n_jobs = n_jobs
+        self.chunksize = chunksize
+        self._analyzer = None
+
+    @property
+    def analyzer(self):
+        """
+        VADER analyzer, loading the lexicon on first use.
+        """
+        if self._analyzer is None:
+            self._analyzer = SIA()
+        return self._analyzer
+
+    def count_sentences(self, article):
+        """
+        Counts the positive, negative and neutral sentences of an article.
+
+        Args:
+                article (string): text of the article.
+
+        Returns:
+                numpy array: counts, in the order of COUNT_COLUMNS
+
+        """
+        analyzer = self.analyzer
+        counts = np.zeros(len(COUNT_COLUMNS), dtype=COUNT_DTYPE)
+        sentences = tokenize.sent_tokenize(article)
+        for sentence in sentences:
+            sentiment_compound = \
+                analyzer.polarity_scores(sentence).get('compound')
+            if sentiment_compound > 0:
+                counts[0] += 1
+            elif sentiment_compound < 0:
+                counts[1] += 1
+            else:
+                counts[2] += 1
+        counts[3] = len(sentences)
+        return counts
+
+    def score(self, article):
+        """
+        Analyzes the sentiment of an article.
+
+        Args:
+                article (string): text of the article.
+
+        Returns:
+                Dictionary: A dictionary of sentiment results
 
-    pos_sentences = 0
-    neg_sentences = 0
-    nue_sentences = 0
+        """
+        return to_dict(self.count_sentences(article))
 
-    sentences = tokenize.sent_tokenize(article)
-    sentences_count = len(sentences)
+    def score_many(self, articles):
+        """
+        Counts the sentences of each sentiment of many articles, across
+        n_jobs worker processes. The result is the same as calling
+        count_sentences on each article.
 
-    for sentence in sentences:
-        sentiment = sid.polarity_scores(sentence)
+        Args:
+                articles (list): texts of the articles (or a series).
 
-        sentiment_compound = sentiment.get('compound')
-        if sentiment_compound > 0:
-            pos_sentences += 1
-        elif sentiment_compound < 0:
-            neg_sentences += 1
-        else:
-            nue_sentences += 1
+        Returns:
+                numpy array: counts, shape (n_articles, 4), columns in
+                    the order of COUNT_COLUMNS
+
+        """
+        articles = list(articles)
+        if not articles:
+            return np.zeros((0, len(COUNT_COLUMNS)), dtype=COUNT_DTYPE)
+        n_jobs = self.n_jobs
+        if n_jobs is None or n_jobs < 0:
+            n_jobs = multiprocessing.cpu_count()
+        if n_jobs == 1 or len(articles) == 1:
+            return np.vstack([self.count_sentences(article)
+                              for article in articles])
+        chunksize = self.chunksize
+        if chunksize is None:
+            chunksize = max(1, len(articles) // (4 * n_jobs))
+        # each worker loads the lexicon once, on its first article
+        with multiprocessing.Pool(n_jobs) as pool:
+            counts = pool.map(_count_sentences, articles, chunksize)
+        return np.vstack(counts)
+
+
+def to_dict(counts):
+    """
+    A function that converts the sentence counts of an article to the
+    dictionary returned by get_sentiment.
+
+    Args:
+            counts (numpy array): counts, in the order of COUNT_COLUMNS
+
+    Returns:
+            Dictionary: A dictionary of sentiment results
+
+    """
+    pos_sentences, neg_sentences, nue_sentences, sentences_count = \
+        [int(count) for count in counts]
 
     if pos_sentences > neg_sentences:
         overall_sentiment = "Positive"
@@ -51,3 +175,17 @@ def get_sentiment(article):
             "Negative_Sentences": neg_sentences,
             "Neutral_Sentences": nue_sentences,
             "Total_Sentences": sentences_count}
+
+
+def get_sentiment(article):
+    """
+    A function that analyzes the sentiment on the input string.
+
+    Args:
+            input_string (string): string representing the query article.
+
+    Returns:
+            Dictionary: A dictionary of sentiment results
+
+    """
+    return get_engine().score(article)
@@ -15,15 +15,42 @@ Example:
 
     # For any new query article:
     prep.transform(article)
+
+    # For corpora larger than memory, stream the corpus csv and write
+    # the sparse document-term-matrix to disk in shards (needs a sparse
+    # preprocessor):
+    prep = ArticlePreprocessor(sparse=True)
+    shard_paths = prep.fit_stream(csv_path, shard_path=shard_dir)
+    dtm = load_dtm_shards(shard_paths)  # all shards, in memory
+
+    # For large corpora, keep the document-term-matrix sparse and
+    # clean the articles on all cores, with the faster regex tokenizer:
+    prep = ArticlePreprocessor(sparse=True, n_jobs=-1,
+                               pipeline=TokenPipeline(tokenizer="regex"))
+    dtm = prep.fit_transform(data)  # scipy CSR matrix
+    vocab = prep.get_vocab()  # column names of dtm
+
+    # To skip cleaning articles already cleaned by a previous build:
+    prep = ArticlePreprocessor(token_cache=configs.TOKEN_CACHE_PATH)
 """
 # Base imports
+from collections import Counter
+import functools
+import hashlib
+import mmap
+import multiprocessing
+import os
+import re
 import string
 # import copy
 
 # Standard imports
+import numpy as np
 import pandas as pd
+from scipy import sparse
 
 # NLTK imports
+import nltk
 from nltk import word_tokenize
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
@@ -31,6 +58,9 @@ from nltk.stem import WordNetLemmatizer
 # Scikit-Learn imports
 from sklearn.feature_extraction.text import CountVectorizer
 
+# Internal tools
+import configs
+
 # Module Constants
 EXTRA_STOPWORDS = [
     "said",
@@ -39,6 +69,22 @@ EXTRA_STOPWORDS = [
     "ms",
     "mrs"
 ]
+# Number of lemmatized words cached by a TokenPipeline
+LEMMA_CACHE_SIZE = 100000
+# Runs of letters, used by the "regex" TokenPipeline tokenizer
+REGEX_TOKEN_PATTERN = re.compile(r"[^\W\d_]+")
+# Built on first use by get_default_pipeline()
+_DEFAULT_PIPELINE = None
+# Number of articles read from the corpus csv at a time by fit_stream
+STREAM_CHUNKSIZE = 10000
+# Bump to invalidate TokenCache entries when the cleaning code changes
+TOKEN_CACHE_VERSION = 2
+# TokenCache index entries: article hash, position of the cleaned text
+TOKEN_CACHE_DTYPE = np.dtype([('key', 'S16'),
+                              ('offset', '<i8'),
+                              ('length', '<i8')])
+# TokenCache index segment files, numbered by their first and last write
+TOKEN_CACHE_SEGMENT_PATTERN = re.compile(r"^index_(\d{8})_(\d{8})\.npy$")
 
 
 def transform_article(article):
@@ -52,11 +98,7 @@ def transform_article(article):
         Returns:
         A string of preprocessed text.
     """
-    tokens = clean_article(article)
-    lemmatizer = WordNetLemmatizer()
-    lemmatized = [lemmatizer.lemmatize(token) for token in tokens]
-    transformed_article = " ".join(lemmatized)
-    return transformed_article
+    return get_default_pipeline().transform_article(article)
 
 
 def clean_article(text):
@@ -70,20 +112,419 @@ def clean_article(text):
         Returns:
         A list of cleaned words from the text.
     """
-    tokens = word_tokenize(text)
-    tokens = [word.lower() for word in tokens]
-    table = str.maketrans('', '', string.punctuation)
-    stripped = [w.translate(table) for w in tokens]
-    words = [word for word in stripped if word.isalpha()]
-    stop_words = list(set(stopwords.words('english'))) + EXTRA_STOPWORDS
-    words_list = [w for w in words if w not in stop_words]
-    return words_list
+    return get_default_pipeline().clean_article(text)
+
+
+def get_default_pipeline():
+    """ Returns the TokenPipeline used by transform_article and
+        clean_article, building it on first use (once per process).
+    """
+    global _DEFAULT_PIPELINE
+    if _DEFAULT_PIPELINE is None:
+        _DEFAULT_PIPELINE = TokenPipeline()
+    return _DEFAULT_PIPELINE
+
+
+class TokenPipeline():
+    """ Class for cleaning and lemmatizing articles.
+
+        Builds the stopword set and punctuation table once, and caches
+        lemmatized forms of words, instead of redoing the work for
+        every article.
+    """
+    def __init__(self, tokenizer="nltk", lemma_cache_size=LEMMA_CACHE_SIZE):
+        """
+            Args:
+            tokenizer: "nltk" uses nltk's word_tokenize. "regex" splits
+                    on runs of letters, which is several times faster but
+                    can split a few words (e.g. contractions) differently.
+            lemma_cache_size: number of lemmatized words to keep cached.
+        """
+        if tokenizer not in ("nltk", "regex"):
+            raise ValueError("tokenizer must be 'nltk' or 'regex'.")
+        self.tokenizer = tokenizer
+        self.lemma_cache_size = lemma_cache_size
+        self.stop_words = frozenset(stopwords.words('english')).union(
+            EXTRA_STOPWORDS)
+        self.table = str.maketrans('', '', string.punctuation)
+        self._lemmatize = None
+        self._init_lemmatizer()
+
+    def _init_lemmatizer(self):
+        """ Internal function for (re)creating the cached lemmatizer.
+        """
+        lemmatizer = WordNetLemmatizer()
+        self._lemmatize = functools.lru_cache(
+            maxsize=self.lemma_cache_size)(lemmatizer.lemmatize)
+
+    def __getstate__(self):
+        """ The lemma cache is not pickled (e.g. when sent to worker
+            processes), it is rebuilt empty on unpickling.
+        """
+        state = self.__dict__.copy()
+        del state['_lemmatize']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_lemmatizer()
+
+    def config_key(self):
+        """ Returns a string identifying everything that affects the
+            output of this pipeline (used by TokenCache): the tokenizer
+            and its pattern, the punctuation table, the stopwords, and the
+            lemmatizer with the nltk version it comes from.
+        """
+        lemmatizer = self._lemmatize.__wrapped__.__self__
+        tokenizer = self.tokenizer
+        if tokenizer == "regex":
+            tokenizer += " " + REGEX_TOKEN_PATTERN.pattern
+        return "|".join([str(TOKEN_CACHE_VERSION), tokenizer,
+                         "nltk " + nltk.__version__,
+                         type(lemmatizer).__module__ + "." +
+                         type(lemmatizer).__qualname__,
+                         repr(sorted(self.table.items())),
+                         " ".join(sorted(self.stop_words))])
+
+    def clean_article(self, text):
+        """ Converts to lowercase, removes punctuation,
+            removes stopwords anything that isn't alpabetic.
+
+            Args:
+            text: A string of text.
+
+            Returns:
+            A list of cleaned words from the text.
+        """
+        if self.tokenizer == "regex":
+            words = REGEX_TOKEN_PATTERN.findall(text.lower())
+        else:
+            tokens = word_tokenize(text)
+            stripped = [w.lower().translate(self.table) for w in tokens]
+            words = [word for word in stripped if word.isalpha()]
+        return [w for w in words if w not in self.stop_words]
+
+    def transform_article(self, article):
+        """ Cleans text (see clean_article) and performs lemmatization.
+
+            Args:
+            article: a string of text.
+
+            Returns:
+            A string of preprocessed text.
+        """
+        lemmatize = self._lemmatize
+        return " ".join([lemmatize(token)
+                         for token in self.clean_article(article)])
+
+
+def transform_articles(series_of_articles, n_jobs=1, chunksize=None,
+                       pipeline=None, token_cache=None):
+    """ Function for transforming many articles (see transform_article),
+        optionally across a pool of worker processes. The output is in
+        the same order, and identical to, the serial transformation.
+
+        Args:
+        series_of_articles: series or list of text (articles).
+        n_jobs: number of worker processes. -1 (or None) uses all cores.
+        chunksize: number of articles sent to a worker at a time,
+                default splits the articles into 4 chunks per worker.
+        pipeline: TokenPipeline to use, default get_default_pipeline().
+        token_cache: TokenCache (or path to one). Articles found in it
+                are not cleaned again, the others are added to it.
+
+        Returns:
+        A list of preprocessed text.
+    """
+    if isinstance(token_cache, str):
+        token_cache = TokenCache(token_cache)
+        try:
+            return transform_articles(series_of_articles, n_jobs, chunksize,
+                                      pipeline, token_cache)
+        finally:
+            token_cache.close()
+    if token_cache is not None:
+        articles = list(series_of_articles)
+        keys = TokenCache.make_keys(articles, pipeline)
+        transformed_articles = token_cache.get_many(keys)
+        missing = [i for i, article in enumerate(transformed_articles)
+                   if article is None]
+        if missing:
+            cleaned_articles = transform_articles(
+                [articles[i] for i in missing], n_jobs, chunksize, pipeline)
+            token_cache.put_many([keys[i] for i in missing],
+                                 cleaned_articles)
+            for i, article in zip(missing, cleaned_articles):
+                transformed_articles[i] = article
+        return transformed_articles
+
+    if pipeline is None:
+        transform = transform_article
+    else:
+        transform = pipeline.transform_article
+    if n_jobs == 1:
+        return [transform(article) for article in series_of_articles]
+    if n_jobs is None or n_jobs < 0:
+        n_jobs = multiprocessing.cpu_count()
+    articles = list(series_of_articles)
+    if chunksize is None:
+        chunksize = max(1, len(articles) // (4 * n_jobs))
+    with multiprocessing.Pool(n_jobs) as pool:
+        transformed_articles = pool.map(transform, articles, chunksize)
+    return transformed_articles
+
+
+class TokenCache():
+    """ On-disk store of cleaned articles, so repeated builds and
+        parameter sweeps do not clean unchanged articles again.
+
+        Entries are keyed by a hash of the raw article and the
+        TokenPipeline configuration. The cleaned text is appended to
+        tokens.bin, and each put_many() writes the keys of its articles,
+        sorted, with the position of each text, to a new index segment
+        (index_<first>_<last>.npy, numbered by write). Segments of similar
+        size are merged, so a store of N entries has O(log N) segments and
+        each entry is rewritten O(log N) times, however many small writes
+        add to it. Files are memory-mapped read-only and never overwritten,
+        so any number of processes can read the store while (one) writer
+        adds to it.
+    """
+    def __init__(self, path):
+        """
+            Args:
+            path: directory of the store, created if it does not exist
+                    (e.g. configs.TOKEN_CACHE_PATH).
+        """
+        self.path = path
+        self.data_path = os.path.join(path, "tokens.bin")
+        os.makedirs(path, exist_ok=True)
+        self._segments = []
+        self._data = None
+        self.refresh()
+
+    def __len__(self):
+        return sum(len(index) for _, index in self._segments)
+
+    def refresh(self):
+        """ (Re)maps the store, to see entries added since it was opened.
+        """
+        self.close()
+        while True:
+            try:
+                self._segments = [
+                    (segment, np.load(self._segment_path(segment),
+                                      mmap_mode='r'))
+                    for segment in self._list_segments()]
+                break
+            except FileNotFoundError:
+                # merged away by the writer while listing, list again
+                continue
+        if os.path.isfile(self.data_path) and \
+                os.path.getsize(self.data_path) > 0:
+            with open(self.data_path, "rb") as file_handle:
+                self._data = mmap.mmap(file_handle.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+
+    def close(self):
+        """ Unmaps the store's files (refresh() maps them again).
+        """
+        # the index memmaps are unmapped once no longer referenced
+        self._segments = []
+        if self._data is not None:
+            self._data.close()
+        self._data = None
+
+    def _segment_path(self, segment):
+        """ Path of the index segment covering writes segment[0] to
+            segment[1].
+        """
+        return os.path.join(self.path,
+                            "index_{:08d}_{:08d}.npy".format(*segment))
+
+    def _list_segments(self):
+        """ Lists the index segments, oldest first. A segment whose writes
+            are covered by a merged segment is skipped (it is only left
+            while the writer is merging).
+        """
+        segments = []
+        for name in os.listdir(self.path):
+            match = TOKEN_CACHE_SEGMENT_PATTERN.match(name)
+            if match:
+                segments.append((int(match.group(1)), int(match.group(2))))
+        segments.sort(key=lambda segment: (segment[0], -segment[1]))
+        listed = []
+        for segment in segments:
+            if not listed or segment[0] > listed[-1][1]:
+                listed.append(segment)
+        return listed
+
+    @staticmethod
+    def make_keys(series_of_articles, pipeline=None):
+        """ Function for hashing raw articles into store keys.
+
+            Args:
+            series_of_articles: series or list of text (articles).
+            pipeline: TokenPipeline the articles are cleaned with,
+                    default get_default_pipeline().
+
+            Returns:
+            A list of 16 byte keys.
+        """
+        if pipeline is None:
+            pipeline = get_default_pipeline()
+        prefix = hashlib.sha1(pipeline.config_key().encode("utf8")).digest()
+        return [hashlib.sha1(prefix + article.encode("utf8")).digest()[:16]
+                for article in series_of_articles]
+
+    def get_many(self, keys):
+        """ Function for looking up cleaned articles.
+
+            Args:
+            keys: list of keys (see make_keys).
+
+            Returns:
+            A list of cleaned text, None for keys not in the store.
+        """
+        transformed_articles = [None] * len(keys)
+        if not keys:
+            return transformed_articles
+        keys = np.array(keys, dtype='S16')
+        for _, index in self._segments:
+            positions = np.searchsorted(index['key'], keys)
+            positions = np.minimum(positions, len(index) - 1)
+            entries = index[positions]
+            for i in np.flatnonzero(entries['key'] == keys):
+                start = int(entries['offset'][i])
+                end = start + int(entries['length'][i])
+                if start == end:
+                    transformed_articles[i] = ""
+                else:
+                    transformed_articles[i] = \
+                        self._data[start:end].decode("utf8")
+        return transformed_articles
+
+    def put_many(self, keys, cleaned_articles):
+        """ Function for adding cleaned articles to the store. Only one
+            process should write to a store at a time.
+
+            Args:
+            keys: list of keys (see make_keys).
+            cleaned_articles: list of cleaned text, one per key.
+        """
+        new_entries = dict(zip(keys, cleaned_articles))
+        for key, article in zip(keys, self.get_many(keys)):
+            if article is not None:
+                del new_entries[key]
+        if not new_entries:
+            return
+        rows = []
+        with open(self.data_path, "ab") as file_handle:
+            file_handle.seek(0, os.SEEK_END)
+            offset = file_handle.tell()
+            for key, article in new_entries.items():
+                encoded = article.encode("utf8")
+                file_handle.write(encoded)
+                rows.append((key, offset, len(encoded)))
+                offset += len(encoded)
+        segments = [segment for segment, _ in self._segments]
+        write = segments[-1][1] + 1 if segments else 0
+        segments.append((write, write))
+        self._write_segment(segments[-1],
+                            np.array(rows, dtype=TOKEN_CACHE_DTYPE))
+        # merge while the previous segment is not larger than the newest
+        sizes = [len(index) for _, index in self._segments] + [len(rows)]
+        self.close()
+        while len(segments) > 1 and sizes[-2] <= sizes[-1]:
+            older, newer = segments[-2], segments[-1]
+            merged = (older[0], newer[1])
+            self._write_segment(merged, np.concatenate(
+                [np.load(self._segment_path(older)),
+                 np.load(self._segment_path(newer))]))
+            os.remove(self._segment_path(older))
+            os.remove(self._segment_path(newer))
+            segments[-2:] = [merged]
+            sizes[-2:] = [sizes[-2] + sizes[-1]]
+        self.refresh()
+
+    def _write_segment(self, segment, rows):
+        """ Writes an index segment, sorted by key. Written then renamed,
+            so readers never see a partial segment.
+        """
+        rows = rows[np.argsort(rows['key'], kind='mergesort')]
+        tmp_path = os.path.join(self.path, "index.tmp.npy")
+        with open(tmp_path, "wb") as file_handle:
+            np.save(file_handle, rows)
+        os.replace(tmp_path, self._segment_path(segment))
+
+
+def select_vocabulary(doc_freq, term_freq, n_docs, max_features, min_df):
+    """ Function for choosing the vocabulary from word counts, with the
+        same rules as sklearn's CountVectorizer (see ArticlePreprocessor).
+
+        Args:
+        doc_freq: Counter, number of documents each word appears in.
+        term_freq: Counter, total number of times each word appears.
+        n_docs: number of documents counted.
+        max_features: maximum number of words in the vocabulary.
+        min_df: minimum document frequency (int) or proportion (float).
+
+        Returns:
+        A sorted list of words.
+    """
+    if isinstance(min_df, float):
+        min_df = min_df * n_docs
+    words = [word for word, count in doc_freq.items() if count >= min_df]
+    if max_features is not None and len(words) > max_features:
+        words = sorted(words, key=lambda word: (-term_freq[word], word))
+        words = words[:max_features]
+    return sorted(words)
+
+
+def load_dtm_shards(shard_paths):
+    """ Function for loading document-term-matrix shards written by
+        ArticlePreprocessor.fit_stream into one sparse matrix. The whole
+        matrix is held in memory; only the online topic model backend
+        trains on the shards one at a time.
+
+        Args:
+        shard_paths: list of .npz shard files, in row order.
+
+        Returns:
+        A scipy CSR matrix.
+    """
+    return sparse.vstack([sparse.load_npz(path) for path in shard_paths],
+                         format='csr')
+
+
+def get_term_frequencies(dtm, vocab=None):
+    """ Function for getting the word counts of the first article of a
+        document-term-matrix, e.g. for word_cloud_generator.
+
+        Args:
+        dtm: document-term-matrix from ArticlePreprocessor.transform
+        (pandas dataframe or scipy sparse matrix).
+        vocab: list mapping to the columns of a sparse dtm
+        (ArticlePreprocessor.get_vocab()).
+
+        Returns:
+        Dictionary of word to count, for the words in the article.
+    """
+    if isinstance(dtm, pd.DataFrame):
+        counts = dtm.iloc[0]
+        counts = counts[counts > 0]
+        return dict(zip(counts.index, counts.values.tolist()))
+    row = sparse.csr_matrix(dtm[0])
+    return dict((vocab[index], count)
+                for index, count in zip(row.indices, row.data.tolist())
+                if count > 0)
 
 
 class ArticlePreprocessor():
     """ Class for preprocessing articles.
     """
-    def __init__(self, max_features=100000, min_df=5):
+    def __init__(self, max_features=100000, min_df=5, sparse=False,
+                 n_jobs=1, pipeline=None, incremental=False,
+                 token_cache=None):
         """
             Args:
             max_features: maximum number of words in the vocabulary
@@ -93,11 +534,52 @@ class ArticlePreprocessor():
                     than the given threshold. If float, the parameter
                     represents a proportion of documents. If integer,
                     the absolute counts.
+            sparse: if True, document-term-matrices are returned as
+                    scipy CSR matrices (columns given by get_vocab())
+                    instead of dense pandas dataframes. Use for large
+                    corpora, where the dense matrix does not fit in memory.
+            n_jobs: number of processes used to clean articles when
+                    fitting (see transform_articles). -1 uses all cores.
+            pipeline: TokenPipeline used to clean articles when fitting
+                    and transforming, default get_default_pipeline().
+            incremental: if True, keep the counts of every word seen
+                    (not just the vocabulary), so new articles can be
+                    added later with partial_fit().
+            token_cache: path to a TokenCache directory. Articles cleaned
+                    when fitting are stored there, and looked up instead
+                    of cleaned again on later fits.
         """
         self.max_features = max_features
         self.min_df = min_df
+        self.sparse = sparse
+        self.n_jobs = n_jobs
+        self.pipeline = pipeline
+        self.incremental = incremental
+        self.token_cache = token_cache
         self.dtm = None
         self.vectorizer = None
+        # Counts of every word seen, kept by incremental preprocessors
+        self.term_counts = None
+        self.terms = None
+
+    @classmethod
+    def from_vocabulary(cls, vocab, sparse=False, pipeline=None):
+        """ Function for creating a preprocessor that transforms articles
+            onto a saved vocabulary (see artifacts.py), without fitting.
+            It has no document-term-matrix of its own.
+
+            Args:
+            vocab: list of words, the columns of the document-term-matrix.
+            sparse, pipeline: see __init__.
+
+            Returns:
+            ArticlePreprocessor ready to transform().
+        """
+        processor = cls(sparse=sparse, pipeline=pipeline)
+        vectorizer = CountVectorizer(vocabulary=list(vocab),
+                                     preprocessor=processor._transform_article)
+        processor.vectorizer = vectorizer.fit([])
+        return processor
 
     def fit(self, series_of_articles):
         """ Function for fitting preprocessor.
@@ -118,12 +600,18 @@ class ArticlePreprocessor():
         if isinstance(series_of_articles, str):
             series_of_articles = [series_of_articles]  # Convert to list
 
+        # Clean every article exactly once. The cleaned text is used both
+        # for the check below and for fitting the vectorizer.
+        cleaned_articles = transform_articles(series_of_articles,
+                                              self.n_jobs,
+                                              pipeline=self.pipeline,
+                                              token_cache=self.token_cache)
+
         # Ensure the transformation will return at least 1 word. Otherwise
         # raise ValueError.
-        cleaned_words = []
-        for article in series_of_articles:
-            cleaned_words = cleaned_words + transform_article(article).split()
-        cleaned_words = list(set(cleaned_words))
+        cleaned_words = set()
+        for article in cleaned_articles:
+            cleaned_words.update(article.split())
         # NOTE: This isn't the full vocabulary,
         # - just a good approximation (non-single-letters)
         num_words = len(cleaned_words)
@@ -139,7 +627,7 @@ class ArticlePreprocessor():
         if num_words < 5*self.min_df:
             self.min_df = 0
 
-        self.get_dtm(series_of_articles)
+        self.get_dtm(cleaned_articles, precleaned=True)
         return self
 
     def transform(self, series_of_articles):
@@ -153,7 +641,8 @@ class ArticlePreprocessor():
 
             Returns:
             document-term-matrix with the same columns as in the fit
-            text document-term-matrix (under field 'self.dtm')
+            text document-term-matrix (under field 'self.dtm').
+            A scipy CSR matrix if the preprocessor is sparse.
         """
         # sklearn vectorizer needs an iterable list/series,
         # so convert to list of just a single string
@@ -165,24 +654,29 @@ class ArticlePreprocessor():
 
     def fit_transform(self, series_of_articles):
         """ Convenience function for fitting/transforming corpus.
+            Returns the document-term-matrix built while fitting, so
+            the corpus is not cleaned a second time.
         """
         self.fit(series_of_articles)
-        dtm = self.transform(series_of_articles)
-        return dtm
+        return self.get_dtm()
 
-    def get_dtm(self, series_of_articles=None):
+    def get_dtm(self, series_of_articles=None, precleaned=False):
         """ Method for getting the document-term-matrix (dtm).
             If a series_of_articles is not passed, assumes
             dtm has already been constructed.
 
             Args:
             series_of_articles: a pandas series of articles.
+            precleaned: True if series_of_articles has already been
+                    through transform_article(s).
 
             Returns:
-            A document-term-matrix.
+            A document-term-matrix (scipy CSR matrix if the preprocessor
+            is sparse).
 
             Added/Modified Fields:
-            dtm: a copy of the document-term-matrix.
+            dtm: a copy of the document-term-matrix. Sparse matrices are
+                 not copied, so do not modify the returned matrix in place.
             vectorizer: the sklearn CountVectorizer(). See their
                         documentation for more information.
         """
@@ -190,20 +684,225 @@ class ArticlePreprocessor():
             if self.dtm is None:
                 raise ValueError("Preprocessor has not been fit. \
                                     Provide series of articles.")
+            elif self.sparse:
+                return self.dtm
             else:
                 return self.dtm.copy()
 
-        vectorizer = CountVectorizer(preprocessor=transform_article,
-                                     max_features=self.max_features,
-                                     min_df=self.min_df)
+        clean_first = self.n_jobs != 1 or self.incremental or \
+            self.token_cache is not None
+        if clean_first and not precleaned:
+            series_of_articles = transform_articles(
+                series_of_articles, self.n_jobs, pipeline=self.pipeline,
+                token_cache=self.token_cache)
+            precleaned = True
+
+        if self.incremental:
+            # Count every word, then choose the vocabulary from the counts
+            counter = CountVectorizer()
+            self.term_counts = counter.fit_transform(series_of_articles)
+            self.terms = list(counter.get_feature_names())
+            return self._select_from_counts()
+
+        if precleaned:
+            # Cleaned text is already lowercase, so sklearn's default
+            # preprocessing leaves it unchanged
+            vectorizer = CountVectorizer(max_features=self.max_features,
+                                         min_df=self.min_df)
+        else:
+            vectorizer = CountVectorizer(preprocessor=self._transform_article,
+                                         max_features=self.max_features,
+                                         min_df=self.min_df)
 
         result = vectorizer.fit_transform(series_of_articles)
+        # New articles passed to transform() still need cleaning
+        vectorizer.set_params(preprocessor=self._transform_article)
         self.vectorizer = vectorizer
         dtm = self._post_process(result)
-        self.dtm = dtm.copy()
+        if self.sparse:
+            self.dtm = dtm
+        else:
+            self.dtm = dtm.copy()
+
+        return dtm
+
+    def partial_fit(self, series_of_articles):
+        """ Function for adding new articles to an incremental preprocessor
+            (see incremental in the constructor). Only the new articles are
+            cleaned: their word counts are added to the stored counts, the
+            vocabulary is chosen again with the max_features/min_df rules,
+            and the new rows are appended to the document-term-matrix.
+
+            Args:
+            series_of_articles: pandas series of new text (articles) or a
+                    single text.
+
+            Returns:
+            A dictionary with the words that entered ('added') and left
+            ('removed') the vocabulary.
 
+            Raises:
+            ValueError() if the preprocessor was not fit with
+                    incremental=True.
+        """
+        if self.term_counts is None:
+            raise ValueError("Preprocessor must be fit with \
+                                incremental=True before partial_fit.")
+        if isinstance(series_of_articles, str):
+            series_of_articles = [series_of_articles]  # Convert to list
+        old_vocab = set(self.get_vocab())
+
+        cleaned_articles = transform_articles(series_of_articles,
+                                              self.n_jobs,
+                                              pipeline=self.pipeline,
+                                              token_cache=self.token_cache)
+        # Count the new articles, giving unseen words new columns
+        analyzer = CountVectorizer().build_analyzer()
+        term_ids = dict((term, idx) for idx, term in enumerate(self.terms))
+        rows, columns, counts = [], [], []
+        for i, article in enumerate(cleaned_articles):
+            for word, count in Counter(analyzer(article)).items():
+                if word not in term_ids:
+                    term_ids[word] = len(self.terms)
+                    self.terms.append(word)
+                rows.append(i)
+                columns.append(term_ids[word])
+                counts.append(count)
+        n_terms = len(self.terms)
+        new_counts = sparse.csr_matrix(
+            (counts, (rows, columns)),
+            shape=(len(cleaned_articles), n_terms),
+            dtype=self.term_counts.dtype)
+        old_counts = self.term_counts.tocsr()
+        old_counts = sparse.csr_matrix(
+            (old_counts.data, old_counts.indices, old_counts.indptr),
+            shape=(old_counts.shape[0], n_terms))
+        self.term_counts = sparse.vstack([old_counts, new_counts],
+                                         format='csr')
+
+        self._select_from_counts()
+        new_vocab = set(self.get_vocab())
+        return {'added': sorted(new_vocab - old_vocab),
+                'removed': sorted(old_vocab - new_vocab)}
+
+    def _select_from_counts(self):
+        """ Internal function for choosing the vocabulary from the counts
+            of every word seen (incremental preprocessors), and building
+            the vectorizer and document-term-matrix for it.
+        """
+        term_counts = self.term_counts.tocsr()
+        term_counts.sum_duplicates()
+        doc_freq = np.bincount(term_counts.indices,
+                               minlength=len(self.terms))
+        term_freq = np.asarray(term_counts.sum(axis=0)).ravel()
+        vocab = select_vocabulary(dict(zip(self.terms, doc_freq)),
+                                  dict(zip(self.terms, term_freq)),
+                                  term_counts.shape[0],
+                                  self.max_features, self.min_df)
+        term_ids = dict((term, idx) for idx, term in enumerate(self.terms))
+        columns = [term_ids[word] for word in vocab]
+
+        vectorizer = CountVectorizer(vocabulary=vocab,
+                                     preprocessor=self._transform_article)
+        self.vectorizer = vectorizer.fit([])
+        dtm = self._post_process(term_counts[:, columns])
+        if self.sparse:
+            self.dtm = dtm
+        else:
+            self.dtm = dtm.copy()
         return dtm
 
+    def fit_stream(self, csv_path, column="content",
+                   chunksize=STREAM_CHUNKSIZE, shard_path=None):
+        """ Function for fitting preprocessor on a corpus csv too large to
+            load at once. The csv is read chunksize articles at a time.
+
+            The first pass cleans each chunk, accumulates document and
+            term frequencies to choose the vocabulary, and keeps the
+            cleaned text on disk. The second pass counts the cleaned text
+            against the vocabulary and writes one sparse shard per chunk,
+            so no article is cleaned twice. The preprocessor must be
+            sparse, since the shards are sparse.
+
+            Args:
+            csv_path: path to the corpus csv (e.g. configs.CORPUS_PATH).
+            column: name of the column containing the article text.
+            chunksize: number of articles read at a time.
+            shard_path: directory to write the shards to
+                    (default configs.DTM_SHARD_PATH).
+
+            Returns:
+            A list of shard files, in row order (see load_dtm_shards).
+
+            Raises:
+            ValueError() if the preprocessor is not sparse, or if not
+            enough 'clean' words to fit model.
+        """
+        if not self.sparse:
+            raise ValueError("fit_stream writes sparse shards, use \
+                                ArticlePreprocessor(sparse=True).")
+        if shard_path is None:
+            shard_path = configs.DTM_SHARD_PATH
+        os.makedirs(shard_path, exist_ok=True)
+        # Splits cleaned text into words the same way CountVectorizer does
+        analyzer = CountVectorizer().build_analyzer()
+
+        doc_freq = Counter()
+        term_freq = Counter()
+        n_docs = 0
+        cleaned_paths = []
+        chunks = pd.read_csv(csv_path, usecols=[column], chunksize=chunksize)
+        for i, chunk in enumerate(chunks):
+            cleaned_articles = transform_articles(
+                chunk[column].fillna("").astype(str), self.n_jobs,
+                pipeline=self.pipeline, token_cache=self.token_cache)
+            for article in cleaned_articles:
+                words = analyzer(article)
+                term_freq.update(words)
+                doc_freq.update(set(words))
+            n_docs += len(cleaned_articles)
+            cleaned_path = os.path.join(shard_path,
+                                        "cleaned_{:05d}.txt".format(i))
+            with open(cleaned_path, "w", encoding="utf8") as file_handle:
+                for article in cleaned_articles:
+                    file_handle.write(article + "\n")
+            cleaned_paths.append(cleaned_path)
+
+        # Same checks as in fit()
+        num_words = len(doc_freq)
+        if num_words == 0:
+            raise ValueError("Article(s) do not contain any \
+                                alphabetic words to parse.")
+        if num_words < 5*self.min_df:
+            self.min_df = 0
+        vocab = select_vocabulary(doc_freq, term_freq, n_docs,
+                                  self.max_features, self.min_df)
+
+        counter = CountVectorizer(vocabulary=vocab)
+        shard_paths = []
+        for i, cleaned_path in enumerate(cleaned_paths):
+            with open(cleaned_path, encoding="utf8") as file_handle:
+                cleaned_articles = file_handle.read().split("\n")[:-1]
+            dtm_path = os.path.join(shard_path, "dtm_{:05d}.npz".format(i))
+            sparse.save_npz(dtm_path, counter.transform(cleaned_articles))
+            shard_paths.append(dtm_path)
+            os.remove(cleaned_path)
+
+        vectorizer = CountVectorizer(vocabulary=vocab,
+                                     preprocessor=self._transform_article)
+        self.vectorizer = vectorizer.fit([])
+        # The dtm stays on disk
+        self.dtm = None
+        return shard_paths
+
+    @property
+    def _transform_article(self):
+        """ Article cleaning function of the preprocessor's pipeline.
+        """
+        if self.pipeline is None:
+            return transform_article
+        return self.pipeline.transform_article
+
     def _post_process(self, vectorizer_output):
         """ Internal function for processing result of sklearn
             into a document-term-matrix.
@@ -211,6 +910,8 @@ class ArticlePreprocessor():
             Args:
             vectorizer_output: output of sklearn's CountVectorizer.
         """
+        if self.sparse:
+            return vectorizer_output.tocsr()
         tdm = pd.DataFrame(vectorizer_output.toarray().transpose(),
                            index=self.vectorizer.get_feature_names())
         dtm = tdm.transpose()
@@ -222,7 +923,7 @@ class ArticlePreprocessor():
             list mapping to columns of document-term-matrix
             of latest transformed (.transform()) text.
         """
-        if self.dtm is None:
+        if self.vectorizer is None:
             raise ValueError("Preprocessor has not been fit. \
                                 Provide series of articles.")
-        return list(self.dtm.columns)
+        return list(self.vectorizer.get_feature_names())
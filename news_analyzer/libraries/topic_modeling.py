@@ -2,28 +2,75 @@
 This module is used to create the topic models from the corpus.
 """
 # standard
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
 import numpy as np
 import pandas as pd
+from scipy import sparse
 # guidedlda imports
 import guidedlda
+# Internal tools
+import configs
+import online_lda
 
+# Module Constants
+# logger of guidedlda's sampling loop
+GUIDEDLDA_LOGGER = logging.getLogger('guidedlda')
+# Grid search candidates whose screening log likelihood is this fraction
+# below the best candidate's are not fitted to n_iter
+PRUNE_TOL = 0.01
+# dtm shared with grid search worker processes (see _init_gridsearch_worker)
+_GRIDSEARCH_DTM = None
+# sampler state shared with ParallelLDA worker processes
+_SAMPLING_STATE = None
+# Number of words given warm start topics at a time
+WARM_START_CHUNKSIZE = 100000
+# Largest (distinct words x topics) array built by infer_topics at a time,
+# small enough to stay in cache
+INFERENCE_BATCH_ENTRIES = 1000000
 
-def get_vocab(dtm):
+
+def get_dtm_shape(dtm):
+    """ Gets the shape of a document-term-matrix.
+        Args:
+            dtm = numpy array, pandas dataframe, scipy sparse matrix or
+                    list of paths of .npz dtm shards
+        Returns:
+            shape = tuple, (number of documents, number of words)
+    """
+    if isinstance(dtm, list):
+        return online_lda.get_shard_shape(dtm)
+    return dtm.shape
+
+
+def get_vocab(dtm, vocab=None):
     """ Creates corpus vocabulary list and word2id dict.
         Args:
-            dtm = pandas dataframe, document-term-matrix of corpus
-                    output from text_processing.get_dtm()
+            dtm = pandas dataframe, scipy sparse matrix or list of paths of
+                    sparse dtm shards, document-term-matrix of corpus output
+                    from text_processing.get_dtm()
+            vocab = list, column names of a sparse dtm, output from
+                    text_processing.ArticlePreprocessor.get_vocab()
         Returns:
             vocab = list, list of corpus vocabulary
             word2id = dict, dictionary with word as key and unique id as value
     """
     if isinstance(dtm, pd.DataFrame):
         vocab = list(dtm.columns)
-        dtm = np.array(dtm)
-        word2id = dict((v, idx) for idx, v in enumerate(vocab))
-        return vocab, word2id
+    elif sparse.issparse(dtm) or isinstance(dtm, list):
+        if vocab is None or len(vocab) != get_dtm_shape(dtm)[1]:
+            raise ValueError(
+                'Please pass in the vocabulary of the sparse dtm.')
+        vocab = list(vocab)
     else:
-        raise ValueError('Please pass in a valid pandas dataframe.')
+        raise ValueError(
+            'Please pass in a valid pandas dataframe or sparse matrix.')
+    word2id = dict((v, idx) for idx, v in enumerate(vocab))
+    return vocab, word2id
 
 
 def clean_topics(topics, word2id, bad_topics=None):
@@ -66,6 +113,102 @@ def get_seed_topics(topics, word2id):
     return seed_topics
 
 
+def map_topic_word(model, vocab, word2id):
+    """ Maps the topic-word distributions of a fitted model onto a new
+        vocabulary, to warm start a refit (see TopicModeler.fit()).
+        Args:
+            model = guidedlda or OnlineLDA object, previously fitted model
+            vocab = list, vocabulary the model was fitted with
+            word2id = dict, new vocabulary, output from get_vocab()
+        Returns:
+            topic_word = numpy array, shape (n_topics, len(word2id)), words
+                    new to the vocabulary get each topic's smallest
+                    probability
+    """
+    old_topic_word = model.components_
+    topic_word = np.repeat(old_topic_word.min(axis=1)[:, np.newaxis],
+                           len(word2id), axis=1)
+    old_ids = [idx for idx, word in enumerate(vocab) if word in word2id]
+    new_ids = [word2id[vocab[idx]] for idx in old_ids]
+    topic_word[:, new_ids] = old_topic_word[:, old_ids]
+    return topic_word / topic_word.sum(axis=1)[:, np.newaxis]
+
+
+def infer_topics(model, dtm, max_iter=20, tol=1e-16):
+    """ Infers the topic distributions of many documents at once with a
+        fitted model. Same estimate as guidedlda's transform() ("iterated
+        pseudo-counts", Wallach et al. 2009), updated for all documents of
+        a batch together with numpy instead of one document at a time.
+        Args:
+            model = guidedlda or OnlineLDA object, fitted topic model
+            dtm = numpy array, pandas dataframe or scipy sparse matrix,
+                    document-term-matrix of the documents
+            max_iter = int, maximum number of iterations
+            tol = float, a document stops updating once its topic
+                    assignments change by less than tol
+        Returns:
+            doc_topic = numpy array, shape (n_documents, n_topics),
+                    uniform for documents without any known words
+    """
+    dtm = online_lda.to_csr(dtm)
+    topic_word = model.components_
+    n_topics = topic_word.shape[0]
+    doc_topic = np.full((dtm.shape[0], n_topics), 1. / n_topics)
+    # batches of documents, by number of distinct words
+    max_words = max(INFERENCE_BATCH_ENTRIES // n_topics, 1)
+    start = 0
+    while start < dtm.shape[0]:
+        end = np.searchsorted(dtm.indptr, dtm.indptr[start] + max_words,
+                              side='right') - 1
+        end = min(max(end, start + 1), dtm.shape[0])
+        batch = dtm[start:end]
+        doc_topic[start:end] = _infer_batch(
+            batch, topic_word, model.alpha, max_iter, tol)
+        start = end
+    return doc_topic
+
+
+def _infer_batch(dtm, topic_word, alpha, max_iter, tol):
+    """ infer_topics() for one batch of documents. All occurrences of a
+        word in a document have the same topic probabilities, so they are
+        kept once per distinct word, weighted by the word's count.
+    """
+    n_docs = dtm.shape[0]
+    n_topics = topic_word.shape[0]
+    n_words = len(dtm.indices)
+    doc_ids = np.repeat(np.arange(n_docs), np.diff(dtm.indptr))
+    # sums the rows of the distinct words of each document, times counts
+    doc_sum = sparse.csr_matrix(
+        (dtm.data.astype(float), np.arange(n_words), dtm.indptr),
+        shape=(n_docs, n_words))
+    word_topic = topic_word[:, dtm.indices].T
+    # probs[i] is the topic distribution of the ith distinct word
+    probs = np.zeros((n_words, n_topics))
+    active = np.ones(n_docs, dtype=bool)
+    for _ in range(max_iter + 1):  # +1 is for initialization
+        new_probs = doc_sum.dot(probs)[doc_ids]
+        new_probs -= probs
+        new_probs += alpha
+        new_probs *= word_topic
+        new_probs /= new_probs.sum(axis=1)[:, np.newaxis]
+        delta = doc_sum.dot(np.abs(new_probs - probs).sum(axis=1))
+        # converged documents keep their previous values, as in guidedlda
+        if active.all():
+            probs = new_probs
+        else:
+            word_active = active[doc_ids]
+            probs[word_active] = new_probs[word_active]
+        active &= delta >= tol
+        if not active.any():
+            break
+    doc_counts = doc_sum.dot(probs)
+    doc_lengths = doc_counts.sum(axis=1)
+    doc_topic = np.full((n_docs, n_topics), 1. / n_topics)
+    known = doc_lengths > 0
+    doc_topic[known] = doc_counts[known] / doc_lengths[known][:, np.newaxis]
+    return doc_topic
+
+
 def display_topics(n_words, model, vocab):
     """ Displays most relevant words in each topic.
         Args:
@@ -79,10 +222,361 @@ def display_topics(n_words, model, vocab):
         print('Topic {}: {}'.format(i, ' '.join(topic_words)))
 
 
+class _Converged(Exception):
+    """ Raised by EarlyStoppingLDA._sample_topics to end GuidedLDA's
+        sampling loop once the log likelihood has converged.
+    """
+
+
+class EarlyStoppingLDA(guidedlda.GuidedLDA):
+    """ GuidedLDA that stops sampling once the log likelihood has converged.
+
+        The log likelihood is computed every refresh iterations, by
+        GuidedLDA's own sampling loop. Once it has changed by less than tol
+        (relative) on patience checks in a row, sampling stops before
+        n_iter. The number of iterations run and the fitting time are kept
+        in n_iter_ and fit_time_.
+    """
+    def __init__(self, n_topics, n_iter=2000, alpha=0.01, eta=0.01,
+                 random_state=None, refresh=10, tol=None, patience=1,
+                 init_topic_word=None):
+        """ Constructor
+
+            Args:
+                see guidedlda.GuidedLDA, and
+                tol = float, relative change in log likelihood below which
+                        it counts as converged (None never stops early)
+                patience = int, number of converged checks in a row needed
+                        to stop
+                init_topic_word = numpy array, shape (n_topics, n_words),
+                        topic-word distributions to start from instead of
+                        the default initialization (see map_topic_word()),
+                        not kept after fitting
+        """
+        super().__init__(n_topics, n_iter=n_iter, alpha=alpha, eta=eta,
+                         random_state=random_state, refresh=refresh)
+        self.tol = tol
+        self.patience = patience
+        self.init_topic_word = init_topic_word
+        self.n_iter_ = None
+        self.fit_time_ = None
+
+    def _fit(self, X, seed_topics, seed_confidence):
+        """ GuidedLDA._fit, stopped by _sample_topics once converged.
+        """
+        s_time = time.time()
+        self.n_iter_ = 0
+        self._n_converged = 0
+        try:
+            super()._fit(X, seed_topics, seed_confidence)
+        except _Converged:
+            self._finish_fit()
+        self.init_topic_word = None
+        self.fit_time_ = time.time() - s_time
+        return self
+
+    def _sample_topics(self, rands):
+        """ Samples all topic assignments (see _sample_sweep), unless the
+            log likelihood GuidedLDA._fit has just added to loglikelihoods_
+            has converged. Called once per iteration.
+        """
+        if self.tol is not None and \
+                len(self.loglikelihoods_) > 1 and \
+                self.n_iter_ % self.refresh == 0:
+            prev_ll, ll = self.loglikelihoods_[-2:]
+            if abs(ll - prev_ll) <= self.tol * abs(prev_ll):
+                self._n_converged += 1
+            else:
+                self._n_converged = 0
+            if self._n_converged >= self.patience:
+                raise _Converged()
+        self._sample_sweep(rands)
+        self.n_iter_ += 1
+
+    def _sample_sweep(self, rands):
+        """ Samples all topic assignments once, as GuidedLDA does.
+        """
+        super()._sample_topics(rands)
+
+    def _finish_fit(self):
+        """ The end of GuidedLDA._fit, for a fit stopped early: logs the
+            final log likelihood, sets the fitted distributions and deletes
+            the sampler state.
+        """
+        ll = self.loglikelihood()
+        GUIDEDLDA_LOGGER.info("<{}> log likelihood: {:.0f}".format(
+            self.n_iter_ - 1, ll))
+        self.components_ = (self.nzw_ + self.eta).astype(float)
+        self.components_ /= np.sum(self.components_, axis=1)[:, np.newaxis]
+        self.topic_word_ = self.components_
+        self.word_topic_ = (self.nzw_ + self.eta).astype(float)
+        self.word_topic_ /= np.sum(self.word_topic_, axis=0)[np.newaxis, :]
+        self.word_topic_ = self.word_topic_.T
+        self.doc_topic_ = (self.ndz_ + self.alpha).astype(float)
+        self.doc_topic_ /= np.sum(self.doc_topic_, axis=1)[:, np.newaxis]
+        del self.WS
+        del self.DS
+        del self.ZS
+
+    def _initialize(self, X, seed_topics, seed_confidence):
+        """ Same as GuidedLDA._initialize, or, with init_topic_word, draws
+            each word's topic from init_topic_word and the topic mix of its
+            document. Seed topics only affect the default initialization,
+            so they are not used (the previous model already reflects them).
+        """
+        if self.init_topic_word is None:
+            return super()._initialize(X, seed_topics, seed_confidence)
+        n_docs, vocab_size = X.shape
+        if self.init_topic_word.shape != (self.n_topics, vocab_size):
+            raise ValueError(
+                'init_topic_word must have shape (n_topics, n_words)!')
+        random_state = np.random.RandomState(self.random_state)
+        self.beta = 0.1
+        self.WS, self.DS = guidedlda.utils.matrix_to_lists(X)
+        self.ZS = np.empty_like(self.WS, dtype=np.intc)
+        word_topic = self.init_topic_word.T
+        # topic mix of each document from p(topic | word) of its words
+        doc_topic = np.zeros((n_docs, self.n_topics))
+        for start in range(0, len(self.WS), WARM_START_CHUNKSIZE):
+            end = start + WARM_START_CHUNKSIZE
+            topic_probs = word_topic[self.WS[start:end]]
+            topic_probs /= topic_probs.sum(axis=1)[:, np.newaxis]
+            np.add.at(doc_topic, self.DS[start:end], topic_probs)
+        doc_topic += self.alpha
+        for start in range(0, len(self.WS), WARM_START_CHUNKSIZE):
+            end = start + WARM_START_CHUNKSIZE
+            cum_probs = np.cumsum(word_topic[self.WS[start:end]] *
+                                  doc_topic[self.DS[start:end]], axis=1)
+            draws = random_state.rand(len(cum_probs)) * cum_probs[:, -1]
+            self.ZS[start:end] = (cum_probs < draws[:, np.newaxis]).sum(
+                axis=1)
+        self.nzw_ = np.bincount(
+            self.ZS.astype(np.int64) * vocab_size + self.WS,
+            minlength=self.n_topics * vocab_size).reshape(
+                self.n_topics, vocab_size).astype(np.intc)
+        self.ndz_ = np.bincount(
+            self.DS.astype(np.int64) * self.n_topics + self.ZS,
+            minlength=n_docs * self.n_topics).reshape(
+                n_docs, self.n_topics).astype(np.intc)
+        self.nz_ = self.nzw_.sum(axis=1).astype(np.intc)
+        self.loglikelihoods_ = []
+
+
+def _init_sampling_worker(path, alpha, eta, random_state):
+    """ Pool initializer, maps the ParallelLDA sampler state once per worker
+        process.
+    """
+    global _SAMPLING_STATE
+    arrays = dict((name, np.load(os.path.join(path, name + '.npy'),
+                                 mmap_mode='r+'))
+                  for name in ['WS', 'DS', 'ZS', 'ndz', 'nzw', 'nz', 'rands'])
+    # local copy of the topic-word counts at the start of a sweep
+    snapshot = {'sweep': None, 'nzw': None, 'nz': None}
+    _SAMPLING_STATE = (arrays, alpha, eta, random_state, snapshot)
+
+
+def apply_topic_changes(nzw, nz, words, old_topics, new_topics, sign=1):
+    """ Moves the counts of tokens from their old to their new topics (or
+        back, with sign=-1), in place. Costs O(changed tokens).
+        Args:
+            nzw, nz = numpy arrays, topic-word and topic counts
+            words = numpy array, word of each token whose topic changed
+            old_topics, new_topics = numpy arrays, topics of each of them
+            sign = int, 1 to apply the changes, -1 to undo them
+    """
+    vocab_size = nzw.shape[1]
+    flat_nzw = nzw.reshape(-1)
+    old_cells = old_topics.astype(np.int64) * vocab_size + words
+    new_cells = new_topics.astype(np.int64) * vocab_size + words
+    np.subtract.at(flat_nzw, old_cells, sign)
+    np.add.at(flat_nzw, new_cells, sign)
+    np.subtract.at(nz, old_topics, sign)
+    np.add.at(nz, new_topics, sign)
+
+
+def _sample_partition(args):
+    """ Samples the topic assignments of one partition of the documents for
+        one sweep, against the worker's local copy of the topic-word counts.
+        The copy is brought up to date with the last sweep's changes, and
+        only copied again from the shared counts if the worker missed one.
+        Args:
+            args = tuple, (partition, first token, last token + 1, sweep,
+                    changes of the last sweep as (words, old_topics,
+                    new_topics), or None)
+        Returns:
+            words = numpy array, word of each token whose topic changed
+            old_topics = numpy array, previous topic of each of them
+            new_topics = numpy array, new topic of each of them
+    """
+    partition, start, end, sweep, last_changes = args
+    arrays, alpha, eta, random_state, snapshot = _SAMPLING_STATE
+    if snapshot['sweep'] == sweep - 1 and last_changes is not None:
+        apply_topic_changes(snapshot['nzw'], snapshot['nz'], *last_changes)
+    elif snapshot['sweep'] != sweep:
+        snapshot['nzw'] = np.array(arrays['nzw'])
+        snapshot['nz'] = np.array(arrays['nz'])
+    snapshot['sweep'] = sweep
+    nzw, nz = snapshot['nzw'], snapshot['nz']
+    rands = np.array(arrays['rands'])
+    topics = arrays['ZS'][start:end]
+    old_topics = np.array(topics)
+    # seeded by partition and sweep, so results do not depend on which
+    # process runs which partition
+    np.random.RandomState([random_state, partition, sweep]).shuffle(rands)
+    gibbs_sweep(arrays['WS'][start:end], arrays['DS'][start:end], topics,
+                nzw, arrays['ndz'], nz, alpha, eta, rands)
+    changed = np.flatnonzero(topics != old_topics)
+    changes = (np.array(arrays['WS'][start:end][changed]),
+               old_topics[changed], np.array(topics[changed]))
+    # back to the counts at the start of the sweep, for other partitions
+    apply_topic_changes(nzw, nz, *changes, sign=-1)
+    return changes
+
+
+def gibbs_sweep(WS, DS, ZS, nzw, ndz, nz, alpha, eta, rands):
+    """ One collapsed Gibbs sampling sweep over the given tokens, updating
+        ZS and the counts in place. This is the compiled sampler that
+        GuidedLDA._sample_topics runs on the whole corpus; it is not public
+        in guidedlda, so it is only called here.
+        Args:
+            WS, DS, ZS = numpy arrays, word, document and topic of each
+                    token
+            nzw, ndz, nz = numpy arrays, topic-word, document-topic and
+                    topic counts
+            alpha, eta = numpy arrays, priors of each topic and word
+            rands = numpy array, uniform random numbers to draw from
+    """
+    if not hasattr(getattr(guidedlda, '_guidedlda', None),
+                   '_sample_topics'):
+        raise ImportError(
+            'This guidedlda version has no compiled sampler, use n_jobs=1.')
+    guidedlda._guidedlda._sample_topics(WS, DS, ZS, nzw, ndz, nz, alpha,
+                                        eta, rands)
+
+
+class ParallelLDA(EarlyStoppingLDA):
+    """ EarlyStoppingLDA that samples on several cores, as approximate
+        distributed LDA (Newman et al., 2009).
+
+        The documents are split into n_jobs partitions of about the same
+        number of words. In each sweep every partition is sampled in its
+        own process against the topic-word counts from the end of the last
+        sweep. Each worker returns only the tokens whose topic changed, and
+        the counts (and each worker's local copy of them) are updated by
+        those changes, at a cost in the number of changed tokens rather
+        than the size of the counts. The corpus, topic assignments and
+        counts are shared with the workers as memory-mapped files.
+    """
+    def __init__(self, n_topics, n_iter=2000, alpha=0.01, eta=0.01,
+                 random_state=0, refresh=10, tol=None, patience=1,
+                 n_jobs=-1, init_topic_word=None):
+        """ Constructor
+
+            Args:
+                see EarlyStoppingLDA, and
+                n_jobs = int, number of worker processes (-1 uses all cores)
+        """
+        super().__init__(n_topics, n_iter=n_iter, alpha=alpha, eta=eta,
+                         random_state=random_state, refresh=refresh,
+                         tol=tol, patience=patience,
+                         init_topic_word=init_topic_word)
+        self.n_jobs = n_jobs
+        self._pool = None
+        self._path = None
+        self._partitions = None
+        self._shared = None
+        self._sweep = 0
+        self._last_changes = None
+
+    def _fit(self, X, seed_topics, seed_confidence):
+        """ Same as EarlyStoppingLDA._fit, with the sampling in parallel.
+        """
+        try:
+            return super()._fit(X, seed_topics, seed_confidence)
+        finally:
+            self._stop_workers()
+
+    def _initialize(self, X, seed_topics, seed_confidence):
+        """ Same as EarlyStoppingLDA._initialize, then starts the workers.
+        """
+        super()._initialize(X, seed_topics, seed_confidence)
+        n_jobs = self.n_jobs
+        if n_jobs is None or n_jobs < 0:
+            n_jobs = multiprocessing.cpu_count()
+        # split at document boundaries (DS is sorted)
+        n_words = len(self.WS)
+        cuts = np.linspace(0, n_words, n_jobs + 1).astype(int)[1:-1]
+        cuts = np.searchsorted(self.DS, self.DS[np.minimum(cuts,
+                                                           n_words - 1)])
+        bounds = [0] + list(cuts) + [n_words]
+        self._partitions = [(int(start), int(end))
+                            for start, end in zip(bounds[:-1], bounds[1:])
+                            if end > start]
+        self._path = tempfile.mkdtemp()
+        for name, array in [('WS', self.WS), ('DS', self.DS),
+                            ('ZS', self.ZS), ('ndz', self.ndz_),
+                            ('nzw', self.nzw_), ('nz', self.nz_),
+                            ('rands', self._rands)]:
+            np.save(os.path.join(self._path, name + '.npy'), array)
+        self._shared = dict((name, np.load(
+            os.path.join(self._path, name + '.npy'), mmap_mode='r+'))
+                            for name in ['ZS', 'ndz', 'nzw', 'nz'])
+        # the workers write the topic assignments and doc-topic counts,
+        # and read the topic-word counts
+        self.ZS = self._shared['ZS']
+        self.ndz_ = self._shared['ndz']
+        self.nzw_ = self._shared['nzw']
+        self.nz_ = self._shared['nz']
+        n_topics, vocab_size = self.nzw_.shape
+        alpha = np.repeat(self.alpha, n_topics).astype(np.float64)
+        eta = np.repeat(self.eta, vocab_size).astype(np.float64)
+        self._sweep = 0
+        self._last_changes = None
+        self._pool = multiprocessing.Pool(
+            len(self._partitions), _init_sampling_worker,
+            (self._path, alpha, eta, self.random_state))
+
+    def _sample_sweep(self, rands):
+        """ Samples all topic assignments once, one partition per worker,
+            and merges the topic-word counts.
+        """
+        changes = self._pool.map(_sample_partition,
+                                 [(partition, start, end, self._sweep,
+                                   self._last_changes)
+                                  for partition, (start, end)
+                                  in enumerate(self._partitions)])
+        self._sweep += 1
+        self._last_changes = tuple(np.concatenate(arrays)
+                                   for arrays in zip(*changes))
+        # nzw_ and nz_ are the shared counts, copied by workers that missed
+        # a sweep; the others apply the same changes to their own copy
+        apply_topic_changes(self.nzw_, self.nz_, *self._last_changes)
+
+    def _stop_workers(self):
+        """ Stops the workers and removes the shared files.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        self._last_changes = None
+        if self._shared is not None:
+            self.ndz_ = np.array(self.ndz_)
+            self.nzw_ = np.array(self.nzw_)
+            self.nz_ = np.array(self.nz_)
+            if hasattr(self, 'ZS'):
+                self.ZS = np.array(self.ZS)
+            self._shared = None
+        if self._path is not None:
+            shutil.rmtree(self._path, ignore_errors=True)
+            self._path = None
+
+
 class TopicModeler(object):
     """ Class for creating the topic models from the articles corpus.
     """
-    def __init__(self, n_topics, n_iter=100, random_state=0, refresh=20):
+    def __init__(self, n_topics, n_iter=100, random_state=0, refresh=20,
+                 tol=None, patience=1, backend=None, n_jobs=1):
         """ Constructor
 
             Args:
@@ -90,32 +584,62 @@ class TopicModeler(object):
                 n_iter = int, number of iterations for LDA stopping condition
                 random_state = int, random seed for replicating results
                 refresh = int,
+                tol = float, stop before n_iter once the log likelihood
+                        (checked every refresh iterations) changes by less
+                        than tol relative, None to always run n_iter
+                        (online backend: see online_lda.OnlineLDA)
+                patience = int, number of converged checks in a row
+                        needed to stop
+                backend = str, 'gibbs' (guidedlda) or 'online' (online_lda,
+                        n_iter is then the number of passes over the
+                        corpus), default configs.TOPIC_MODEL_BACKEND
+                n_jobs = int, number of cores to sample on with the gibbs
+                        backend (see ParallelLDA), -1 uses all cores
         """
+        if backend is None:
+            backend = configs.TOPIC_MODEL_BACKEND
         self.n_topics = n_topics
         self.n_iter = n_iter
         self.random_state = random_state
         self.refresh = refresh
+        self.tol = tol
+        self.patience = patience
+        self.backend = backend
+        self.n_jobs = n_jobs
         self.model = None
-        if np.array([n_topics, n_iter, random_state, refresh]).dtype != int:
+        if backend not in ('gibbs', 'online'):
+            raise ValueError(
+                "Unknown topic model backend '{}'.".format(backend))
+        if np.array([n_topics, n_iter, random_state, refresh,
+                     patience]).dtype != int:
             raise ValueError(
                 'Inputs to TopicModeler must be non-negative integers!')
-        if any(i < 0 for i in [n_topics, n_iter, random_state, refresh]):
+        if any(i < 0 for i in [n_topics, n_iter, random_state, refresh,
+                               patience]):
             raise ValueError(
                 'Inputs to TopicModeler must be non-negative integers!')
+        if tol is not None and tol < 0:
+            raise ValueError('tol must be non-negative!')
 
-    def fit(self, dtm, seed_topics=None, seed_confidence=None):
+    def fit(self, dtm, seed_topics=None, seed_confidence=None,
+            init_topic_word=None):
         """ Fits topic model using guidedlda model.
             Args:
-                dtm = numpy array or pandas dataframe, document-term-matrix
+                dtm = numpy array, pandas dataframe or scipy sparse matrix,
+                        document-term-matrix (or, for the online backend,
+                        list of paths of .npz dtm shards)
                 guided = boolean, guided LDA or regular LDA
                 seed_topics = dict, (key: word ID, value: topic ID)
                 seed_confidence = float, confidence of seed_topics
+                init_topic_word = numpy array, warm start from the topics
+                        of a previous model, output from map_topic_word()
+                        (gibbs backend only)
                 n_topics = int, number of topics to model
                 n_iter = int, number of iterations
                 random_state = int,
                 refresh = int,
             Returns:
-                model = guidedlda object, fitted topic model
+                model = guidedlda or OnlineLDA object, fitted topic model
         """
         # check if guided
         if (bool(seed_topics) is False) and (bool(seed_confidence) is False):
@@ -125,10 +649,19 @@ class TopicModeler(object):
         # convert dtm to numpy array if input is in pandas
         if isinstance(dtm, pd.DataFrame):
             dtm = np.array(dtm)
-        if not isinstance(dtm, np.ndarray):
+        # sparse matrices are passed to guidedlda as is
+        if sparse.issparse(dtm):
+            dtm = dtm.tocsr()
+        elif self.backend == 'online' and isinstance(dtm, list) and \
+                all(isinstance(path, str) for path in dtm):
+            pass
+        elif not isinstance(dtm, np.ndarray):
             raise ValueError(
                 'Please input a valid pandas dataframe or numpy array for dtm!'
                 )
+        if init_topic_word is not None and self.backend != 'gibbs':
+            raise ValueError(
+                'Warm start is only supported by the gibbs backend.')
         # fit LDA model
         if guided:
             if not isinstance(seed_topics, dict):
@@ -139,74 +672,240 @@ class TopicModeler(object):
                 raise ValueError(
                     "n_topics must be greater than number of seed topics!")
             print("Guided LDA")
-            model = guidedlda.GuidedLDA(
-                n_topics=self.n_topics,
-                n_iter=self.n_iter,
-                random_state=self.random_state,
-                refresh=self.refresh)
-            model._fit(dtm, seed_topics, seed_confidence)
+            if self.backend == 'online':
+                model = self._get_online_model()
+                model.fit(dtm, seed_topics, seed_confidence)
+            else:
+                model = self._get_gibbs_model(init_topic_word)
+                model._fit(dtm, seed_topics, seed_confidence)
         elif not guided:
             print("Regular LDA")
-            model = guidedlda.GuidedLDA(
-                n_topics=self.n_topics,
-                n_iter=self.n_iter,
-                random_state=self.random_state,
-                refresh=self.refresh)
+            if self.backend == 'online':
+                model = self._get_online_model()
+            else:
+                model = self._get_gibbs_model(init_topic_word)
             model.fit(dtm)
+        if model.n_iter_ < self.n_iter:
+            print("converged after {} iterations".format(model.n_iter_))
         self.model = model
         return model
 
+    def _get_gibbs_model(self, init_topic_word=None):
+        """ Creates the guidedlda model for the gibbs backend.
+        """
+        if self.n_jobs == 1:
+            return EarlyStoppingLDA(
+                n_topics=self.n_topics,
+                n_iter=self.n_iter,
+                random_state=self.random_state,
+                refresh=self.refresh,
+                tol=self.tol,
+                patience=self.patience,
+                init_topic_word=init_topic_word)
+        return ParallelLDA(
+            n_topics=self.n_topics,
+            n_iter=self.n_iter,
+            random_state=self.random_state,
+            refresh=self.refresh,
+            tol=self.tol,
+            patience=self.patience,
+            n_jobs=self.n_jobs,
+            init_topic_word=init_topic_word)
+
+    def _get_online_model(self):
+        """ Creates the OnlineLDA model for the online backend.
+        """
+        return online_lda.OnlineLDA(
+            n_topics=self.n_topics,
+            n_iter=self.n_iter,
+            random_state=self.random_state,
+            tol=self.tol,
+            patience=self.patience)
+
+
+def share_dtm(dtm, path):
+    """ Saves a document-term-matrix as .npy files, so that other processes
+        can memory-map it instead of receiving a pickled copy.
+        Args:
+            dtm = numpy array or scipy sparse matrix, document-term-matrix
+            path = str, directory to save the .npy files in
+        Returns:
+            path = str, input to load_shared_dtm()
+    """
+    if sparse.issparse(dtm):
+        dtm = dtm.tocsr()
+        for name in ['data', 'indices', 'indptr']:
+            np.save(os.path.join(path, name + '.npy'), getattr(dtm, name))
+        np.save(os.path.join(path, 'shape.npy'), np.array(dtm.shape))
+    else:
+        np.save(os.path.join(path, 'dtm.npy'), np.asarray(dtm))
+    return path
+
+
+def load_shared_dtm(path):
+    """ Memory-maps a document-term-matrix saved by share_dtm().
+        Args:
+            path = str, directory of the .npy files
+        Returns:
+            dtm = numpy memmap or scipy sparse matrix over memmaps
+    """
+    if os.path.isfile(os.path.join(path, 'dtm.npy')):
+        return np.load(os.path.join(path, 'dtm.npy'), mmap_mode='r')
+    arrays = [np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+              for name in ['data', 'indices', 'indptr']]
+    shape = tuple(np.load(os.path.join(path, 'shape.npy')))
+    return sparse.csr_matrix(tuple(arrays), shape=shape, copy=False)
+
+
+def _init_gridsearch_worker(path):
+    """ Pool initializer, maps the shared dtm once per worker process.
+    """
+    global _GRIDSEARCH_DTM
+    _GRIDSEARCH_DTM = load_shared_dtm(path)
+
+
+def _fit_candidate(args):
+    """ Fits one grid search candidate on the shared dtm.
+        Args:
+            args = tuple, (n_topics, n_iter, random_state, refresh,
+                    tol, patience, backend, return_model)
+        Returns:
+            n_topics = int, number of topics of the candidate
+            loglikelihoods = list, loglikelihoods_ of the fitted model
+            model = guidedlda or OnlineLDA object, or None if return_model
+                    is False
+    """
+    (n_topics, n_iter, random_state, refresh, tol, patience, backend,
+     return_model) = args
+    model = TopicModeler(
+        n_topics=n_topics,
+        n_iter=n_iter,
+        random_state=random_state,
+        refresh=refresh,
+        tol=tol,
+        patience=patience,
+        backend=backend).fit(_GRIDSEARCH_DTM)
+    return n_topics, model.loglikelihoods_, model if return_model else None
+
 
 class TopicModelerGridSearch():
     """ Class for creating the topic models from the articles corpus.
     """
-    def __init__(self, n_topics_list, n_iter, random_state, refresh):
+    def __init__(self, n_topics_list, n_iter, random_state, refresh,
+                 n_jobs=1, screen_iter=None, prune_tol=PRUNE_TOL,
+                 tol=None, patience=1, backend=None):
         """ Constructor
             Args:
                 n_topics = list of ints, list of topic numbers for grid search
                 n_iter = int, number of iterations for LDA stopping condition
                 random_state = int, random seed for replicating results
                 refresh = int,
+                n_jobs = int, number of candidates fitted in parallel
+                        (-1 uses all cores)
+                screen_iter = int, if given, every candidate is first fitted
+                        for screen_iter iterations, and only those within
+                        prune_tol of the best are fitted for n_iter
+                prune_tol = float, relative log likelihood gap to the best
+                        candidate after screening at which a candidate is
+                        dropped
+                tol = float, early stopping tolerance (see TopicModeler)
+                patience = int, early stopping patience (see TopicModeler)
+                backend = str, topic model backend (see TopicModeler); the
+                        online backend is scored by its variational bound
+                        (see online_lda.OnlineLDA.fit), in n_iter passes
         """
         self.n_topics_list = n_topics_list
         self.n_iter = n_iter
         self.random_state = random_state
         self.refresh = refresh
+        self.n_jobs = n_jobs
+        self.screen_iter = screen_iter
+        self.prune_tol = prune_tol
+        self.tol = tol
+        self.patience = patience
+        self.backend = backend
         self.model = None
         self.loglikelihoods = None
         self.n_topics_opt = None
+        self.pruned = None
         if not isinstance(n_topics_list, list):
             raise ValueError('You must enter a valid list of n_topics.')
 
-    def gridsearch(self, dtm):
+    def gridsearch(self, dtm, callback=None):
         """ Does grid search over list of n_topics values and returns
             the best model.The best model is the model with lowest
             abs(-loglikelihood).
 
             Args:
-                dtm = np.array or pd.DataFrame, document-term-matrix
+                dtm = np.array, pd.DataFrame or scipy sparse matrix,
+                        document-term-matrix
+                callback = function, called as callback(n_topics,
+                        loglikelihoods) as each candidate finishes
+
+            loglikelihoods are in n_topics_list order, without the
+            candidates listed in pruned.
         """
+        global _GRIDSEARCH_DTM
         # convert dtm to numpy array if input is in pandas
         if isinstance(dtm, pd.DataFrame):
             dtm = np.array(dtm)
-        # perform grid search
-        ll_values = []
-        for i, n_topics in enumerate(self.n_topics_list):
-            print('fitting model with n_topics = {}...'.format(n_topics))
-            model = TopicModeler(
-                n_topics=n_topics,
-                n_iter=self.n_iter,
-                random_state=self.random_state,
-                refresh=self.refresh)
-            model = model.fit(dtm)
-            if i == 0:
-                best_model = model
-                self.n_topics_opt = n_topics
-                ll_values.append(best_model.loglikelihoods_[-1])
+        n_jobs = self.n_jobs
+        if n_jobs is None or n_jobs < 0:
+            n_jobs = multiprocessing.cpu_count()
+        n_jobs = min(n_jobs, len(self.n_topics_list))
+        with tempfile.TemporaryDirectory() as path:
+            if n_jobs > 1:
+                share_dtm(dtm, path)
+                pool = multiprocessing.Pool(
+                    n_jobs, _init_gridsearch_worker, (path,))
+                fit_candidates = pool.imap_unordered
             else:
-                if model.loglikelihoods_[-1] < best_model.loglikelihoods_[-1]:
-                    best_model = model
-                    self.n_topics_opt = int(n_topics)
-                ll_values.append(model.loglikelihoods_[-1])
-        self.model = best_model
+                _GRIDSEARCH_DTM = dtm
+                pool = None
+                fit_candidates = map
+            try:
+                candidates = list(self.n_topics_list)
+                # drop clearly losing candidates after a short run
+                self.pruned = []
+                if self.screen_iter is not None:
+                    screen_ll = {}
+                    for n_topics, loglikelihoods, _ in fit_candidates(
+                            _fit_candidate,
+                            [(n_topics, self.screen_iter, self.random_state,
+                              self.refresh, self.tol, self.patience,
+                              self.backend, False)
+                             for n_topics in candidates]):
+                        print('screened n_topics = {}: {}'.format(
+                            n_topics, loglikelihoods[-1]))
+                        screen_ll[n_topics] = loglikelihoods[-1]
+                    best_ll = max(screen_ll.values())
+                    self.pruned = [
+                        n_topics for n_topics in candidates
+                        if best_ll - screen_ll[n_topics] >
+                        self.prune_tol * abs(best_ll)]
+                    candidates = [n_topics for n_topics in candidates
+                                  if n_topics not in self.pruned]
+                # perform grid search
+                results = {}
+                for n_topics, loglikelihoods, model in fit_candidates(
+                        _fit_candidate,
+                        [(n_topics, self.n_iter, self.random_state,
+                          self.refresh, self.tol, self.patience,
+                          self.backend, True)
+                         for n_topics in candidates]):
+                    print('fitted model with n_topics = {}: {}'.format(
+                        n_topics, loglikelihoods[-1]))
+                    if callback is not None:
+                        callback(n_topics, loglikelihoods)
+                    results[n_topics] = model
+            finally:
+                _GRIDSEARCH_DTM = None
+                if pool is not None:
+                    pool.close()
+                    pool.join()
+        ll_values = [results[n_topics].loglikelihoods_[-1]
+                     for n_topics in candidates]
+        best = int(np.argmax(ll_values))
+        self.model = results[candidates[best]]
+        self.n_topics_opt = int(candidates[best])
         self.loglikelihoods = ll_values
@@ -6,24 +6,55 @@ This module uses dash and the handler script to create and update the UI.
 
 The main components handled are the text box for input, the submit button, the
 recommended articles box, the word cloud, the article sentiment display and
-the top topics. Each has their own call to the handler class to retrieve
-the data.
+the top topics. A submit starts one background analysis of the article with
+the handler class and returns right away, with the job id kept in a hidden
+div. A single callback polls the analysis and renders each component as
+soon as its part is ready (sentiment and top topics first, recommended
+articles and the word cloud later), once, and stops polling when all of
+them have rendered. Resubmitting cancels the previous analysis.
+
+The handler loads its models in the background, starting when the module is
+imported, so the server accepts connections right away. /ready reports when
+the models are loaded.
 
 """
+import json
+import os
 
 import dash
 from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 import dash_core_components as dcc
 import dash_html_components as html
 
 import pandas as pd
 import numpy as np
+import configs
 import handler
+import word_cloud_generator
+
+# Milliseconds between checks for finished parts of an analysis
+JOB_POLL_INTERVAL = 500
+# Runs the server with the debugger and the reloader
+DEBUG = True
 
 app = dash.Dash()
+# Cheap to create, resources are loaded on first use or by warmup()
 my_handler = handler.Handler()
 
 
+@app.server.route('/ready')
+def ready():
+    """ Readiness check for deploys: 200 once the handler has loaded
+    everything the analyses need, 503 before, with the status of each of
+    those resources.
+    """
+    resources = handler.ANALYSIS_RESOURCES
+    status_code = 200 if my_handler.is_ready(resources) else 503
+    return (json.dumps(my_handler.status(resources)), status_code,
+            {'Content-Type': 'application/json'})
+
+
 # Reusable
 def make_dash_table(data_frame):
     ''' Return a dash definition of an HTML table for a Pandas dataframe '''
@@ -44,6 +75,13 @@ app.layout = html.Div([
                  style={'width': '100%'},
                  id='input-1-state'),
     html.Button(id='submit-button', n_clicks=0, children='Submit'),
+    # job id of the analysis of the submitted article, run by the handler
+    html.Div(id='query-id', style={'display': 'none'}),
+    # polls the analysis until it has finished
+    dcc.Interval(id='job-poll', interval=JOB_POLL_INTERVAL, n_intervals=0,
+                 disabled=True),
+    # job id and stages of the analysis rendered so far
+    dcc.Store(id='rendered-stages'),
     html.Div([
         html.Div([
             html.H6(["Recommended Articles"],
@@ -69,17 +107,27 @@ app.layout = html.Div([
 ])  # , className="page")
 
 
-# Recommended Articles Data
-@app.callback(Output('recommended_articles', 'children'),
+# Submitted article
+@app.callback(Output('query-id', 'children'),
               [Input('submit-button', 'n_clicks')],
-              [State('input-1-state', 'value')])
-def update_recommended_articles(n_clicks, query_article):
-    """ Updates recommended articles.
+              [State('input-1-state', 'value'),
+               State('query-id', 'children')])
+def submit_query(n_clicks, query_article, previous_job_id):
+    """ Starts analyzing the query article in the background, cancelling the
+    previous submit's analysis, and returns the job id.
     inputs:
         n_clicks: button clicks, used for trigger in dash
         query_article: string, article or words being queried
+        previous_job_id: string, job id of the previous submit
+    """
+    return my_handler.submit_analysis(query_article, previous_job_id)
+
+
+def render_recommended_articles(recommended_articles):
+    """ Renders the recommended articles component.
+    inputs:
+        recommended_articles: dataframe, see Handler.get_recommended_articles
     """
-    recommended_articles = my_handler.get_recommended_articles(query_article)
     return [
         html.H5(["Recommended Articles"],
                 className="gs-header gs-table-header padded"),
@@ -87,19 +135,13 @@ def update_recommended_articles(n_clicks, query_article):
         ]
 
 
-# Article Sentiment Data
-@app.callback(Output('article_sentiment', 'children'),
-              [Input('submit-button', 'n_clicks')],
-              [State('input-1-state', 'value')])
-def update_sentiment_information(n_clicks, query_article):
-    """ Updates sentiment component with positive, neutral and negative
+def render_sentiment_information(sentiments):
+    """ Renders the sentiment component with positive, neutral and negative
     sentence counts.
 
     inputs:
-        n_clicks: button clicks, used for trigger in dash
-        query_article: string, article or words being queried
+        sentiments: dictionary, see Handler.get_sentiment
     """
-    sentiments = my_handler.get_sentiment(query_article)
     pos_sent_ct = sentiments['Positive_Sentences']
     neu_sent_ct = sentiments['Neutral_Sentences']
     neg_sent_ct = sentiments['Negative_Sentences']
@@ -119,42 +161,106 @@ def update_sentiment_information(n_clicks, query_article):
         ]
 
 
-# Top Topics
-@app.callback(Output('top_topics', 'children'),
-              [Input('submit-button', 'n_clicks')],
-              [State('input-1-state', 'value')])
-def update_top_topics(n_clicks, query_article):
-    """ Updates top topics from query article.
+def render_top_topics(topics):
+    """ Renders the top topics component.
     inputs:
-        n_clicks: button clicks, used for trigger in dash
-        query_article: string, article or words being queried
+        topics: tuple, see Handler.get_topics
     """
-    top_topics = pd.DataFrame(my_handler.get_topics(query_article)[0])
     return [
         html.H5(["Top Topics"],
                 className="gs-header gs-table-header padded"),
-        html.Table(make_dash_table(top_topics))
+        html.Table(make_dash_table(pd.DataFrame(topics[0])))
         ]
 
 
-# Word Cloud Image
-@app.callback(Output('wc_image', 'children'),
-              [Input('submit-button', 'n_clicks')],
-              [State('input-1-state', 'value')])
-def update_word_cloud_image(n_clicks, query_article):
-    """ Updates word cloud image.
+def render_word_cloud_image(word_cloud_image):
+    """ Renders the word cloud image.
     inputs:
-        n_clicks: button clicks, used for trigger in dash
-        query_article: string, article or words being queried
+        word_cloud_image: bytes, base64 encoded image, see
+                          Handler.get_word_cloud
     """
-    word_cloud_image = my_handler.get_word_cloud(query_article)
+    mime_type = word_cloud_generator.MIME_TYPES[configs.WORDCLOUD_MODE]
     return [
-        html.Img(src='data:image/png;base64,' +
+        html.Img(src='data:{};base64,'.format(mime_type) +
                  '{}'.format(word_cloud_image.decode()),
                  width='100%')
         ]
 
 
+# Components, in the order of the outputs of update_panels: component id,
+# stage of the analysis, render function and title (shown if it fails)
+PANELS = [('recommended_articles', 'recommended_articles',
+           render_recommended_articles, "Recommended Articles"),
+          ('article_sentiment', 'sentiment',
+           render_sentiment_information, "Article Sentiment"),
+          ('top_topics', 'topics', render_top_topics, "Top Topics"),
+          ('wc_image', 'wordcloud', render_word_cloud_image, "Word Cloud")]
+
+
+def render_job(job, rendered_stages):
+    """ Renders the parts of an analysis that have finished since the last
+    poll. A part that failed is rendered as a short message.
+    inputs:
+        job: AnalysisJob, see Handler.get_job
+        rendered_stages: list of the stages already rendered
+    returns:
+        children: list, of each component of PANELS, dash.no_update if it
+                  is not ready or already rendered
+        rendered_stages: list, updated
+    """
+    rendered_stages = list(rendered_stages)
+    children = []
+    for _, stage, render, title in PANELS:
+        if stage in rendered_stages or not job.is_done(stage):
+            children.append(dash.no_update)
+            continue
+        try:
+            children.append(render(job.result(stage)))
+        except Exception:  # pylint: disable=broad-except
+            children.append([
+                html.H5([title],
+                        className="gs-header gs-table-header padded"),
+                html.P(["Could not be computed, please submit again."])
+                ])
+        rendered_stages.append(stage)
+    return children, rendered_stages
+
+
+@app.callback([Output(panel_id, 'children') for panel_id, _, _, _ in PANELS] +
+              [Output('job-poll', 'disabled'),
+               Output('rendered-stages', 'data')],
+              [Input('query-id', 'children'),
+               Input('job-poll', 'n_intervals')],
+              [State('rendered-stages', 'data')])
+def update_panels(job_id, n_intervals, rendered):
+    """ Polls the submitted article's analysis and renders each component
+    once its part is ready. Polling stops once every component has been
+    rendered, or once the job has been cancelled (e.g. by a resubmit, for
+    polls still carrying the previous job id). A finished job no longer
+    known (forgotten by the handler) is started again from the submitted
+    article.
+    inputs:
+        job_id: string, job id of the submitted article's analysis
+        n_intervals: polls so far, used for trigger in dash
+        rendered: dictionary, job id and stages already rendered
+    """
+    if job_id is None:
+        raise PreventUpdate()
+    rendered_stages = []
+    if rendered and rendered.get('job_id') == job_id:
+        rendered_stages = rendered['stages']
+    # a cancelled job is not started again (see Handler.resume_analysis)
+    job = None if my_handler.is_cancelled(job_id) else \
+        my_handler.resume_analysis(job_id)
+    if job is None or job.cancelled:
+        # cancelled, or not known to this server process: stop polling
+        return [dash.no_update] * len(PANELS) + [True, dash.no_update]
+    children, rendered_stages = render_job(job, rendered_stages)
+    disabled = len(rendered_stages) == len(PANELS)
+    return children + [disabled, {'job_id': job_id,
+                                  'stages': rendered_stages}]
+
+
 # Configuration and stye dependencies:
 external_css = ["https://cdnjs.cloudflare.com/ajax/libs/normalize/7.0.0/" +
                 "normalize.min.css",
@@ -178,5 +284,14 @@ for js in external_js:
     app.scripts.append_script({"external_url": js})
 
 
+# Loads the models in the background as soon as the app is imported (run
+# directly or by a WSGI server), except in the debug reloader's parent
+# process: it only watches the files, and runs the app again in a child
+# process (with WERKZEUG_RUN_MAIN set) that serves the requests
+if not (__name__ == '__main__' and DEBUG and
+        os.environ.get('WERKZEUG_RUN_MAIN') != 'true'):
+    my_handler.warmup(resources=handler.ANALYSIS_RESOURCES)
+
+
 if __name__ == '__main__':
-    app.run_server(debug=True)
+    app.run_server(debug=DEBUG)
@@ -3,36 +3,241 @@ word_cloud_generator
 
 This module has 1 function:
     generate_wordcloud (see more details below)
+
+Images are rendered in memory from preconfigured WordCloud templates,
+copied for each call, so concurrent calls are safe and nothing is written
+to disk. Images can be rendered as a full size png, a low resolution png
+preview (faster) or an svg (much smaller), and kept in an ImageCache so
+identical inputs are only rendered once.
+
+Example:
+    image = generate_wordcloud(article)
+    image = generate_wordcloud(frequencies={'rocket': 5, 'space': 2},
+                               mode='svg')
+    cache = ImageCache(path='wordcloud_cache')
+    image = generate_wordcloud(article, mode='preview', cache=cache)
 """
 import base64
+import copy
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from random import Random
 import matplotlib as mpl
 mpl.use('TkAgg')
 # pylint: disable=wrong-import-position
 from wordcloud import WordCloud, STOPWORDS # noqa
 STOP_WORDS = set(STOPWORDS)
+RANDOM_STATE = 1
+WORDCLOUD_SETTINGS = dict(
+    background_color='white',
+    stopwords=STOP_WORDS,
+    max_words=200,
+    max_font_size=40,
+    scale=3,
+    random_state=RANDOM_STATE
+)
+# Settings shared by every word cloud of a mode, copied for each image
+WORDCLOUD_TEMPLATE = WordCloud(**WORDCLOUD_SETTINGS)
+PREVIEW_TEMPLATE = WordCloud(**dict(WORDCLOUD_SETTINGS, scale=1,
+                                    max_words=100))
+TEMPLATES = {'png': WORDCLOUD_TEMPLATE,
+             'preview': PREVIEW_TEMPLATE,
+             'svg': WORDCLOUD_TEMPLATE}
+MIME_TYPES = {'png': 'image/png',
+              'preview': 'image/png',
+              'svg': 'image/svg+xml'}
+# ImageCache defaults
+CACHE_BYTES = 64 * 1024 ** 2
+DISK_CACHE_BYTES = 512 * 1024 ** 2
+
+
+class ImageCache():
+    """
+    Cache of rendered word clouds keyed by a hash of their input, in memory
+    (least recently used images evicted past max_bytes) with an optional
+    on-disk tier, which several processes can share.
+    """
+    def __init__(self, max_bytes=CACHE_BYTES, path=None,
+                 max_disk_bytes=DISK_CACHE_BYTES):
+        """
+        Args:
+            max_bytes (int): size of the images kept in memory
+            path (string): directory of the on-disk tier, None for memory
+                only
+            max_disk_bytes (int): size of the images kept on disk, least
+                recently used evicted first
+        """
+        self.max_bytes = max_bytes
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+        self._images = OrderedDict()
+        self._n_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def make_key(mode, input_string=None, frequencies=None):
+        """
+        Hashes the mode and input of a word cloud.
+        """
+        if frequencies is not None:
+            content = 'frequencies:' + json.dumps(
+                sorted(frequencies.items()))
+        else:
+            content = 'text:' + str(input_string)
+        return hashlib.sha1((mode + '\n' + content).encode('utf8')).hexdigest()
+
+    def get(self, key):
+        """
+        Returns a cached image, or None.
+        """
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return image
+        image = self._read(key)
+        with self._lock:
+            if image is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._put_memory(key, image)
+        return image
+
+    def put(self, key, image):
+        """
+        Caches an image (base64 encoded bytes).
+        """
+        self._put_memory(key, image)
+        if self.path is not None:
+            self._write(key, image)
+
+    def stats(self):
+        """
+        Reports the cache counters.
+
+        Returns:
+            Dictionary: hits, disk_hits, misses, and images and bytes kept
+                in memory
+        """
+        with self._lock:
+            return {'hits': self.hits, 'disk_hits': self.disk_hits,
+                    'misses': self.misses, 'images': len(self._images),
+                    'bytes': self._n_bytes}
+
+    def _put_memory(self, key, image):
+        """
+        Adds an image to the memory tier, evicting the least recently used.
+        """
+        with self._lock:
+            if key in self._images:
+                self._n_bytes -= len(self._images.pop(key))
+            self._images[key] = image
+            self._n_bytes += len(image)
+            while self._n_bytes > self.max_bytes and self._images:
+                _, evicted = self._images.popitem(last=False)
+                self._n_bytes -= len(evicted)
+
+    def _read(self, key):
+        """
+        Reads an image from the disk tier, marking it recently used.
+        """
+        if self.path is None:
+            return None
+        fpath = os.path.join(self.path, key)
+        try:
+            with open(fpath, "rb") as file_handle:
+                image = file_handle.read()
+            os.utime(fpath)
+        except OSError:
+            # missing, or evicted by another process
+            return None
+        return image
+
+    def _write(self, key, image):
+        """
+        Writes an image to the disk tier, then evicts the least recently
+        used images past max_disk_bytes.
+        """
+        fpath = os.path.join(self.path, key)
+        # unique temporary name, so processes never read a partial image
+        tmp_path = '{}.{}.{}.tmp'.format(fpath, os.getpid(),
+                                         threading.get_ident())
+        with open(tmp_path, "wb") as file_handle:
+            file_handle.write(image)
+        os.replace(tmp_path, fpath)
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith('.tmp'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.path, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        n_bytes = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if n_bytes <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                pass
+            n_bytes -= size
 
 
-def generate_wordcloud(input_string):
+def generate_wordcloud(input_string=None, frequencies=None, mode='png',
+                       cache=None):
     """
-    A function that generates a Word Cloud based on the input string.
+    A function that generates a Word Cloud based on the input string, or on
+    word counts already computed (e.g. from the preprocessor's
+    document-term-matrix, see text_processing.get_term_frequencies).
 
     Args:
             input_string (string): string representing the query article.
+            frequencies (dict): word to count, used instead of
+                tokenizing input_string if given.
+            mode (string): 'png', 'preview' (low resolution png, fewer
+                words) or 'svg', see MIME_TYPES.
+            cache (ImageCache): cache to reuse images from, or None.
 
     Returns:
-            image: representing the word cloud image
+            image: representing the word cloud image (base64 encoded)
 
     """
-    wordcloud = WordCloud(
-        background_color='white',
-        stopwords=STOP_WORDS,
-        max_words=200,
-        max_font_size=40,
-        scale=3,
-        random_state=1
-    ).generate(str(input_string))
-    wordcloud.to_file("temp_wordcloud.png")
-    wordcloud_png = open("temp_wordcloud.png", 'rb').read()
-    encoded_image = base64.b64encode(wordcloud_png)
+    if mode not in TEMPLATES:
+        raise ValueError('Unknown word cloud mode {}, expected one of '
+                         '{}.'.format(mode, sorted(TEMPLATES)))
+    if cache is not None:
+        key = ImageCache.make_key(mode, input_string, frequencies)
+        encoded_image = cache.get(key)
+        if encoded_image is not None:
+            return encoded_image
+    # shallow copy, the template itself is never fitted. The random
+    # generator is not shared, so every image has the same layout
+    wordcloud = copy.copy(TEMPLATES[mode])
+    wordcloud.random_state = Random(RANDOM_STATE)
+    if frequencies is not None:
+        wordcloud.generate_from_frequencies(frequencies)
+    else:
+        wordcloud.generate(str(input_string))
+    if mode == 'svg':
+        encoded_image = base64.b64encode(wordcloud.to_svg().encode('utf8'))
+    else:
+        buffer = io.BytesIO()
+        wordcloud.to_image().save(buffer, format='png')
+        encoded_image = base64.b64encode(buffer.getvalue())
+    if cache is not None:
+        cache.put(key, encoded_image)
 
     return encoded_image
@@ -0,0 +1,387 @@
+"""
+Script for benchmarking the performance-sensitive parts of the analyzer.
+
+Usage:
+    python benchmarks.py recommender [--n_articles N --n_topics K]
+    python benchmarks.py text
+    python benchmarks.py startup
+    python benchmarks.py analyze
+    python benchmarks.py wordcloud
+    python benchmarks.py sentiment
+
+recommender: recall@k and per-query latency of the approximate (IVF)
+    recommender index against the exact KDTree search. Uses the pickled
+    recommender index's doc-topic matrix if it exists, otherwise (or with
+    --synthetic) random doc-topic vectors of the given size.
+text: per-article throughput of the TokenPipeline (nltk and regex
+    tokenizers) against the original uncached cleaning functions, on the
+    example articles.
+startup: time and resident memory to load the Handler's models and
+    recommender index from the pickles against the memory-mapped artifacts
+    (saved from the pickles first if there are none), each in a fresh
+    process, plus the time of a first query and its recommendations.
+analyze: end-to-end latency of Handler.analyze() on the example articles,
+    with the analyses run one after the other against concurrently in the
+    worker processes (configs.ANALYSIS_WORKERS), without the analysis cache.
+wordcloud: time and size of each word cloud mode on the example articles,
+    rendered, then reused from the memory and the on-disk ImageCache tiers.
+sentiment: per-article throughput of the original get_sentiment, which
+    reloaded the VADER lexicon for every article, against the
+    SentimentEngine one article at a time and in batches on all cores.
+"""
+import os
+import sys
+import glob
+import json
+import string
+import argparse
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+from nltk import tokenize, word_tokenize
+from nltk.corpus import stopwords
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+from nltk.stem import WordNetLemmatizer
+
+sys.path.append("../libraries")
+sys.path.append("news_analyzer/libraries")
+import configs # noqa
+import article_recommender # noqa
+import text_processing # noqa
+import topic_modeling # noqa
+import artifacts # noqa
+import handler # noqa
+import word_cloud_generator # noqa
+import sentiment_analyzer # noqa
+
+# Module Constants
+N_QUERIES = 100
+RANDOM_STATE = 0
+N_PROBE_LIST = [1, 2, 4, 8, 16, 32]
+EXAMPLES_PATH = configs.DIR_NAME + "../examples/"
+N_REPEATS = 20
+N_STARTUP_RUNS = 3
+
+
+def time_queries(index, queries, k):
+    """ Queries the index one query at a time, as the UI does.
+
+        Returns:
+        ind: array of neighbour indexes, one row per query
+        ms_per_query: mean latency in milliseconds
+    """
+    results = []
+    s_time = time.time()
+    for query in queries:
+        results.append(index.query([query], k=k)[1][0])
+    e_time = time.time()
+    return np.array(results), 1000 * (e_time - s_time) / len(queries)
+
+
+def get_doc_topic_matrix(args):
+    """ Loads the doc-topic matrix held by the pickled KDTree, or generates
+        a synthetic one with Dirichlet distributed rows.
+    """
+    if not args.synthetic and os.path.isfile(configs.RECOMMENDER_INDEX_PATH):
+        index = article_recommender.load_index(
+            configs.RECOMMENDER_INDEX_PATH)
+        if hasattr(index, 'get_arrays'):
+            return np.asarray(index.get_arrays()[0])
+        return index.data
+    rng = np.random.RandomState(RANDOM_STATE)
+    return rng.dirichlet(np.repeat(0.1, args.n_topics), args.n_articles)
+
+
+def benchmark_recommender(args):
+    """ Prints recall@k and latency of the IVF index for a range of
+        n_probe values against the exact KDTree.
+    """
+    doc_topic_matrix = get_doc_topic_matrix(args)
+    print('doc-topic matrix: {} articles x {} topics'.format(
+        *doc_topic_matrix.shape))
+    # queries are mixtures of two corpus articles
+    rng = np.random.RandomState(RANDOM_STATE)
+    rows = rng.randint(0, len(doc_topic_matrix), size=(N_QUERIES, 2))
+    queries = doc_topic_matrix[rows].mean(axis=1)
+    k = article_recommender.NUM_ARTICLES
+
+    s_time = time.time()
+    exact_index = article_recommender.build_index(doc_topic_matrix, 'kdtree')
+    print('kdtree build: {}s'.format(round(time.time() - s_time, 3)))
+    exact_ind, exact_ms = time_queries(exact_index, queries, k)
+
+    s_time = time.time()
+    ivf_index = article_recommender.build_index(doc_topic_matrix, 'ivf')
+    print('ivf build ({} clusters): {}s'.format(
+        len(ivf_index.centroids), round(time.time() - s_time, 3)))
+
+    print('{:>8} {:>10} {:>10}'.format('n_probe', 'recall@' + str(k),
+                                       'ms/query'))
+    print('{:>8} {:>10} {:>10.3f}'.format('exact', 1.0, exact_ms))
+    for n_probe in N_PROBE_LIST:
+        if n_probe > len(ivf_index.centroids):
+            break
+        ivf_index.n_probe = n_probe
+        ivf_ind, ivf_ms = time_queries(ivf_index, queries, k)
+        recall = article_recommender.recall_at_k(ivf_ind, exact_ind)
+        print('{:>8} {:>10.3f} {:>10.3f}'.format(n_probe, recall, ivf_ms))
+
+
+def get_example_articles():
+    """ Reads the example articles shipped in the examples folder.
+    """
+    articles = []
+    for fpath in sorted(glob.glob(EXAMPLES_PATH + "example_article*.txt")):
+        with open(fpath, "rb") as file_handle:
+            articles.append(file_handle.read().decode("cp1252"))
+    return articles
+
+
+def legacy_transform_article(article):
+    """ The original text_processing.transform_article, which rebuilt the
+        stopword list, punctuation table and lemmatizer for every article.
+    """
+    tokens = word_tokenize(article)
+    tokens = [word.lower() for word in tokens]
+    table = str.maketrans('', '', string.punctuation)
+    stripped = [w.translate(table) for w in tokens]
+    words = [word for word in stripped if word.isalpha()]
+    stop_words = list(set(stopwords.words('english'))) + \
+        text_processing.EXTRA_STOPWORDS
+    tokens = [w for w in words if w not in stop_words]
+    lemmatizer = WordNetLemmatizer()
+    return " ".join([lemmatizer.lemmatize(token) for token in tokens])
+
+
+def benchmark_text(args):
+    """ Prints articles/second for each way of cleaning articles.
+    """
+    articles = get_example_articles() * N_REPEATS
+    candidates = [
+        ('legacy', legacy_transform_article),
+        ('pipeline (nltk)', text_processing.TokenPipeline().transform_article),
+        ('pipeline (regex)',
+         text_processing.TokenPipeline(tokenizer="regex").transform_article)]
+    print('{} articles'.format(len(articles)))
+    print('{:>18} {:>12} {:>10}'.format('', 'articles/s', 'speedup'))
+    base_rate = None
+    for name, transform in candidates:
+        s_time = time.time()
+        for article in articles:
+            transform(article)
+        rate = len(articles) / (time.time() - s_time)
+        if base_rate is None:
+            base_rate = rate
+        print('{:>18} {:>12.1f} {:>9.1f}x'.format(name, rate,
+                                                  rate / base_rate))
+
+
+def get_rss_mb():
+    """ Resident memory of this process in MB (Linux only).
+    """
+    with open("/proc/self/status") as file_handle:
+        for line in file_handle:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.
+    return float('nan')
+
+
+def load_models(loader):
+    """ Loads the preprocessor and topic models as the Handler does, from
+        the 'pickle' files or the memory-mapped 'artifacts'.
+    """
+    if loader == 'pickle':
+        return (handler.get_preprocessor(),
+                handler.get_guided_topic_modeler(),
+                handler.get_unguided_topic_modeler())
+    return artifacts.load_artifacts(configs.ARTIFACT_PATH)
+
+
+def load_recommender_index(loader, unguided_model):
+    """ Loads the recommender index as the Handler does, from the 'pickle'
+        file or the memory-mapped 'artifacts'.
+    """
+    if loader == 'pickle':
+        return article_recommender.load_index(
+            configs.RECOMMENDER_INDEX_PATH, unguided_model)
+    return artifacts.load_recommender_index(configs.ARTIFACT_PATH,
+                                            unguided_model)
+
+
+def measure_startup(loader):
+    """ Loads the models and the recommender index and runs one query
+        (topics and recommendations) in this process, and prints the
+        timings and memory as json.
+    """
+    base_rss = get_rss_mb()
+    s_time = time.time()
+    preprocessor, guided_model, unguided_model = load_models(loader)
+    index = load_recommender_index(loader, unguided_model)
+    load_time = time.time() - s_time
+    load_rss = get_rss_mb() - base_rss
+    s_time = time.time()
+    query_dtm = preprocessor.transform(get_example_articles()[0])
+    for model in [guided_model, unguided_model]:
+        query_vector = topic_modeling.infer_topics(model, query_dtm)
+    article_recommender.knn_prediction(index, query_vector)
+    query_time = time.time() - s_time
+    print(json.dumps({'load_s': load_time, 'load_rss_mb': load_rss,
+                      'query_s': query_time,
+                      'query_rss_mb': get_rss_mb() - base_rss}))
+
+
+def benchmark_startup(args):
+    """ Prints the mean startup time and memory of each loader, measured
+        in fresh processes.
+    """
+    try:
+        artifacts.load_recommender_index(configs.ARTIFACT_PATH)
+    except FileNotFoundError:
+        print('no artifacts (or no index) found, saving them from the '
+              'pickles...')
+        models = load_models('pickle')
+        artifacts.save_artifacts(
+            configs.ARTIFACT_PATH, *models,
+            recommender_index=load_recommender_index('pickle', models[2]))
+    print('{:>10} {:>10} {:>12} {:>10} {:>13}'.format(
+        'loader', 'load s', 'load RSS MB', 'query s', 'query RSS MB'))
+    for loader in ['pickle', 'artifacts']:
+        runs = []
+        for _ in range(N_STARTUP_RUNS):
+            output = subprocess.check_output(
+                [sys.executable, os.path.abspath(__file__), 'startup',
+                 '--loader', loader])
+            runs.append(json.loads(output.decode().strip().splitlines()[-1]))
+        means = dict((key, np.mean([run[key] for run in runs]))
+                     for key in runs[0])
+        print('{:>10} {:>10.3f} {:>12.1f} {:>10.3f} {:>13.1f}'.format(
+            loader, means['load_s'], means['load_rss_mb'], means['query_s'],
+            means['query_rss_mb']))
+
+
+def benchmark_analyze(args):
+    """ Prints the mean latency of Handler.analyze() run serially and
+        concurrently.
+    """
+    articles = get_example_articles()
+    print('{:>12} {:>10}'.format('workers', 's/query'))
+    for n_workers in [0, configs.ANALYSIS_WORKERS]:
+        query_handler = handler.Handler(n_workers=n_workers)
+        # load everything (and start the workers) before timing
+        query_handler.warmup(wait=True)
+        try:
+            s_time = time.time()
+            for article in articles:
+                query_handler.cache.clear()
+                query_handler.analyze(article)
+            latency = (time.time() - s_time) / len(articles)
+        finally:
+            query_handler.close()
+        print('{:>12} {:>10.3f}'.format(n_workers, latency))
+
+
+def benchmark_wordcloud(args):
+    """ Prints the mean time of each word cloud mode per article, when
+        rendered, and when reused from the memory and disk caches.
+    """
+    articles = get_example_articles()
+    print('{} articles'.format(len(articles)))
+    print('{:>8} {:>10} {:>10} {:>10} {:>10}'.format(
+        'mode', 'render ms', 'memory ms', 'disk ms', 'size KB'))
+    for mode in sorted(word_cloud_generator.TEMPLATES):
+        with tempfile.TemporaryDirectory() as path:
+            cache = word_cloud_generator.ImageCache(path=path)
+            timings = []
+            for _ in range(2):
+                s_time = time.time()
+                images = [word_cloud_generator.generate_wordcloud(
+                    article, mode=mode, cache=cache) for article in articles]
+                timings.append(time.time() - s_time)
+            # a new process, sharing the disk tier
+            cache = word_cloud_generator.ImageCache(path=path)
+            s_time = time.time()
+            for article in articles:
+                word_cloud_generator.generate_wordcloud(article, mode=mode,
+                                                        cache=cache)
+            timings.append(time.time() - s_time)
+        size = np.mean([len(image) for image in images]) / 1024.
+        print('{:>8} {:>10.1f} {:>10.3f} {:>10.3f} {:>10.1f}'.format(
+            mode, *[1000 * timing / len(articles) for timing in timings],
+            size))
+
+
+def legacy_get_sentiment(article):
+    """ The original sentiment_analyzer.get_sentiment, which loaded the
+        VADER lexicon for every article.
+    """
+    sid = SentimentIntensityAnalyzer()
+    counts = [0, 0, 0]
+    sentences = tokenize.sent_tokenize(article)
+    for sentence in sentences:
+        compound = sid.polarity_scores(sentence).get('compound')
+        counts[0 if compound > 0 else 1 if compound < 0 else 2] += 1
+    return counts + [len(sentences)]
+
+
+def benchmark_sentiment(args):
+    """ Prints articles/second for each way of scoring sentiment.
+    """
+    articles = get_example_articles() * N_REPEATS
+    engine = sentiment_analyzer.get_engine()
+    # loaded once per process, not counted
+    engine.analyzer  # pylint: disable=pointless-statement
+    candidates = [
+        ('legacy', lambda: [legacy_get_sentiment(article)
+                            for article in articles]),
+        ('engine', lambda: [engine.count_sentences(article)
+                            for article in articles]),
+        ('score_many (all cores)',
+         lambda: sentiment_analyzer.SentimentEngine(
+             n_jobs=-1).score_many(articles))]
+    print('{} articles'.format(len(articles)))
+    print('{:>24} {:>12} {:>10}'.format('', 'articles/s', 'speedup'))
+    base_rate = None
+    for name, score in candidates:
+        s_time = time.time()
+        score()
+        rate = len(articles) / (time.time() - s_time)
+        if base_rate is None:
+            base_rate = rate
+        print('{:>24} {:>12.1f} {:>9.1f}x'.format(name, rate,
+                                                  rate / base_rate))
+
+
+if __name__ == "__main__":
+    """ Runs the requested benchmark and prints a report.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('benchmark',
+                        choices=['recommender', 'text', 'startup',
+                                 'analyze', 'wordcloud', 'sentiment'])
+    parser.add_argument('--synthetic', dest='synthetic',
+                        action='store_true', required=False)
+    parser.add_argument('--n_articles', type=int, default=100000)
+    parser.add_argument('--n_topics', type=int, default=1000)
+    # used by the startup benchmark to measure one loader per process
+    parser.add_argument('--loader', choices=['pickle', 'artifacts'],
+                        default=None)
+    parser.set_defaults(synthetic=False)
+    args = parser.parse_args()
+
+    if args.benchmark == 'recommender':
+        benchmark_recommender(args)
+    elif args.benchmark == 'text':
+        benchmark_text(args)
+    elif args.benchmark == 'startup':
+        if args.loader is not None:
+            measure_startup(args.loader)
+        else:
+            benchmark_startup(args)
+    elif args.benchmark == 'analyze':
+        benchmark_analyze(args)
+    elif args.benchmark == 'wordcloud':
+        benchmark_wordcloud(args)
+    elif args.benchmark == 'sentiment':
+        benchmark_sentiment(args)
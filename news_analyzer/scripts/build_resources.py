@@ -4,6 +4,12 @@ Script for building resources:
 1. Downloading Kaggle data.
 2. Building preprocessor and pickling for later use.
 3. Building topic models and pickling for later use.
+4. Building the recommender index and pickling for later use.
+5. Saving the preprocessor vocabulary and topic models as memory-mapped
+   artifacts (see artifacts.py), which the Handler loads instead of the
+   pickles.
+6. Writing the columnar corpus store (see corpus_store.py), which the
+   Handler loads article titles from instead of the corpus csv.
 
 """
 import os
@@ -19,6 +25,9 @@ sys.path.append("news_analyzer/libraries")
 import configs # noqa
 import text_processing # noqa
 import topic_modeling # noqa
+import article_recommender # noqa
+import artifacts # noqa
+import corpus_store # noqa
 import nytimes_article_retriever # noqa
 
 # Module Constants
@@ -29,23 +38,50 @@ RESOURCE_PATH = "../" + configs.RESOURCE_FOLDER
 FPATHS = [RESOURCE_PATH + "/" + name for name in CSV_NAMES]
 CONTENT_COLUMN = "content"
 MIN_WORDS_IN_ARTICLE = 200
+# Number of processes for cleaning articles and sampling the unguided
+# topic model (-1 uses all cores)
+N_JOBS = -1
+# Number of articles read at a time with --stream
+STREAM_CHUNKSIZE = text_processing.STREAM_CHUNKSIZE
 # Topic Modeling Constants
 BAD_GUIDED_TOPICS = ['national', 'nyregion', 'obituaries']
 GUIDED_TOPICS_CONFIDENCE = 0.5
+# Gibbs iterations (passes over the corpus with the online backend)
 N_ITERATIONS = 100
 RANDOM_STATE = 0
 REFRESH = 20
+# Stop before N_ITERATIONS once the log likelihood changes by less than
+# CONVERGENCE_TOL (relative) on PATIENCE checks in a row
+CONVERGENCE_TOL = 0.001
+PATIENCE = 2
 
 
-def get_files():
+def get_files(stream=False):
     """ Function for downloading Kaggle files (see CSV_NAMES in module header),
         removing short articles (potential ads), and combining into one
         large table.
+
+        If stream is True, the files are filtered and appended to the
+        corpus csv one chunk at a time instead, and nothing is returned.
     """
     os.system("kaggle datasets download -d \
                 snapcrack/all-the-news --force -p '{}'".
               format(configs.RESOURCE_PATH))
 
+    if stream:
+        header = True
+        for fpath in FPATHS:
+            print(fpath)
+            for chunk in pd.read_csv(fpath, encoding='utf8',
+                                     chunksize=STREAM_CHUNKSIZE):
+                article_lengths = \
+                    chunk[CONTENT_COLUMN].apply(lambda x: len(x.split()))
+                chunk = chunk[article_lengths > MIN_WORDS_IN_ARTICLE]
+                chunk.to_csv(configs.CORPUS_PATH, index=False,
+                             header=header, mode='w' if header else 'a')
+                header = False
+        return None
+
     list_of_tables = []
     for fpath in FPATHS:
         print(fpath)
@@ -59,6 +95,35 @@ def get_files():
     return full_table
 
 
+def load_previous_models():
+    """ Function for loading the vocabulary and topic models of the previous
+        build, to warm start the new topic models from. Returns Nones (cold
+        start) if there is no previous build.
+    """
+    paths = [configs.PREPROCESSOR_PATH, configs.GUIDED_MODELER_PATH,
+             configs.UNGUIDED_MODELER_PATH]
+    missing = [fpath for fpath in paths if not os.path.isfile(fpath)]
+    if missing:
+        print('no previous models found ({}), cold starting...'.format(
+            ', '.join(missing)))
+        return None, None, None
+    models = []
+    for fpath in paths:
+        with open(fpath, "rb") as file_handle:
+            models.append(pickle.load(file_handle))
+    return models[0].get_vocab(), models[1], models[2]
+
+
+def get_init_topic_word(model, old_vocab, word2id, n_topics):
+    """ Function for mapping a previous model's topics onto the new
+        vocabulary. Returns None (no warm start) if the number of topics
+        has changed.
+    """
+    if model is None or model.n_topics != n_topics:
+        return None
+    return topic_modeling.map_topic_word(model, old_vocab, word2id)
+
+
 if __name__ == "__main__":
     """ Main script used to download Kaggle files, preprocessing data,
         and builds topic models. All resources will be saved in the resources
@@ -69,32 +134,80 @@ if __name__ == "__main__":
                         dest='download_files',
                         action='store_true',
                         required=False)
-    parser.set_defaults(download_files=False)
+    # Read the corpus in chunks and write the dtm to disk in shards,
+    # for corpora that do not fit in memory (the gibbs backends still
+    # load all shards to train, see TOPIC_MODEL_BACKEND)
+    parser.add_argument('--stream',
+                        dest='stream',
+                        action='store_true',
+                        required=False)
+    # Reuse articles cleaned by previous builds (see TokenCache)
+    parser.add_argument('--token_cache',
+                        dest='token_cache',
+                        action='store_true',
+                        required=False)
+    # Start the topic models from the previous build's topics
+    parser.add_argument('--warm_start',
+                        dest='warm_start',
+                        action='store_true',
+                        required=False)
+    parser.set_defaults(download_files=False, stream=False,
+                        token_cache=False, warm_start=False)
     args = parser.parse_args()
     download_files = args.download_files
+    stream = args.stream
+    token_cache = configs.TOKEN_CACHE_PATH if args.token_cache else None
 
     # If corpus csv does not exist download and build.
     print('checking if dataset exists...')
     if not os.path.isfile(configs.CORPUS_PATH) or download_files:
         print('dataset not found, downloading from Kaggle...')
-        full_table = get_files()
+        full_table = get_files(stream)
     else:
         print('dataset found!')
-        full_table = pd.read_csv(configs.CORPUS_PATH)
+        if not stream:
+            full_table = pd.read_csv(configs.CORPUS_PATH)
+
+    # Columnar corpus for the Handler, in the same row order as the dtm
+    print('writing corpus store...')
+    corpus_store.build_corpus_store(configs.CORPUS_PATH,
+                                    configs.CORPUS_STORE_PATH,
+                                    content_column=CONTENT_COLUMN,
+                                    chunksize=STREAM_CHUNKSIZE)
+
+    # Load previous build before it is overwritten
+    old_vocab, old_guided_model, old_unguided_model = None, None, None
+    if args.warm_start and configs.TOPIC_MODEL_BACKEND == 'gibbs':
+        print('loading previous models for warm start...')
+        old_vocab, old_guided_model, old_unguided_model = \
+            load_previous_models()
 
     # Fit preprocessor
     print('fitting preprocessor...')
     s_time = time.time()
-    processor = text_processing.ArticlePreprocessor()
-    processor.fit(full_table[CONTENT_COLUMN])
+    processor = text_processing.ArticlePreprocessor(sparse=True,
+                                                    n_jobs=N_JOBS,
+                                                    token_cache=token_cache)
+    if stream:
+        shard_paths = processor.fit_stream(configs.CORPUS_PATH,
+                                           CONTENT_COLUMN,
+                                           STREAM_CHUNKSIZE)
+        # the online backend trains on the shards one at a time; the
+        # gibbs backends need the whole dtm, so --stream only bounds the
+        # memory of preprocessing for them
+        if configs.TOPIC_MODEL_BACKEND == 'online':
+            dtm = shard_paths
+        else:
+            dtm = text_processing.load_dtm_shards(shard_paths)
+    else:
+        dtm = processor.fit_transform(full_table[CONTENT_COLUMN])
     e_time = time.time()
     dtm_time = round(e_time - s_time, 3)
     print('fitting complete in {}s! saving the document-term-matrix...'.format(
         dtm_time))
     with open(configs.PREPROCESSOR_PATH, 'wb') as file_handle:
         pickle.dump(processor, file_handle)
-    dtm = processor.transform(full_table[CONTENT_COLUMN])
-    vocab, word2id = topic_modeling.get_vocab(dtm)
+    vocab, word2id = topic_modeling.get_vocab(dtm, processor.get_vocab())
 
     # Get nyt seed topics
     print('accessing NYT API...')
@@ -113,20 +226,44 @@ if __name__ == "__main__":
     guidedlda_model = topic_modeling.TopicModeler(n_guided_topics,
                                                   N_ITERATIONS,
                                                   RANDOM_STATE,
-                                                  REFRESH)
-    guidedlda_model = guidedlda_model.fit(dtm,
-                                          seed_topics,
-                                          GUIDED_TOPICS_CONFIDENCE)
-    # Fit unguided LDA model
-    n_unguided_topics = int(len(dtm)/100)
+                                                  REFRESH,
+                                                  CONVERGENCE_TOL,
+                                                  PATIENCE)
+    guidedlda_model = guidedlda_model.fit(
+        dtm, seed_topics, GUIDED_TOPICS_CONFIDENCE,
+        get_init_topic_word(old_guided_model, old_vocab, word2id,
+                            n_guided_topics))
+    # Fit unguided LDA model (keep the topics of the previous build)
+    if old_unguided_model is not None:
+        n_unguided_topics = old_unguided_model.n_topics
+    else:
+        n_unguided_topics = int(topic_modeling.get_dtm_shape(dtm)[0]/100)
     print('fitting unguided LDA model using {} topics...'.format(
         n_unguided_topics))
     unguidedlda_model = topic_modeling.TopicModeler(n_unguided_topics,
                                                     N_ITERATIONS,
                                                     RANDOM_STATE,
-                                                    REFRESH)
-    unguidedlda_model = unguidedlda_model.fit(dtm)
+                                                    REFRESH,
+                                                    CONVERGENCE_TOL,
+                                                    PATIENCE,
+                                                    n_jobs=N_JOBS)
+    unguidedlda_model = unguidedlda_model.fit(
+        dtm, init_topic_word=get_init_topic_word(
+            old_unguided_model, old_vocab, word2id, n_unguided_topics))
     e_time = time.time()
+    for model in [guidedlda_model, unguidedlda_model]:
+        print('{} iterations in {}s'.format(
+            model.n_iter_, round(model.fit_time_, 3)))
+
+    # Build recommender index (needs doc_topic_, so before purging)
+    print('building recommender index...')
+    recommender_index = article_recommender.build_index(
+        unguidedlda_model.doc_topic_)
+    # Memory-mapped models and index for the Handler (also needs doc_topic_)
+    print('saving model artifacts...')
+    artifacts.save_artifacts(configs.ARTIFACT_PATH, processor,
+                             guidedlda_model, unguidedlda_model,
+                             recommender_index=recommender_index)
 
     # Save results
     print('model building complete. total training time: {}s'.format(
@@ -134,9 +271,12 @@ if __name__ == "__main__":
     print('saving pkl files...')
     # unguided model is large, so get rid of extra matrices
     unguidedlda_model.purge_extra_matrices()
-    with open(RESOURCE_PATH + 'guidedlda_model.pkl', 'wb') as file_handle:
+    with open(configs.GUIDED_MODELER_PATH, 'wb') as file_handle:
         pickle.dump(guidedlda_model, file_handle)
-    with open(RESOURCE_PATH + 'unguidedlda_model.pkl', 'wb') as file_handle:
+    with open(configs.UNGUIDED_MODELER_PATH, 'wb') as file_handle:
         pickle.dump(unguidedlda_model, file_handle)
-    with open(RESOURCE_PATH + "preprocessor.pkl", "wb") as file_handle:
+    with open(configs.PREPROCESSOR_PATH, "wb") as file_handle:
         pickle.dump(processor, file_handle)
+    # saved with the model's fingerprint, checked by the Handler
+    article_recommender.save_index(configs.RECOMMENDER_INDEX_PATH,
+                                   recommender_index, unguidedlda_model)
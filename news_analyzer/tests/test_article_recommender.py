@@ -10,11 +10,23 @@ Functions:
     test_knn_prediction: A function that checks KDTree
     returns nearest index based on distance
     test_join_type: A function that checks the join_process return type
+    test_knn_prebuilt_index: A function that checks a prebuilt index
+    returns the same indexes as building the KDTree per query
+
+    TestSavedIndex: A class of functions to perform unit test for the
+    index saved with the fingerprint of its model
+
+    TestIVFIndex: A class of functions to perform unit test for the
+    approximate recommender index, including a corpus smaller than the
+    number of recommended articles
 
 """
 # standard imports
+import os
 import sys
+import tempfile
 import unittest
+from types import SimpleNamespace
 import numpy as np
 import pandas as pd
 
@@ -38,6 +50,10 @@ class TestArticleRecommender(unittest.TestCase):
             np.zeros(shape=(5, 10)), [np.zeros(10)])
         self.knn_logic = article_recommender.knn_prediction(
             np.repeat(np.array([(range(10))]), 10, axis=0).T, [(np.zeros(10))])
+        self.knn_index = article_recommender.knn_prediction(
+            article_recommender.build_index(
+                np.repeat(np.array([(range(10))]), 10, axis=0).T),
+            [(np.zeros(10))])
         self.join_index = article_recommender.join_process(
             np.array([0, 1, 2]), self.corpus)
 
@@ -60,6 +76,108 @@ class TestArticleRecommender(unittest.TestCase):
         """
         self.assertTrue(isinstance(self.join_index, str))
 
+    def test_knn_prebuilt_index(self):
+        """This function checks a prebuilt index returns the same indexes
+        """
+        # Index built once with build_index should give the same neighbours
+        # as building the KDTree inside knn_prediction
+        self.assertTrue((self.knn_index[1] == self.knn_logic[1]).all())
+
+
+class TestIVFIndex(unittest.TestCase):
+    """A Class of functions to perform unittest on the IVFIndex"""
+    def setUp(self):
+        """
+        Initializer for TestIVFIndex class.
+        This function builds exact and approximate indexes on random topics.
+        """
+        rng = np.random.RandomState(0)
+        self.doc_topic_matrix = rng.dirichlet(np.repeat(0.1, 20), 500)
+        self.queries = rng.dirichlet(np.repeat(0.1, 20), 10)
+        self.exact_index = article_recommender.build_index(
+            self.doc_topic_matrix, 'kdtree')
+        self.ivf_index = article_recommender.build_index(
+            self.doc_topic_matrix, 'ivf')
+
+    def test_ivf_dimension(self):
+        """This function checks the IVF index returns 5 indexes per query
+        """
+        dist, ind = self.ivf_index.query(self.queries)
+        self.assertTrue(ind.shape == (len(self.queries), NUM_ARTICLES))
+        self.assertTrue(dist.shape == (len(self.queries), NUM_ARTICLES))
+
+    def test_ivf_exhaustive(self):
+        """This function checks probing every cluster gives the exact result
+        """
+        self.ivf_index.n_probe = len(self.ivf_index.centroids)
+        exact_ind = self.exact_index.query(self.queries, k=NUM_ARTICLES)[1]
+        ivf_ind = self.ivf_index.query(self.queries)[1]
+        self.assertTrue(
+            article_recommender.recall_at_k(ivf_ind, exact_ind) == 1.0)
+
+    def test_small_corpus(self):
+        """This function checks a corpus smaller than 5 articles returns
+        all of its articles
+        """
+        for backend in ['kdtree', 'ivf']:
+            index = article_recommender.build_index(
+                self.doc_topic_matrix[:3], backend)
+            dist, ind = article_recommender.knn_prediction(
+                index, self.queries[:1])
+            self.assertTrue(sorted(ind[0]) == [0, 1, 2])
+            self.assertTrue(dist.shape == (1, 3))
+        # the IVF index clamps k itself
+        ivf_ind = article_recommender.build_index(
+            self.doc_topic_matrix[:3], 'ivf').query(self.queries[:1])[1]
+        self.assertTrue(ivf_ind.shape == (1, 3))
+
+    def test_bad_backend(self):
+        """This function checks an unknown backend raises a ValueError
+        """
+        with self.assertRaises(ValueError):
+            article_recommender.build_index(self.doc_topic_matrix, 'annoy')
+
+
+class TestSavedIndex(unittest.TestCase):
+    """A Class of functions to perform unittest on save_index/load_index"""
+    def setUp(self):
+        """
+        Initializer for TestSavedIndex class.
+        This function saves an index for a model in a temporary directory.
+        """
+        rng = np.random.RandomState(0)
+        self.model = SimpleNamespace(
+            components_=rng.dirichlet(np.repeat(0.1, 30), 5))
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'index.pkl')
+        article_recommender.save_index(
+            self.path, article_recommender.build_index(
+                rng.dirichlet(np.repeat(0.1, 5), 20)), self.model)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_index(self):
+        """This function checks the saved index loads for its model
+        """
+        index = article_recommender.load_index(self.path, self.model)
+        self.assertTrue(index.query(np.zeros((1, 5)), k=2)[1].shape == (1, 2))
+
+    def test_other_model(self):
+        """This function checks an index of another model is rejected
+        """
+        other_model = SimpleNamespace(
+            components_=self.model.components_[::-1])
+        with self.assertRaises(ValueError):
+            article_recommender.load_index(self.path, other_model)
+
+    def test_missing_index(self):
+        """This function checks a missing index is not built on the fly
+        """
+        with self.assertRaises(FileNotFoundError):
+            article_recommender.load_index(
+                os.path.join(self.tmp_dir.name, 'missing.pkl'), self.model)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,115 @@
+"""
+This module conducts unittest on the artifacts.py module.
+"""
+# standard imports
+import json
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+
+# test import
+sys.path.append('news_analyzer/libraries')
+
+# pylint: disable=wrong-import-position
+import article_recommender # noqa
+import artifacts # noqa
+import text_processing # noqa
+import topic_modeling # noqa
+
+
+class TestArtifacts(unittest.TestCase):
+    """ Usage: artifacts.py unit-test.
+        python test_artifacts.py
+    """
+    def setUp(self):
+        self.test_dtm = pd.read_pickle(
+            'news_analyzer/tests/test_resources/test_dtm.pkl')
+        self.vocab = list(self.test_dtm.columns)
+        self.processor = text_processing.ArticlePreprocessor.from_vocabulary(
+            self.vocab, sparse=True)
+        self.guided_model = topic_modeling.TopicModeler(
+            n_topics=5, n_iter=20).fit(self.test_dtm)
+        self.unguided_model = topic_modeling.TopicModeler(
+            n_topics=10, n_iter=20).fit(self.test_dtm)
+
+    def test_save_and_load(self):
+        """ Tests the models are loaded back memory-mapped, and give the
+            same query topics.
+        """
+        with tempfile.TemporaryDirectory() as path:
+            self.assertFalse(artifacts.has_artifacts(path))
+            artifacts.save_artifacts(path, self.processor, self.guided_model,
+                                     self.unguided_model, version='1')
+            self.unguided_model.purge_extra_matrices()
+            artifacts.save_artifacts(path, self.processor, self.guided_model,
+                                     self.unguided_model, version='2')
+            self.assertTrue(artifacts.has_artifacts(path))
+            processor, guided_model, unguided_model = \
+                artifacts.load_artifacts(path)
+            self.assertTrue(processor.get_vocab() == self.vocab)
+            self.assertTrue(isinstance(guided_model.topic_word_, np.memmap))
+            self.assertTrue(guided_model.topic_word_.dtype == np.float32)
+            self.assertTrue(np.allclose(guided_model.topic_word_,
+                                        self.guided_model.topic_word_))
+            self.assertTrue(np.allclose(guided_model.doc_topic_,
+                                        self.guided_model.doc_topic_))
+            # latest version, saved after purging
+            self.assertTrue(unguided_model.doc_topic_ is None)
+            _, _, unguided_model = artifacts.load_artifacts(path, '1')
+            self.assertTrue(unguided_model.doc_topic_.shape ==
+                            (self.test_dtm.shape[0], 10))
+            # query topics
+            query_dtm = processor.transform(" ".join(self.vocab[:50]))
+            self.assertTrue(np.allclose(
+                guided_model.transform(query_dtm),
+                self.guided_model.transform(query_dtm.toarray()),
+                atol=1e-4))
+            # older formats are rejected
+            manifest_path = os.path.join(path, '1', artifacts.MANIFEST_FILE)
+            with open(manifest_path) as file_handle:
+                manifest = json.load(file_handle)
+            manifest['format_version'] = 0
+            with open(manifest_path, "w") as file_handle:
+                json.dump(manifest, file_handle)
+            with self.assertRaises(ValueError):
+                artifacts.load_artifacts(path, '1')
+            del guided_model, unguided_model
+
+    def test_recommender_index(self):
+        """ Tests the recommender index is loaded back with its arrays
+            memory-mapped, gives the same recommendations, and is checked
+            against the model.
+        """
+        doc_topic = self.unguided_model.doc_topic_
+        queries = doc_topic[:3]
+        with tempfile.TemporaryDirectory() as path:
+            artifacts.save_artifacts(path, self.processor, self.guided_model,
+                                     self.unguided_model, version='1')
+            with self.assertRaises(FileNotFoundError):
+                artifacts.load_recommender_index(path)
+            for backend in ['kdtree', 'ivf']:
+                index = article_recommender.build_index(doc_topic, backend)
+                artifacts.save_artifacts(path, self.processor,
+                                         self.guided_model,
+                                         self.unguided_model,
+                                         version=backend,
+                                         recommender_index=index)
+                loaded = artifacts.load_recommender_index(
+                    path, self.unguided_model)
+                self.assertTrue(isinstance(loaded, type(index)))
+                # data, first in the state of both kinds of index
+                self.assertTrue(isinstance(loaded.__getstate__()[0],
+                                           np.memmap))
+                self.assertTrue(np.array_equal(
+                    loaded.query(queries, k=3)[1],
+                    index.query(queries, k=3)[1]))
+                with self.assertRaises(ValueError):
+                    artifacts.load_recommender_index(path, self.guided_model)
+                del loaded
+
+
+if __name__ == '__main__':
+    unittest.main()
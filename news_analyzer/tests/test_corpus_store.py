@@ -0,0 +1,80 @@
+"""
+This module conducts unittest on the corpus_store.py module.
+"""
+# standard imports
+import json
+import os
+import sys
+import tempfile
+import unittest
+import pandas as pd
+
+# test import
+sys.path.append('news_analyzer/libraries')
+
+# pylint: disable=wrong-import-position
+import corpus_store # noqa
+
+
+class TestCorpusStore(unittest.TestCase):
+    """ Usage: corpus_store.py unit-test.
+        python test_corpus_store.py
+    """
+    def setUp(self):
+        self.corpus = pd.DataFrame({
+            'id': [0, 1, 2, 3],
+            'title': ['SpaceX Launches Rocket', 'Café über alles',
+                      'Stocks, "bonds" fall', 'Senate passes bill'],
+            'publication': ['Pub', 'Pub', 'Other', 'Pub'],
+            'author': ['A', None, 'B', 'C'],
+            'date': ['2017-01-01'] * 4,
+            'url': ['http://x/{}'.format(i) for i in range(4)],
+            'content': ['The rocket launched.\nIt landed.',
+                        'Naïve résumé text', '',
+                        'The bill, passed 52-48.']})
+
+    def test_build_and_load(self):
+        """ Tests the columns and article bodies read back from the store
+            match the corpus csv.
+        """
+        with tempfile.TemporaryDirectory() as path:
+            csv_path = os.path.join(path, 'articles.csv')
+            store_path = os.path.join(path, 'corpus_store')
+            self.corpus.to_csv(csv_path, index=False)
+            self.assertFalse(corpus_store.has_corpus_store(store_path))
+            n_articles = corpus_store.build_corpus_store(csv_path, store_path,
+                                                         chunksize=3)
+            self.assertTrue(n_articles == len(self.corpus))
+            self.assertTrue(corpus_store.has_corpus_store(store_path))
+            store = corpus_store.CorpusStore(store_path)
+            self.assertTrue(len(store) == len(self.corpus))
+            titles = store.load_columns(['title'])
+            self.assertTrue(list(titles.columns) == ['title'])
+            self.assertTrue(titles['title'].tolist() ==
+                            self.corpus['title'].tolist())
+            metadata = store.load_columns()
+            self.assertTrue(list(metadata.columns) ==
+                            corpus_store.METADATA_COLUMNS)
+            # missing values are empty strings
+            self.assertTrue(metadata['author'].tolist() == ['A', '', 'B', 'C'])
+            self.assertTrue(store.get_contents([3, 0, 2]) ==
+                            [self.corpus['content'][3],
+                             self.corpus['content'][0], ''])
+            self.assertTrue(store.get_content(1) == self.corpus['content'][1])
+            store.close()
+            with self.assertRaises(KeyError):
+                store.load_columns(['id'])
+            # older formats are rejected
+            manifest_path = os.path.join(store_path,
+                                         corpus_store.MANIFEST_FILE)
+            with open(manifest_path) as file_handle:
+                manifest = json.load(file_handle)
+            manifest['format_version'] = 0
+            with open(manifest_path, "w") as file_handle:
+                json.dump(manifest, file_handle)
+            with self.assertRaises(ValueError):
+                corpus_store.CorpusStore(store_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,19 @@
 """
 This module performs unittest on handler module.
 """
+import asyncio
+import tempfile
+import threading
+import time
 import unittest
+from unittest import mock
 import sys
+import numpy as np
 sys.path.append('../libraries')
 
 # pylint: disable=wrong-import-position
 import handler # noqa
+import corpus_store # noqa
 
 
 class TestHandler(unittest.TestCase):
@@ -20,6 +27,221 @@ class TestHandler(unittest.TestCase):
         self.query_article = 'SpaceX Launches Rocket'
         self.path = 'news_analyzer/libraries'
 
+    def test_lazy_loading(self):
+        """
+        This method tests resources are loaded on first use, and by
+        warmup().
+        """
+        lazy_handler = handler.Handler()
+        self.assertTrue(set(lazy_handler.status().values()) ==
+                        {'not loaded'})
+        self.assertFalse(lazy_handler.is_ready())
+        self.assertTrue(lazy_handler.preprocessor is not None)
+        self.assertTrue(lazy_handler.status()['models'] == 'loaded')
+        self.assertTrue(lazy_handler.status()['corpus'] == 'not loaded')
+        lazy_handler.warmup(wait=True, resources=handler.ANALYSIS_RESOURCES)
+        self.assertTrue(lazy_handler.is_ready(handler.ANALYSIS_RESOURCES))
+        self.assertFalse(lazy_handler.is_ready())
+        self.assertTrue(lazy_handler.status()['article_store'] ==
+                        'not loaded')
+        lazy_handler.warmup(wait=True)
+        self.assertTrue(lazy_handler.is_ready())
+        self.assertTrue(set(lazy_handler.load_times) ==
+                        set(handler.RESOURCES))
+        self.assertTrue(list(lazy_handler.corpus.columns) ==
+                        handler.CORPUS_COLUMNS)
+
+    def test_analysis_cache(self):
+        """
+        This method tests the per-query analysis results are computed once
+        and shared between the handler's methods.
+        """
+        stats = self.handler.cache.stats()
+        self.assertTrue(stats['hits'] == 0 and stats['misses'] == 0)
+        query_topics = self.handler.get_topics(self.query_article)
+        # topics and dtm computed
+        self.assertTrue(self.handler.cache.stats()['misses'] == 2)
+        # recommendations reuse the cached topics
+        self.handler.get_recommended_articles(self.query_article)
+        self.assertTrue(self.handler.cache.stats()['hits'] == 1)
+        # whitespace differences share the same results
+        spaced_query = ' ' + self.query_article.replace(' ', '\n  ') + ' '
+        self.assertTrue(self.handler.get_topics(spaced_query) is
+                        query_topics)
+        self.handler.get_sentiment(self.query_article)
+        self.handler.get_sentiment(self.query_article)
+        stats = self.handler.cache.stats()
+        self.assertTrue(stats['hits'] == 3 and stats['misses'] == 4)
+        self.assertTrue(stats['size'] == 1)
+
+    def test_analysis_cache_eviction(self):
+        """
+        This method tests AnalysisCache evicts the least recently used
+        queries and expires old results.
+        """
+        cache = handler.AnalysisCache(max_size=2, ttl=None)
+        for query in ['a', 'b', 'a', 'c']:
+            cache.get(query, 'value', lambda query=query: query.upper())
+        stats = cache.stats()
+        self.assertTrue(stats['size'] == 2 and stats['evictions'] == 1)
+        self.assertTrue(stats['hits'] == 1 and stats['misses'] == 3)
+        # 'b' was least recently used
+        cache.get('b', 'value', lambda: 'B')
+        self.assertTrue(cache.stats()['misses'] == 4)
+        expired_cache = handler.AnalysisCache(max_size=2, ttl=0)
+        expired_cache.get('a', 'value', lambda: 'A')
+        expired_cache.get('a', 'value', lambda: 'A')
+        self.assertTrue(expired_cache.stats()['misses'] == 2)
+
+    def test_analysis_cache_single_flight(self):
+        """
+        This method tests concurrent misses of the same result compute it
+        once, and the others wait for it (or for its error).
+        """
+        cache = handler.AnalysisCache(max_size=2, ttl=None)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'A'
+
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(cache.get('a', 'value', compute)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(len(calls) == 1)
+        self.assertTrue(results == ['A'] * 4)
+
+        def fail():
+            time.sleep(0.2)
+            raise ValueError('failed')
+
+        errors = []
+
+        def get_failing():
+            try:
+                cache.get('b', 'value', fail)
+            except ValueError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=get_failing) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(len(errors) == 3)
+        # a failed result is not cached
+        self.assertTrue(cache.get('b', 'value', lambda: 'B') == 'B')
+
+    def test_analyze(self):
+        """
+        This method tests analyze method of handler.py runs the analyses
+        in worker processes, with the same results as one at a time.
+        """
+        parallel_handler = handler.Handler(n_workers=2)
+        try:
+            result = parallel_handler.analyze(self.query_article)
+            self.assertTrue(isinstance(result, handler.AnalysisResult))
+            self.assertTrue(np.allclose(
+                result.topics[1], self.handler.get_topics(
+                    self.query_article)[1]))
+            self.assertTrue(list(result.recommended_articles) ==
+                            list(self.handler.get_recommended_articles(
+                                self.query_article)))
+            self.assertTrue(result.sentiment ==
+                            self.handler.get_sentiment(self.query_article))
+            self.assertTrue(result.wordcloud is not None)
+            # answered from the cache the second time
+            misses = parallel_handler.cache.stats()['misses']
+            result = asyncio.run(
+                parallel_handler.analyze_async(self.query_article))
+            self.assertTrue(parallel_handler.cache.stats()['misses'] ==
+                            misses)
+            self.assertTrue(result.sentiment ==
+                            self.handler.get_sentiment(self.query_article))
+        finally:
+            parallel_handler.close()
+        serial_result = handler.Handler(n_workers=0).analyze(
+            self.query_article)
+        self.assertTrue(serial_result.sentiment == result.sentiment)
+
+    def test_submit_analysis(self):
+        """
+        This method tests background analyses of handler.py, and that a
+        resubmit cancels the previous one, but not the jobs of other
+        submits of the same article.
+        """
+        job_id = self.handler.submit_analysis(self.query_article)
+        job = self.handler.get_job(job_id)
+        self.assertTrue(job.result('sentiment', wait=True) ==
+                        self.handler.get_sentiment(self.query_article))
+        # each submit is its own job
+        shared_job_id = self.handler.submit_analysis(self.query_article)
+        self.assertTrue(shared_job_id != job_id)
+        other_job_id = self.handler.submit_analysis('Stocks fall', job_id)
+        self.assertTrue(self.handler.get_job(job_id) is None)
+        self.assertTrue(self.handler.is_cancelled(job_id))
+        self.assertFalse(self.handler.is_cancelled(shared_job_id))
+        for other_id in [shared_job_id, other_job_id]:
+            other_job = self.handler.get_job(other_id)
+            for stage in handler.ANALYSIS_STAGES:
+                other_job.result(stage, wait=True)
+            self.assertTrue(other_job.done())
+        self.handler.close()
+
+    def test_resume_analysis(self):
+        """
+        This method tests a forgotten analysis is started again from the
+        submitted article, and that cancelled or unknown jobs are not.
+        """
+        with mock.patch.object(handler.configs, 'ANALYSIS_CACHE_SIZE', 1):
+            small_handler = handler.Handler()
+        job_id = small_handler.submit_analysis(self.query_article)
+        for stage in handler.ANALYSIS_STAGES:
+            small_handler.get_job(job_id).result(stage, wait=True)
+        # the finished job is forgotten by the next one
+        other_job_id = small_handler.submit_analysis('Stocks fall')
+        self.assertTrue(small_handler.get_job(job_id) is None)
+        job = small_handler.resume_analysis(job_id)
+        self.assertTrue(job.query_article == self.query_article)
+        self.assertTrue(small_handler.get_job(job_id) is job)
+        self.assertTrue(small_handler.resume_analysis(job_id) is job)
+        self.assertTrue(job.result('sentiment', wait=True) ==
+                        small_handler.get_sentiment(self.query_article))
+        small_handler.cancel_analysis(other_job_id)
+        self.assertTrue(small_handler.resume_analysis(other_job_id) is None)
+        self.assertTrue(small_handler.get_job(other_job_id) is None)
+        self.assertTrue(small_handler.resume_analysis('unknown') is None)
+        small_handler.close()
+
+    def test_article_contents(self):
+        """
+        This method tests get_article_contents method of handler.py.
+        """
+        contents = self.handler.get_article_contents([1, 0])
+        self.assertTrue(len(contents) == 2)
+        self.assertTrue(all(isinstance(content, str) and content
+                            for content in contents))
+        # from a corpus store, opened once by the handler
+        with tempfile.TemporaryDirectory() as store_path:
+            corpus_store.build_corpus_store(handler.configs.CORPUS_PATH,
+                                            store_path)
+            with mock.patch.object(handler.configs, 'CORPUS_STORE_PATH',
+                                   store_path):
+                store_handler = handler.Handler()
+                self.assertTrue(store_handler.get_article_contents([1, 0])
+                                == contents)
+                store = store_handler.article_store
+                self.assertTrue(store is not None)
+                store_handler.get_article_contents([2])
+                self.assertTrue(store_handler.article_store is store)
+                store_handler.close()
+
     def test_wordcloud(self):
         """
         This method tests get_word_cloud method of handler.py.
@@ -36,6 +258,21 @@ class TestHandler(unittest.TestCase):
             query_article=self.query_article)
         self.assertTrue(isinstance(query_sentiment, dict))
 
+    def test_topic_distributions(self):
+        """
+        This method tests get_topic_distributions method of handler.py.
+        """
+        query_articles = [self.query_article, 'Stocks fall on Wall Street',
+                          'Senate passes the budget bill']
+        guided_topics, unguided_topics = \
+            self.handler.get_topic_distributions(query_articles)
+        self.assertTrue(guided_topics.shape[0] == len(query_articles))
+        self.assertTrue(unguided_topics.shape[0] == len(query_articles))
+        self.assertTrue(np.allclose(unguided_topics.sum(axis=1), 1))
+        # same as one article at a time
+        query_topics = self.handler.get_topics(self.query_article)
+        self.assertTrue(np.allclose(query_topics[1], unguided_topics[:1]))
+
     def test_recommended_articles(self):
         """
         This method tests get_recommended_articles method of handler.py.
@@ -0,0 +1,139 @@
+"""
+This module conducts unittest on the online_lda.py module.
+"""
+# standard imports
+import os
+import sys
+import tempfile
+import unittest
+import pickle
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# test import
+sys.path.append('news_analyzer/libraries')
+
+# pylint: disable=wrong-import-position
+import online_lda # noqa
+import topic_modeling # noqa
+
+
+class TestOnlineLDA(unittest.TestCase):
+    """ Usage: online_lda.py unit-test.
+        python test_online_lda.py
+    """
+    def setUp(self):
+        self.test_dtm = pd.read_pickle(
+            'news_analyzer/tests/test_resources/test_dtm.pkl')
+        self.sparse_dtm = sparse.csr_matrix(self.test_dtm.values)
+        topics_path = "news_analyzer/tests/test_resources/test_topics_raw.pkl"
+        with open(topics_path, "rb") as file_handle:
+            raw_topics = pickle.load(file_handle)
+        _, self.word2id = topic_modeling.get_vocab(self.test_dtm)
+        clean_topics = topic_modeling.clean_topics(
+            raw_topics, self.word2id, ['national', 'nyregion', 'obituaries'])
+        self.seed_topics = topic_modeling.get_seed_topics(
+            clean_topics, self.word2id)
+        self.n_topics = max(self.seed_topics.values()) + 1
+
+    def test_fit(self):
+        """ Tests the fitted model has the guidedlda model surface.
+        """
+        n_docs, n_words = self.test_dtm.shape
+        model = online_lda.OnlineLDA(n_topics=5, n_iter=2, batch_size=16)
+        model.fit(self.sparse_dtm)
+        self.assertTrue(model.topic_word_.shape == (5, n_words))
+        self.assertTrue(np.allclose(model.topic_word_.sum(axis=1), 1))
+        self.assertTrue(model.doc_topic_.shape == (n_docs, 5))
+        self.assertTrue(np.allclose(model.doc_topic_.sum(axis=1), 1))
+        self.assertTrue(model.n_iter_ == 2)
+        # dense and sparse input give the same model
+        dense_model = online_lda.OnlineLDA(n_topics=5, n_iter=2,
+                                           batch_size=16)
+        dense_model.fit(np.array(self.test_dtm))
+        self.assertTrue(np.allclose(dense_model.topic_word_,
+                                    model.topic_word_))
+        # transform
+        query_topics = model.transform(np.array(self.test_dtm)[0])
+        self.assertTrue(query_topics.shape == (1, 5))
+        self.assertTrue(np.allclose(query_topics, model.doc_topic_[:1]))
+        model.purge_extra_matrices()
+        self.assertTrue(np.allclose(model.transform(self.sparse_dtm[:1]),
+                                    query_topics))
+
+    def test_fit_shards(self):
+        """ Tests fitting on dtm shards gives the same model as fitting on
+            the whole dtm.
+        """
+        model = online_lda.OnlineLDA(n_topics=5, n_iter=2, batch_size=8)
+        model.fit(self.sparse_dtm)
+        with tempfile.TemporaryDirectory() as path:
+            shard_paths = []
+            for i, start in enumerate(range(0, self.sparse_dtm.shape[0],
+                                            16)):
+                shard_paths.append(os.path.join(path, '{}.npz'.format(i)))
+                sparse.save_npz(shard_paths[-1],
+                                self.sparse_dtm[start:start + 16])
+            self.assertTrue(online_lda.get_shard_shape(shard_paths) ==
+                            self.sparse_dtm.shape)
+            shard_model = online_lda.OnlineLDA(n_topics=5, n_iter=2,
+                                               batch_size=8)
+            shard_model.fit(shard_paths)
+        self.assertTrue(np.allclose(shard_model.topic_word_,
+                                    model.topic_word_))
+        self.assertTrue(np.allclose(shard_model.doc_topic_, model.doc_topic_))
+
+    def test_seed_topics(self):
+        """ Tests seed words end up most likely in their seed topics.
+        """
+        model = online_lda.OnlineLDA(n_topics=self.n_topics, n_iter=2)
+        model.fit(self.sparse_dtm, self.seed_topics, 0.5)
+        word_ids = list(self.seed_topics)
+        topic_ids = [self.seed_topics[word_id] for word_id in word_ids]
+        best_topics = model.topic_word_[:, word_ids].argmax(axis=0)
+        self.assertTrue(np.mean(best_topics == topic_ids) > 0.9)
+
+    def test_loglikelihoods(self):
+        """ Tests the variational bound is kept for every pass, and that a
+            grid search can compare online models by it.
+        """
+        model = online_lda.OnlineLDA(n_topics=5, n_iter=3, batch_size=16)
+        model.fit(self.sparse_dtm)
+        self.assertTrue(len(model.loglikelihoods_) == 3)
+        self.assertTrue(np.all(np.isfinite(model.loglikelihoods_)))
+        self.assertTrue(model.loglikelihoods_[-1] >
+                        model.loglikelihoods_[0])
+        grid = topic_modeling.TopicModelerGridSearch(
+            [3, 5], n_iter=2, random_state=0, refresh=10,
+            backend='online')
+        grid.gridsearch(self.sparse_dtm)
+        self.assertTrue(isinstance(grid.model, online_lda.OnlineLDA))
+        self.assertTrue(grid.n_topics_opt in [3, 5])
+
+    def test_partial_fit_empty(self):
+        """ Tests an empty minibatch leaves the model unchanged.
+        """
+        model = online_lda.OnlineLDA(n_topics=5)
+        model.partial_fit(self.sparse_dtm[:16])
+        topic_word = model.topic_word_.copy()
+        model.partial_fit(self.sparse_dtm[:0])
+        self.assertTrue(np.array_equal(model.topic_word_, topic_word))
+        self.assertTrue(model.n_docs_seen_ == 16)
+
+    def test_topic_modeler_backend(self):
+        """ Tests TopicModeler with the online backend.
+        """
+        model = topic_modeling.TopicModeler(
+            n_topics=self.n_topics, n_iter=50, tol=0.05,
+            backend='online').fit(self.test_dtm, self.seed_topics, 0.5)
+        self.assertTrue(isinstance(model, online_lda.OnlineLDA))
+        self.assertTrue(model.n_iter_ < 50)
+        self.assertTrue(model.doc_topic_.shape ==
+                        (self.test_dtm.shape[0], self.n_topics))
+        with self.assertRaises(ValueError):
+            topic_modeling.TopicModeler(n_topics=5, backend='vb')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,16 @@
 """ Module for testing text_processing library.
 """
+import os
+import pickle
+import tempfile
 import unittest
+from unittest import mock
 import sys
 
 from nltk.corpus import stopwords
 import numpy as np
 import pandas as pd
+from scipy import sparse
 
 sys.path.append('../libraries')
 # pylint: disable=wrong-import-position
@@ -73,6 +78,27 @@ class ArticleCleaningTest(unittest.TestCase):
                 self.assertFalse(has_stopwords(cleaned_article))
                 # Test for equal or less number of words.
 
+    def test_token_pipeline(self):
+        """ A TokenPipeline gives the same output as the module functions,
+            and its regex tokenizer passes the same cleaning tests.
+        """
+        pipeline = tpp.TokenPipeline()
+        regex_pipeline = tpp.TokenPipeline(tokenizer="regex")
+        for i, test_article in enumerate(self.test_articles):
+            with self.subTest(test_article=i):
+                self.assertTrue(pipeline.transform_article(test_article) ==
+                                tpp.transform_article(test_article))
+                cleaned_list = regex_pipeline.clean_article(test_article)
+                self.assertTrue(is_alphabetic_only(cleaned_list))
+                self.assertTrue(is_lowercase(cleaned_list))
+                self.assertFalse(has_stopwords(cleaned_list))
+        # Pipeline can be pickled (sent to worker processes)
+        unpickled = pickle.loads(pickle.dumps(pipeline))
+        self.assertTrue(unpickled.transform_article(self.test_articles[0]) ==
+                        pipeline.transform_article(self.test_articles[0]))
+        with self.assertRaises(ValueError):
+            tpp.TokenPipeline(tokenizer="split")
+
 
 class ArticlePreprocessorTest(unittest.TestCase):
     """ These will test the ArticlePreprocessor() class.
@@ -181,6 +207,164 @@ class ArticlePreprocessorTest(unittest.TestCase):
         # Ensure words are the same
         self.assertTrue(cols.isin(vocab).all())
 
+    def test_fit_transform(self):
+        """ Tests fit_transform cleans each article exactly once and
+            returns the same document-term-matrix as fit then transform.
+        """
+        with mock.patch.object(tpp, 'transform_article',
+                               wraps=tpp.transform_article) as transform:
+            dtm = self.processor.fit_transform(self.test_articles)
+            self.assertTrue(transform.call_count == len(self.test_articles))
+        self.processor.fit(self.test_articles)
+        self.assertTrue(dtm.equals(
+            self.processor.transform(self.test_articles)))
+
+    def test_n_jobs(self):
+        """ Tests cleaning articles in a process pool gives the same
+            document-term-matrix as the serial preprocessor.
+        """
+        self.processor.fit(self.test_articles)
+        parallel_processor = tpp.ArticlePreprocessor(n_jobs=2)
+        parallel_processor.fit(self.test_articles)
+        self.assertTrue(parallel_processor.dtm.equals(self.processor.dtm))
+        # Query articles are still cleaned before counting
+        query = "Newlines and sentences"
+        self.assertTrue(parallel_processor.transform(query).equals(
+            self.processor.transform(query)))
+        self.assertTrue(tpp.transform_articles(self.test_articles, n_jobs=2)
+                        == [tpp.transform_article(article)
+                            for article in self.test_articles])
+
+    def test_fit_stream(self):
+        """ Tests fitting from a csv in chunks gives the same vocabulary
+            and document-term-matrix as fitting in memory.
+        """
+        # pandas skips blank lines in csv files, so leave out blank articles
+        articles = self.articles_should_pass + ["L", "!@#$%^&"]
+        self.processor.fit(articles)
+        stream_processor = tpp.ArticlePreprocessor(sparse=True)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, "articles.csv")
+            pd.DataFrame({"content": articles}).to_csv(csv_path, index=False)
+            # the shards are sparse, so the preprocessor must be too
+            with self.assertRaises(ValueError):
+                tpp.ArticlePreprocessor().fit_stream(csv_path,
+                                                     shard_path=tmp_dir)
+            shard_paths = stream_processor.fit_stream(
+                csv_path, chunksize=2, shard_path=tmp_dir)
+            # One shard per chunk
+            self.assertTrue(len(shard_paths) == 3)
+            dtm = tpp.load_dtm_shards(shard_paths)
+        self.assertTrue(stream_processor.get_vocab() ==
+                        self.processor.get_vocab())
+        self.assertTrue((dtm.toarray() == self.processor.dtm.values).all())
+        query = "Newlines and sentences"
+        self.assertTrue((stream_processor.transform(query).toarray() ==
+                         self.processor.transform(query).values).all())
+
+    def test_partial_fit(self):
+        """ Tests adding articles with partial_fit gives the same vocabulary
+            and document-term-matrix as fitting on all articles at once.
+        """
+        first, second = self.test_articles[:2], self.test_articles[2:]
+        processor = tpp.ArticlePreprocessor(min_df=1, incremental=True)
+        processor.fit(first)
+        old_vocab = processor.get_vocab()
+        changes = processor.partial_fit(second)
+        full_processor = tpp.ArticlePreprocessor(min_df=1, incremental=True)
+        full_processor.fit(self.test_articles)
+        self.assertTrue(processor.get_vocab() == full_processor.get_vocab())
+        self.assertTrue(processor.dtm.equals(full_processor.dtm))
+        self.assertTrue(processor.dtm.shape[0] == len(self.test_articles))
+        # Report of vocabulary changes
+        self.assertTrue(changes['added'] == sorted(
+            set(processor.get_vocab()) - set(old_vocab)))
+        self.assertTrue('singleword' in changes['added'])
+        self.assertTrue(changes['removed'] == [])
+        # Only incremental preprocessors can be updated
+        self.processor.fit(first)
+        with self.assertRaises(ValueError):
+            self.processor.partial_fit(second)
+
+    def test_token_cache(self):
+        """ Tests cleaned articles are stored in and read back from the
+            token cache, and give the same result as cleaning them again.
+        """
+        with tempfile.TemporaryDirectory() as cache_path:
+            cache = tpp.TokenCache(cache_path)
+            articles = self.test_articles + ["", "the and of"]
+            keys = tpp.TokenCache.make_keys(articles)
+            self.assertTrue(cache.get_many(keys) == [None] * len(keys))
+            expected = tpp.transform_articles(articles)
+            cache.put_many(keys, expected)
+            self.assertTrue(len(cache) == len(set(keys)))
+            self.assertTrue(tpp.TokenCache(cache_path).get_many(keys) ==
+                            expected)
+            # One article at a time: merged into few index segments
+            more_articles = ["article number {}".format(i)
+                             for i in range(50)]
+            more_keys = tpp.TokenCache.make_keys(more_articles)
+            for key, article in zip(more_keys, more_articles):
+                cache.put_many([key], [article])
+            self.assertTrue(len(cache) == len(set(keys)) + 50)
+            segments = [name for name in os.listdir(cache_path)
+                        if tpp.TOKEN_CACHE_SEGMENT_PATTERN.match(name)]
+            self.assertTrue(len(segments) <= 7)
+            reader = tpp.TokenCache(cache_path)
+            self.assertTrue(reader.get_many(more_keys) == more_articles)
+            self.assertTrue(reader.get_many(keys) == expected)
+            reader.close()
+            # Keys depend on the pipeline configuration
+            regex_keys = tpp.TokenCache.make_keys(
+                articles, tpp.TokenPipeline(tokenizer="regex"))
+            self.assertTrue(cache.get_many(regex_keys) ==
+                            [None] * len(keys))
+            # Second fit does not clean any articles again
+            processor = tpp.ArticlePreprocessor(min_df=1,
+                                                token_cache=cache_path)
+            processor.fit(self.test_articles)
+            with mock.patch.object(tpp, 'transform_article',
+                                   wraps=tpp.transform_article) as transform:
+                dtm = processor.fit_transform(self.test_articles)
+                self.assertTrue(transform.call_count == 0)
+            self.processor.fit(self.test_articles)
+            self.assertTrue(dtm.equals(self.processor.dtm))
+
+    def test_sparse(self):
+        """ Tests the sparse preprocessor returns the same counts as
+            the dense one, as a scipy CSR matrix.
+        """
+        self.processor.fit(self.test_articles)
+        sparse_processor = tpp.ArticlePreprocessor(sparse=True)
+        sparse_processor.fit(self.test_articles)
+        dtm = sparse_processor.get_dtm()
+        # Test if dtm is a scipy CSR matrix
+        self.assertTrue(sparse.isspmatrix_csr(dtm))
+        # Test vocabulary and counts match the dense dtm
+        self.assertTrue(sparse_processor.get_vocab() ==
+                        list(self.processor.dtm.columns))
+        self.assertTrue((dtm.toarray() == self.processor.dtm.values).all())
+        # Test query transform
+        query_dtm = sparse_processor.transform("text outside of test cases")
+        self.assertTrue(sparse.isspmatrix_csr(query_dtm))
+        self.assertTrue(query_dtm.shape == (1, dtm.shape[1]))
+
+    def test_term_frequencies(self):
+        """ Tests the word counts of a query article are the same from the
+            dense and sparse dtm.
+        """
+        self.processor.fit(self.test_articles)
+        sparse_processor = tpp.ArticlePreprocessor(sparse=True)
+        sparse_processor.fit(self.test_articles)
+        query = "sentence article sentence newline unknown"
+        frequencies = tpp.get_term_frequencies(
+            self.processor.transform(query))
+        self.assertTrue(frequencies == {'sentence': 2, 'article': 1,
+                                        'newline': 1})
+        self.assertTrue(tpp.get_term_frequencies(
+            sparse_processor.transform(query),
+            sparse_processor.get_vocab()) == frequencies)
+
 
 def has_stopwords(string):
     """Internal function for checking if string is lowercase.
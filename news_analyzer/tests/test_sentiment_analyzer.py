@@ -3,6 +3,7 @@ Unit Tests for Sentiment Analyzer
 """
 import unittest
 import sys
+import numpy as np
 sys.path.append('news_analyzer/libraries')
 
 # pylint: disable=wrong-import-position
@@ -97,6 +98,35 @@ class SentimentAnalyzerTest(unittest.TestCase):
                         (my_sentiment["Neutral_Sentences"] == 1) &
                         (my_sentiment["Total_Sentences"] == 3))
 
+    def test_engine(self):
+        """
+        Test the lexicon is loaded once per process, and batch scoring
+        gives the same counts as one article at a time.
+
+        Args:
+            self (object): Reference to the class
+
+        Returns:
+            null
+        """
+        engine = sentiment_analyzer.get_engine()
+        self.assertTrue(sentiment_analyzer.get_engine() is engine)
+        analyzer = engine.analyzer
+        sentiment_analyzer.get_sentiment("I am happy.")
+        self.assertTrue(engine.analyzer is analyzer)
+        articles = ["I am happy.", "I am happy. I am sad. The sky is blue.",
+                    "I am really sad. It rained all day.", ""]
+        for n_jobs in [1, 2]:
+            counts = sentiment_analyzer.SentimentEngine(
+                n_jobs=n_jobs, chunksize=1).score_many(articles)
+            self.assertTrue(counts.shape == (len(articles), 4))
+            self.assertTrue(counts.dtype == np.int32)
+            for article, article_counts in zip(articles, counts):
+                self.assertTrue(sentiment_analyzer.to_dict(article_counts) ==
+                                sentiment_analyzer.get_sentiment(article))
+        self.assertTrue(counts[1].tolist() == [1, 1, 1, 3])
+        self.assertTrue(engine.score_many([]).shape == (0, 4))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -3,10 +3,12 @@ This module conducts unittest on the topic_modeling.py module.
 """
 # standard imports
 import sys
+import tempfile
 import unittest
 import pickle
 import numpy as np
 import pandas as pd
+from scipy import sparse
 import guidedlda
 
 # test import
@@ -46,6 +48,18 @@ class TestTopicModeling(unittest.TestCase):
         self.assertTrue(np.all(self.vocab == self.test_dtm.columns))
         self.assertTrue(set(self.word2id.keys()) == set(self.vocab))
 
+    def test_get_vocab_sparse(self):
+        """ Test to check get_vocab function on a sparse dtm.
+        """
+        sparse_dtm = sparse.csr_matrix(self.test_dtm.values)
+        vocab, word2id = topic_modeling.get_vocab(
+            sparse_dtm, list(self.test_dtm.columns))
+        self.assertTrue(vocab == self.vocab)
+        self.assertTrue(word2id == self.word2id)
+        # vocabulary is required for sparse input
+        with self.assertRaises(ValueError):
+            topic_modeling.get_vocab(sparse_dtm)
+
     def test_clean_topics(self):
         """ Tests the clean_topics method.
         """
@@ -99,6 +113,14 @@ class TestTopicModeling(unittest.TestCase):
             refresh=refresh)
         test_model = test_modeler.fit(self.test_dtm)
         self.assertTrue(isinstance(test_model, guidedlda.guidedlda.GuidedLDA))
+        # check sparse dtm gives the same model as the dense one
+        sparse_model = topic_modeling.TopicModeler(
+            n_topics=n_topics,
+            n_iter=n_iter,
+            random_state=random_state,
+            refresh=refresh).fit(sparse.csr_matrix(self.test_dtm.values))
+        self.assertTrue(np.allclose(sparse_model.topic_word_,
+                                    test_model.topic_word_))
         # non-valid inputs (guided case)
         n_topics = 20
         n_iter = 100
@@ -153,6 +175,141 @@ class TestTopicModeling(unittest.TestCase):
             seed_confidence=seed_confidence)
         self.assertTrue(isinstance(test_model, guidedlda.guidedlda.GuidedLDA))
 
+    def test_early_stopping(self):
+        """ Tests TopicModeler stops once the log likelihood converges.
+        """
+        full_model = topic_modeling.TopicModeler(
+            n_topics=5, n_iter=200, random_state=0, refresh=10).fit(
+                self.test_dtm)
+        self.assertTrue(full_model.n_iter_ == 200)
+        self.assertTrue(full_model.fit_time_ > 0)
+        # any change counts as converged with an infinite tolerance
+        model = topic_modeling.TopicModeler(
+            n_topics=5, n_iter=200, random_state=0, refresh=10,
+            tol=np.inf, patience=2).fit(self.test_dtm)
+        self.assertTrue(model.n_iter_ == 20)
+        self.assertTrue(len(model.loglikelihoods_) == 3)
+        self.assertTrue(model.doc_topic_.shape == (self.test_dtm.shape[0], 5))
+        # same chain as the full run up to the stop
+        self.assertTrue(np.allclose(model.loglikelihoods_,
+                                    full_model.loglikelihoods_[:3]))
+        # guided model
+        model = topic_modeling.TopicModeler(
+            n_topics=len(self.seed_topics), n_iter=200, random_state=0,
+            refresh=10, tol=0.01).fit(self.test_dtm, self.seed_topics, 0.5)
+        self.assertTrue(model.n_iter_ <= 200)
+        with self.assertRaises(ValueError):
+            topic_modeling.TopicModeler(n_topics=5, tol=-1.)
+
+    def test_parallel_lda(self):
+        """ Tests Gibbs sampling on several cores.
+        """
+        dtm = np.array(self.test_dtm)
+        model = topic_modeling.TopicModeler(
+            n_topics=5, n_iter=40, random_state=0, refresh=20,
+            n_jobs=2).fit(dtm)
+        self.assertTrue(isinstance(model, topic_modeling.ParallelLDA))
+        self.assertTrue(len(model._partitions) == 2)
+        # counts are consistent with the corpus
+        self.assertTrue(model.nzw_.sum() == dtm.sum())
+        self.assertTrue(np.array_equal(model.nzw_.sum(axis=0),
+                                       dtm.sum(axis=0)))
+        self.assertTrue(np.array_equal(model.ndz_.sum(axis=1),
+                                       dtm.sum(axis=1)))
+        # merged changes agree with the doc-topic counts
+        self.assertTrue(np.array_equal(model.nzw_.sum(axis=1),
+                                       model.ndz_.sum(axis=0)))
+        self.assertTrue(np.array_equal(model.nz_, model.ndz_.sum(axis=0)))
+        self.assertTrue(model.doc_topic_.shape == (dtm.shape[0], 5))
+        self.assertTrue(model._path is None)
+        # reproducible
+        same_model = topic_modeling.TopicModeler(
+            n_topics=5, n_iter=40, random_state=0, refresh=20,
+            n_jobs=2).fit(dtm)
+        self.assertTrue(np.array_equal(model.nzw_, same_model.nzw_))
+        # close to the single core sampler
+        sequential_model = topic_modeling.TopicModeler(
+            n_topics=5, n_iter=40, random_state=0, refresh=20).fit(dtm)
+        self.assertTrue(np.isclose(model.loglikelihoods_[-1],
+                                   sequential_model.loglikelihoods_[-1],
+                                   rtol=0.05))
+
+    def test_parallel_lda_snapshot(self):
+        """ Tests a sampling worker keeps its copy of the topic-word counts
+            in step with the shared counts from each sweep's changes,
+            without copying them again.
+        """
+        model = topic_modeling.ParallelLDA(n_topics=5, n_jobs=1)
+        model._initialize(np.array(self.test_dtm), {}, 0)
+        try:
+            n_topics, vocab_size = model.nzw_.shape
+            topic_modeling._init_sampling_worker(
+                model._path, np.repeat(model.alpha, n_topics),
+                np.repeat(model.eta, vocab_size), 0)
+            snapshot = topic_modeling._SAMPLING_STATE[-1]
+            last_changes = None
+            for sweep in range(3):
+                last_changes = topic_modeling._sample_partition(
+                    (0, 0, len(model.WS), sweep, last_changes))
+                if sweep == 0:
+                    local_nzw = snapshot['nzw']
+                self.assertTrue(snapshot['nzw'] is local_nzw)
+                topic_modeling.apply_topic_changes(
+                    model.nzw_, model.nz_, *last_changes)
+            topic_modeling.apply_topic_changes(
+                snapshot['nzw'], snapshot['nz'], *last_changes)
+            self.assertTrue(np.array_equal(snapshot['nzw'], model.nzw_))
+            self.assertTrue(np.array_equal(snapshot['nz'], model.nz_))
+        finally:
+            topic_modeling._SAMPLING_STATE = None
+            model._stop_workers()
+
+    def test_warm_start(self):
+        """ Tests refitting from a previous model's topics on a grown corpus
+            with a changed vocabulary.
+        """
+        old_dtm = self.test_dtm.iloc[:90, :2000]
+        old_vocab, _ = topic_modeling.get_vocab(old_dtm)
+        old_model = topic_modeling.TopicModeler(
+            n_topics=10, n_iter=100, random_state=0, refresh=20).fit(old_dtm)
+        init_topic_word = topic_modeling.map_topic_word(
+            old_model, old_vocab, self.word2id)
+        self.assertTrue(init_topic_word.shape == (10, len(self.word2id)))
+        self.assertTrue(np.allclose(init_topic_word.sum(axis=1), 1))
+        cold_model = topic_modeling.TopicModeler(
+            n_topics=10, n_iter=20, random_state=0, refresh=20).fit(
+                self.test_dtm)
+        warm_model = topic_modeling.TopicModeler(
+            n_topics=10, n_iter=20, random_state=0, refresh=20).fit(
+                self.test_dtm, init_topic_word=init_topic_word)
+        # starts close to a fitted model, and keeps the topic IDs
+        self.assertTrue(warm_model.loglikelihoods_[0] >
+                        cold_model.loglikelihoods_[0])
+        self.assertTrue(warm_model.nzw_.sum() == self.test_dtm.values.sum())
+        same_topic = np.mean(warm_model.topic_word_[:, :2000].argmax(axis=0)
+                             == old_model.topic_word_.argmax(axis=0))
+        self.assertTrue(same_topic > 0.5)
+        self.assertTrue(warm_model.init_topic_word is None)
+        with self.assertRaises(ValueError):
+            topic_modeling.TopicModeler(n_topics=5).fit(
+                self.test_dtm, init_topic_word=init_topic_word)
+
+    def test_infer_topics(self):
+        """ Tests batched topic inference matches guidedlda's transform.
+        """
+        dtm = np.array(self.test_dtm)
+        model = topic_modeling.TopicModeler(
+            n_topics=10, n_iter=20, random_state=0, refresh=20).fit(dtm)
+        doc_topic = topic_modeling.infer_topics(model, dtm)
+        self.assertTrue(np.allclose(doc_topic, model.transform(dtm)))
+        doc_topic = topic_modeling.infer_topics(
+            model, sparse.csr_matrix(dtm), max_iter=5, tol=1e-3)
+        self.assertTrue(np.allclose(doc_topic,
+                                    model.transform(dtm, 5, 1e-3)))
+        # documents without known words
+        doc_topic = topic_modeling.infer_topics(model, np.zeros_like(dtm[:2]))
+        self.assertTrue(np.allclose(doc_topic, 0.1))
+
     def test_topic_modeler_gridsearch(self):
         """ Tests for the TopicModelerGridSearch class.
         """
@@ -188,6 +345,46 @@ class TestTopicModeling(unittest.TestCase):
         self.assertTrue(len(test_gridsearch.n_topics_list)
                         == len(test_gridsearch.loglikelihoods))
 
+    def test_share_dtm(self):
+        """ Tests the dtm is memory-mapped back unchanged.
+        """
+        dense_dtm = np.array(self.test_dtm)
+        for dtm in [dense_dtm, sparse.csr_matrix(dense_dtm)]:
+            with tempfile.TemporaryDirectory() as path:
+                shared_dtm = topic_modeling.load_shared_dtm(
+                    topic_modeling.share_dtm(dtm, path))
+                self.assertTrue(sparse.issparse(shared_dtm)
+                                == sparse.issparse(dtm))
+                self.assertTrue(np.array_equal(
+                    sparse.csr_matrix(shared_dtm).toarray(), dense_dtm))
+                del shared_dtm
+
+    def test_topic_modeler_gridsearch_parallel(self):
+        """ Tests the parallel grid search gives the same models as the
+            sequential one, and pruning of losing candidates.
+        """
+        n_topics_list = [2, 5, 10]
+        sequential = topic_modeling.TopicModelerGridSearch(
+            n_topics_list, 40, 0, 20)
+        sequential.gridsearch(self.test_dtm)
+        finished = []
+        parallel = topic_modeling.TopicModelerGridSearch(
+            n_topics_list, 40, 0, 20, n_jobs=2)
+        parallel.gridsearch(sparse.csr_matrix(self.test_dtm.values),
+                            callback=lambda n, ll: finished.append(n))
+        self.assertTrue(sorted(finished) == n_topics_list)
+        self.assertTrue(np.allclose(parallel.loglikelihoods,
+                                    sequential.loglikelihoods))
+        self.assertTrue(parallel.n_topics_opt == sequential.n_topics_opt)
+        self.assertTrue(parallel.pruned == [])
+        # every candidate but the best is pruned with a zero tolerance
+        screened = topic_modeling.TopicModelerGridSearch(
+            n_topics_list, 40, 0, 20, n_jobs=2, screen_iter=20, prune_tol=0.)
+        screened.gridsearch(self.test_dtm)
+        self.assertTrue(len(screened.pruned) == len(n_topics_list) - 1)
+        self.assertTrue(len(screened.loglikelihoods) == 1)
+        self.assertTrue(screened.n_topics_opt not in screened.pruned)
+
 
 if __name__ == '__main__':
     unittest.main()
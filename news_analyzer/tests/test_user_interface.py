@@ -2,8 +2,11 @@
 This module performs unit tests on the user interface class.
 """
 # system import
+import json
 import sys
 import unittest
+from concurrent.futures import Future
+from unittest import mock
 import numpy as np
 import pandas as pd
 
@@ -24,6 +27,35 @@ class TestUserInterface(unittest.TestCase):
         python test_user_interface.py
     """
 
+    def setUp(self):
+        self.query_article = "test query article"
+
+    def submit(self):
+        """
+        submits the query article, waits for its analysis, and returns the
+        job id
+        """
+        response = ui.submit_query(4, self.query_article, None)
+        job_id = json.loads(response)['response']['props']['children']
+        self.wait(job_id)
+        return job_id
+
+    @staticmethod
+    def wait(job_id):
+        """
+        waits for every part of an analysis to finish
+        """
+        job = ui.my_handler.get_job(job_id)
+        for stage in ui.handler.ANALYSIS_STAGES:
+            job.result(stage, wait=True)
+
+    @staticmethod
+    def poll(job_id, rendered=None):
+        """
+        polls an analysis, and returns the updated components
+        """
+        return json.loads(ui.update_panels(job_id, 1, rendered))['response']
+
     def test_make_dash_table(self):
         """ Test to check getting NYtimes data.
         """
@@ -35,33 +67,117 @@ class TestUserInterface(unittest.TestCase):
         # check length and shape of the return types
         self.assertTrue(len(output) == 3)
 
+    def test_ready(self):
+        """
+        test the readiness check only waits for what the analyses need
+        """
+        client = ui.app.server.test_client()
+        resources = ui.handler.ANALYSIS_RESOURCES
+        ui.my_handler.warmup(wait=True, resources=resources)
+        response = client.get('/ready')
+        self.assertTrue(response.status_code == 200)
+        status = json.loads(response.data)
+        self.assertTrue(set(status) == set(resources))
+        self.assertTrue(set(status.values()) == {'loaded'})
+
+    def test_submit_query(self):
+        """
+        test the submit_query function analyzes the article once, for all
+        the components, which render once their part is ready
+        """
+        job_id = self.submit()
+        job = ui.my_handler.get_job(job_id)
+        self.assertTrue(job.done())
+        misses = ui.my_handler.cache.stats()['misses']
+        response = self.poll(job_id)
+        for panel_id, _, _, _ in ui.PANELS:
+            self.assertIsNotNone(response[panel_id]['children'])
+        self.assertTrue(response['job-poll']['disabled'])
+        self.assertTrue(ui.my_handler.cache.stats()['misses'] == misses)
+        # rendered components are not sent again
+        response = self.poll(job_id, response['rendered-stages']['data'])
+        self.assertTrue(set(response) == {'job-poll', 'rendered-stages'})
+        # resubmitting another article cancels the job
+        ui.submit_query(5, "another query article", job_id)
+        self.assertTrue(ui.my_handler.get_job(job_id) is None)
+        # a poll still carrying the cancelled job id stops polling, and
+        # does not start the job again
+        with mock.patch.object(ui.my_handler, 'resume_analysis') as resume:
+            response = self.poll(job_id)
+        self.assertFalse(resume.called)
+        self.assertTrue(response == {'job-poll': {'disabled': True}})
+
     def test_recommended_articles(self):
         """
-        test the update_recommended_articles function
+        test the render_recommended_articles function
         """
-        output = ui.update_recommended_articles(4, "test query article")
+        job = ui.my_handler.get_job(self.submit())
+        output = ui.render_recommended_articles(
+            job.result('recommended_articles'))
         self.assertIsNotNone(output)
 
     def test_sentiment_information(self):
         """
-        test the update_sentiment_information function
+        test the render_sentiment_information function
         """
-        output = ui.update_sentiment_information(4, "test query article")
+        job = ui.my_handler.get_job(self.submit())
+        output = ui.render_sentiment_information(job.result('sentiment'))
         self.assertIsNotNone(output)
 
     def test_update_top_topics(self):
         """
-        test the update_top_topics function
+        test the render_top_topics function
         """
-        output = ui.update_top_topics(4, "test query article")
+        job = ui.my_handler.get_job(self.submit())
+        output = ui.render_top_topics(job.result('topics'))
         self.assertIsNotNone(output)
 
     def test_update_word_cloud_image(self):
         """
-        test the update_word_cloud_image function
+        test the word cloud is rendered, and the analysis started again,
+        from the submitted article, if the finished job has been forgotten
+        (but not if it was cancelled)
         """
-        output = ui.update_word_cloud_image(4, "test query article")
-        self.assertIsNotNone(output)
+        job_id = self.submit()
+        with mock.patch.object(ui.my_handler.cache, 'max_size', 1):
+            other_job_id = ui.my_handler.submit_analysis("another article")
+        self.assertTrue(ui.my_handler.get_job(job_id) is None)
+        self.poll(job_id)
+        job = ui.my_handler.get_job(job_id)
+        self.assertTrue(job.query_article == self.query_article)
+        self.wait(job_id)
+        self.assertIsNotNone(self.poll(job_id)['wc_image']['children'])
+        ui.my_handler.cancel_analysis(other_job_id)
+        self.assertTrue(self.poll(other_job_id)['job-poll']['disabled'])
+        self.assertTrue(ui.my_handler.get_job(other_job_id) is None)
+
+    def test_update_job_poll(self):
+        """
+        test the job is polled until every component has rendered, and
+        that a failed part is rendered too
+        """
+        job = ui.handler.AnalysisJob(self.query_article)
+        for stage in ui.handler.ANALYSIS_STAGES:
+            job.futures[stage] = Future()
+        with mock.patch.object(ui.my_handler, 'resume_analysis',
+                               return_value=job):
+            response = self.poll('job')
+            self.assertFalse(response['job-poll']['disabled'])
+            self.assertTrue(set(response) == {'job-poll', 'rendered-stages'})
+            job.futures['sentiment'].set_result(
+                ui.my_handler.get_sentiment(self.query_article))
+            response = self.poll('job', response['rendered-stages']['data'])
+            self.assertFalse(response['job-poll']['disabled'])
+            self.assertTrue('article_sentiment' in response)
+            job.futures['topics'].set_exception(ValueError('failed'))
+            job.futures['recommended_articles'].set_result(
+                pd.DataFrame({'title': ['title']}))
+            job.futures['wordcloud'].set_result(b'aW1hZ2U=')
+            response = self.poll('job', response['rendered-stages']['data'])
+            self.assertTrue(response['job-poll']['disabled'])
+            self.assertTrue(set(response) ==
+                            {'job-poll', 'rendered-stages', 'top_topics',
+                             'recommended_articles', 'wc_image'})
 
 
 if __name__ == '__main__':
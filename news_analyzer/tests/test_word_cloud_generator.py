@@ -1,6 +1,10 @@
 """
 Unit Tests for WordCloudGenerator
 """
+import base64
+import os
+import tempfile
+import threading
 import unittest
 import sys
 sys.path.append('news_analyzer/libraries')
@@ -49,6 +53,101 @@ class WordCloudGeneratorTest(unittest.TestCase):
             "and inconsistent with our values.")
         self.assertTrue(my_image is not None)
 
+    def test_frequencies(self):
+        """
+        Word cloud from precomputed word counts, rendered in memory from
+        several threads at once
+
+        Args:
+            self (object): Reference to the class
+
+        Returns:
+            null
+        """
+        frequencies = {'rocket': 5, 'launch': 3, 'space': 2}
+        images = []
+        with tempfile.TemporaryDirectory() as path:
+            cwd = os.getcwd()
+            os.chdir(path)
+            try:
+                threads = [threading.Thread(target=lambda: images.append(
+                    word_cloud_generator.generate_wordcloud(
+                        frequencies=frequencies))) for _ in range(3)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                # nothing written to disk
+                self.assertTrue(os.listdir(path) == [])
+            finally:
+                os.chdir(cwd)
+        self.assertTrue(len(images) == 3)
+        self.assertTrue(images[0] == images[1] == images[2])
+        # the template is left unfitted
+        self.assertFalse(hasattr(word_cloud_generator.WORDCLOUD_TEMPLATE,
+                                 'layout_'))
+
+    def test_modes(self):
+        """
+        Preview and svg word clouds
+
+        Args:
+            self (object): Reference to the class
+
+        Returns:
+            null
+        """
+        frequencies = {'rocket': 5, 'launch': 3, 'space': 2}
+        image = word_cloud_generator.generate_wordcloud(
+            frequencies=frequencies)
+        preview = word_cloud_generator.generate_wordcloud(
+            frequencies=frequencies, mode='preview')
+        self.assertTrue(len(preview) < len(image))
+        svg = base64.b64decode(word_cloud_generator.generate_wordcloud(
+            frequencies=frequencies, mode='svg')).decode('utf8')
+        self.assertTrue(svg.startswith('<svg') and 'rocket' in svg)
+        with self.assertRaises(ValueError):
+            word_cloud_generator.generate_wordcloud("random data",
+                                                    mode='jpeg')
+
+    def test_image_cache(self):
+        """
+        Images are reused from memory and from disk, and evicted by size
+
+        Args:
+            self (object): Reference to the class
+
+        Returns:
+            null
+        """
+        with tempfile.TemporaryDirectory() as path:
+            cache = word_cloud_generator.ImageCache(path=path)
+            image = word_cloud_generator.generate_wordcloud(
+                "random data", mode='preview', cache=cache)
+            self.assertTrue(word_cloud_generator.generate_wordcloud(
+                "random data", mode='preview', cache=cache) is image)
+            self.assertTrue(cache.stats()['hits'] == 1)
+            self.assertTrue(cache.stats()['misses'] == 1)
+            # another process sharing the disk tier
+            other_cache = word_cloud_generator.ImageCache(path=path)
+            self.assertTrue(word_cloud_generator.generate_wordcloud(
+                "random data", mode='preview', cache=other_cache) == image)
+            self.assertTrue(other_cache.stats()['disk_hits'] == 1)
+            # a different mode is a different image
+            word_cloud_generator.generate_wordcloud(
+                "random data", mode='svg', cache=other_cache)
+            self.assertTrue(other_cache.stats()['misses'] == 1)
+            # size based eviction
+            small_cache = word_cloud_generator.ImageCache(
+                max_bytes=len(image) + 1, path=path,
+                max_disk_bytes=len(image) + 1)
+            small_cache.put('a', image)
+            small_cache.put('b', image)
+            self.assertTrue(small_cache.stats()['images'] == 1)
+            self.assertTrue(os.listdir(path) == ['b'])
+            self.assertTrue(small_cache.get('a') is None)
+            self.assertTrue(small_cache.get('b') == image)
+
 
 if __name__ == '__main__':
     unittest.main()